@@ -0,0 +1,240 @@
+"""
+Operations aggregates for the SLA dashboard (pages/operations.py).
+
+Each data file is scanned once, in pandas chunks, into grouped counts (tickets
+by priority/status, bookings per day, escalations by reason/urgency) plus the
+set of open P1/P2 tickets. After that the storage write hook keeps them
+current: appended records are counted and records changed in place (merged
+repeat reports) move between groups, so a page load never rescans the files.
+A write from another process is detected by file version, and only the
+records it appended or changed are re-counted (record_stream.changes). Time-dependent views (ticket age against its response target)
+are computed over the tracked columns with NumPy at read time.
+"""
+import re
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import langchain_tools
+import record_stream
+
+
+CHUNK_ROWS = 50000
+UNKNOWN = "unknown"
+
+URGENT_PRIORITIES = ("P1", "P2")
+CLOSED_STATUSES = ("resolved", "closed", "completed", "cancelled")
+
+
+def target_hours(response_time_target: Optional[str]) -> float:
+    """Hours in a ticket's response target ("Immediate (within 1 hour)" -> 1.0); NaN if it has none"""
+    match = re.search(r"within (\d+) hour", response_time_target or "")
+    return float(match.group(1)) if match else float("nan")
+
+
+def _is_open(record: Dict) -> bool:
+    return not record.get("resolved") and record.get("status") not in CLOSED_STATUSES
+
+
+def _chunks(records: Iterable[Dict], columns: List[str]) -> Iterator[pd.DataFrame]:
+    """Records as DataFrames of at most CHUNK_ROWS records"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= CHUNK_ROWS:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame.from_records(chunk, columns=columns)
+
+
+class GroupCounts:
+    """Record counts grouped by fields, built a chunk at a time and then maintained per record"""
+
+    def __init__(self, id_field: str, fields: List[str]):
+        self.id_field = id_field
+        self.fields = fields
+        self.counts: Counter = Counter()
+        self._key_of: Dict[str, tuple] = {}
+
+    def reset(self):
+        self.counts = Counter()
+        self._key_of = {}
+
+    def add_frame(self, frame: pd.DataFrame):
+        keys = frame[self.fields].fillna(UNKNOWN).astype(str)
+        self.counts.update(keys.value_counts().to_dict())
+        self._key_of.update(zip(frame[self.id_field], keys.itertuples(index=False, name=None)))
+
+    def apply(self, record: Dict):
+        """Count a new record, or move a changed one to its new group"""
+        key = tuple(UNKNOWN if record.get(f) is None else str(record[f]) for f in self.fields)
+        record_id = record[self.id_field]
+        previous = self._key_of.get(record_id)
+        if previous == key:
+            return
+        if previous is not None:
+            self.counts[previous] -= 1
+            if self.counts[previous] <= 0:
+                del self.counts[previous]
+        self.counts[key] += 1
+        self._key_of[record_id] = key
+
+    def frame(self) -> pd.DataFrame:
+        rows = [key + (n,) for key, n in self.counts.items()]
+        return pd.DataFrame(rows, columns=self.fields + ["count"])
+
+
+class OpsAggregates:
+
+    def __init__(self):
+        self.tickets = GroupCounts("ticket_id", ["priority", "status"])
+        self.bookings = GroupCounts("booking_id", ["preferred_date"])
+        self.escalations = GroupCounts("escalation_id", ["reason", "urgency"])
+        self.groups = {
+            langchain_tools.TICKETS_FILE: self.tickets,
+            langchain_tools.BOOKINGS_FILE: self.bookings,
+            langchain_tools.ESCALATIONS_FILE: self.escalations
+        }
+        # open P1/P2 ticket ID -> (priority, created_at, target hours)
+        self._urgent: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+        self._checkpoints: Dict[str, record_stream.Checkpoint] = {}
+
+    def _track_urgent(self, record: Dict):
+        ticket_id = record["ticket_id"]
+        created_at = pd.to_datetime(record.get("created_at"), errors="coerce")
+        if record.get("priority") in URGENT_PRIORITIES and _is_open(record) and not pd.isna(created_at):
+            self._urgent[ticket_id] = (record["priority"], created_at, target_hours(record.get("response_time_target")))
+        else:
+            self._urgent.pop(ticket_id, None)
+
+    def _track_urgent_frame(self, frame: pd.DataFrame):
+        closed = frame["resolved"].eq(True) | frame["status"].isin(CLOSED_STATUSES)
+        urgent = frame[frame["priority"].isin(URGENT_PRIORITIES) & ~closed]
+        created = pd.to_datetime(urgent["created_at"], errors="coerce")
+        for ticket_id, priority, created_at, target in zip(
+                urgent["ticket_id"], urgent["priority"], created, urgent["response_time_target"]):
+            if not pd.isna(created_at):
+                self._urgent[ticket_id] = (priority, created_at, target_hours(target))
+
+    def _catch_up(self, filepath: str, full: bool = False):
+        """Count the records appended to or changed in filepath since it was last read"""
+        group = self.groups[filepath]
+        tickets = filepath == langchain_tools.TICKETS_FILE
+        checkpoint = None if full else self._checkpoints.get(filepath)
+        with record_stream.changes(filepath, checkpoint) as (records, checkpoint, rebuild):
+            if rebuild:
+                group.reset()
+                columns = [group.id_field] + group.fields
+                if tickets:
+                    self._urgent = {}
+                    columns += ["created_at", "response_time_target", "resolved"]
+                for frame in _chunks(records, columns):
+                    group.add_frame(frame)
+                    if tickets:
+                        self._track_urgent_frame(frame)
+            else:
+                for record in records:
+                    group.apply(record)
+                    if tickets:
+                        self._track_urgent(record)
+        self._checkpoints[filepath] = checkpoint
+
+    def refresh(self):
+        """Catch up with writes made outside this process since a file was last seen"""
+        with self._lock:
+            for filepath in self.groups:
+                checkpoint = self._checkpoints.get(filepath)
+                if checkpoint is None or langchain_tools.file_version(filepath) != checkpoint.version:
+                    self._catch_up(filepath)
+
+    def on_write(self, filepath: str, records: Optional[List[Dict]], previous_version: tuple, updated=()):
+        group = self.groups.get(filepath)
+        if group is None:
+            return
+        with self._lock:
+            if filepath not in self._checkpoints:
+                return  # not built yet; the first read scans the file
+            # the file has this write's records, and any writes from elsewhere since the last read
+            self._catch_up(filepath, full=records is None)
+
+    def ticket_matrix(self) -> pd.DataFrame:
+        """Ticket counts, priority rows by status columns"""
+        with self._lock:
+            self.refresh()
+            counts = self.tickets.frame()
+        if counts.empty:
+            return counts
+        return counts.pivot_table(index="priority", columns="status", values="count",
+                                  aggfunc="sum", fill_value=0).sort_index()
+
+    def urgent_ticket_ages(self, now: Optional[datetime] = None) -> pd.DataFrame:
+        """Open P1/P2 tickets with their age against the response target, oldest first"""
+        with self._lock:
+            self.refresh()
+            items = list(self._urgent.items())
+        columns = ["ticket_id", "priority", "created_at", "age_hours", "target_hours", "remaining_hours", "breached"]
+        if not items:
+            return pd.DataFrame(columns=columns)
+
+        ids = [ticket_id for ticket_id, _ in items]
+        priority = np.array([p for _, (p, _, _) in items])
+        created = np.array([c for _, (_, c, _) in items], dtype="datetime64[us]")
+        target = np.array([t for _, (_, _, t) in items], dtype=float)
+        age = (np.datetime64(now or datetime.now(), "us") - created) / np.timedelta64(1, "h")
+        frame = pd.DataFrame({
+            "ticket_id": ids,
+            "priority": priority,
+            "created_at": created,
+            "age_hours": age.round(2),
+            "target_hours": target,
+            "remaining_hours": (target - age).round(2),
+            "breached": age > target
+        }, columns=columns)
+        return frame.sort_values("age_hours", ascending=False, ignore_index=True)
+
+    def bookings_vs_capacity(self, start: Optional[date] = None, days: int = 14) -> pd.DataFrame:
+        """Bookings per preferred date against the per-day capacity, for days from start (default today)"""
+        with self._lock:
+            self.refresh()
+            counts = self.bookings.frame()
+        start = start or date.today()
+        dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+        booked = counts.set_index("preferred_date")["count"].reindex(dates, fill_value=0).to_numpy(dtype=int)
+        capacity = langchain_tools.MAX_BOOKINGS_PER_DAY
+        return pd.DataFrame({
+            "date": dates,
+            "bookings": booked,
+            "capacity": capacity,
+            "utilization": np.round(booked / capacity, 2),
+            "over_capacity": booked > capacity
+        })
+
+    def escalation_matrix(self) -> pd.DataFrame:
+        """Escalation counts, reason rows by urgency columns"""
+        with self._lock:
+            self.refresh()
+            counts = self.escalations.frame()
+        if counts.empty:
+            return counts
+        matrix = counts.pivot_table(index="reason", columns="urgency", values="count", aggfunc="sum", fill_value=0)
+        return matrix.loc[matrix.sum(axis=1).sort_values(ascending=False).index]
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_aggregates() -> OpsAggregates:
+    """Process-wide aggregates, kept current by the storage write hook"""
+    global _aggregates
+    with _aggregates_lock:
+        if _aggregates is None:
+            _aggregates = OpsAggregates()
+            langchain_tools.add_write_listener(_aggregates.on_write)
+        return _aggregates
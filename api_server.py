@@ -0,0 +1,445 @@
+"""
+Headless HTTP API for the assistant.
+
+Serves the same turn pipeline as the Streamlit app (pipeline.run_turn) over
+aiohttp, keyed by session:
+
+    POST   /sessions                   start a session -> {"session_id": ...}
+    POST   /sessions/{id}/messages     {"message": "..."} -> the turn result as JSON; with
+                                       "stream": true (or Accept: text/event-stream) the turn is
+                                       sent as server-sent events while it runs: stage, tool,
+                                       tool_result, answered, text and finally result. The
+                                       model output itself isn't streamed: each text event
+                                       is a complete reply
+    GET    /sessions/{id}              conversation, facts, escalation and token usage
+    DELETE /sessions/{id}
+    GET    /health, /stats             liveness; this worker's turn, scheduler, guard and tool stats
+
+Model calls block, so each turn runs on a thread pool while the event loop
+keeps serving other requests. Sessions are pickled to API_SESSION_DIR between
+turns and a turn holds an exclusive lock on its session, so with --workers N
+the N processes share one listening socket and any of them can serve any
+session; storage writes are already serialized across processes by the file
+locks in langchain_tools. The LLM scheduler, domain guard and indexes are per
+worker, so LLM_MAX_CONCURRENCY applies to each worker separately.
+
+Usage:
+    python api_server.py --port 8080 --workers 4
+    curl -s -X POST localhost:8080/sessions
+    curl -N localhost:8080/sessions/<id>/messages -d '{"message": "My boiler is leaking", "stream": true}'
+
+Config (env):
+    API_HOST           interface to listen on (default 127.0.0.1)
+    API_PORT           port (default 8080)
+    API_WORKERS        worker processes; 0 for one per CPU (default 1)
+    API_TURN_THREADS   turns run at once per worker (default 32)
+    API_SESSION_DIR    where sessions are kept (default MAINTENANCE_DATA_DIR/sessions)
+    plus the app's own: OLLAMA_BASE_URL, OLLAMA_API_KEY, DEFAULT_MODEL, TOOL_CAPABLE_MODELS, SYSTEM_PROMPT_PATH
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from aiohttp import web
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import langchain_tools
+import tracing
+from pipeline import Session, TurnHooks, TurnResult, load_prompt, run_turn
+from tool_registry import ToolStats, get_registry
+from model_router import get_router
+from llm_scheduler import get_scheduler
+from domain_guard import get_guard
+
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+MAX_MESSAGE_CHARS = 4000
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class SessionStore:
+    """Sessions pickled one per file, shared by every worker process"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("API_SESSION_DIR") or os.path.join(langchain_tools.DATA_DIR, "sessions")
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def path(self, session_id: str) -> str:
+        if not SESSION_ID.match(session_id):
+            raise SessionNotFound(session_id)
+        return os.path.join(self.directory, f"{session_id}.pkl")
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id))
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Exclusive across threads and processes, held for a whole turn"""
+        path = self.path(session_id)
+        with self._guard:
+            thread_lock = self._thread_locks.setdefault(session_id, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, session_id: str) -> Session:
+        try:
+            with open(self.path(session_id), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            raise SessionNotFound(session_id) from None
+
+    def save(self, session: Session):
+        path = self.path(session.session_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(session, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def delete(self, session_id: str) -> bool:
+        path = self.path(session_id)
+        with self.lock(session_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        try:
+            os.remove(f"{path}.lock")
+        except FileNotFoundError:
+            pass
+        with self._guard:
+            self._thread_locks.pop(session_id, None)
+        return True
+
+
+class StreamHooks(TurnHooks):
+    """Forwards turn progress from the worker thread to the event loop as events"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def emit(self, event: str, data: Dict):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    @contextmanager
+    def stage(self, name: str):
+        self.emit("stage", {"stage": name})
+        yield
+
+    @contextmanager
+    def tool(self, name: str):
+        self.emit("tool", {"name": name})
+        yield
+
+    def tool_result(self, result):
+        self.emit("tool_result", {"name": result.name, "ok": result.ok, "summary": result.summary()})
+
+    def assistant_text(self, text: str):
+        self.emit("text", {"text": text})
+
+    def answered(self, questions: list):
+        self.emit("answered", {"questions": questions})
+
+
+def turn_to_dict(session_id: str, result: TurnResult) -> Dict:
+    return {
+        "session_id": session_id,
+        "turn_id": result.turn_id,
+        "text": result.text,
+        "blocked": result.blocked,
+        "sentiment": result.sentiment,
+        "facts": result.facts,
+        "answered_questions": result.answered_questions,
+        "tools": [{"name": r.name, "ok": r.ok, "latency_ms": round(r.latency_ms, 3), "result": r.data}
+                  for r in result.tool_results],
+        "similar_cases": [record.get("issue_id") or record.get("ticket_id") for _, _, record in result.similar_cases],
+        "usage": result.usage,
+        "escalation": {"should_escalate": result.should_escalate, "reasons": result.escalation_reasons,
+                       "severity": result.escalation_severity}
+    }
+
+
+def session_to_dict(session: Session) -> Dict:
+    should_escalate, reasons, severity = session.escalation_engine.evaluate()
+    return {
+        "session_id": session.session_id,
+        "messages": [{"role": m["role"], "content": m["content"]} for m in session.conversation.get_context()
+                     if m["role"] in ("user", "assistant")],
+        "facts": session.conversation.get_all_facts(),
+        "fact_history": {key: session.conversation.get_fact_history(key) for key in session.conversation.facts},
+        "turns": session.conversation.get_turn_count(),
+        "last_sentiment": session.last_sentiment,
+        "escalation": {"should_escalate": should_escalate, "reasons": reasons, "severity": severity},
+        "usage": session.usage.to_dict()
+    }
+
+
+def error(status: int, message: str) -> web.Response:
+    return web.json_response({"status": "error", "message": message}, status=status)
+
+
+class Assistant:
+    """One worker's pipeline dependencies and thread pool"""
+
+    def __init__(self, store: Optional[SessionStore] = None, client=None, threads: Optional[int] = None):
+        from dotenv import load_dotenv
+        load_dotenv()
+        self.store = store or SessionStore()
+        self.model = os.getenv("DEFAULT_MODEL")
+        self.tool_capable_models = set(os.getenv("TOOL_CAPABLE_MODELS", "").split(","))
+        self.system_prompt = load_prompt(os.getenv("SYSTEM_PROMPT_PATH"))
+        self._client = client
+        self.pool = ThreadPoolExecutor(max_workers=threads or int(os.getenv("API_TURN_THREADS", 32)),
+                                       thread_name_prefix="api-turn")
+        self.turn_stats = ToolStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(base_url=os.getenv("OLLAMA_BASE_URL"), api_key=os.getenv("OLLAMA_API_KEY"))
+        return self._client
+
+    def create_session(self) -> Session:
+        session = Session(self.system_prompt)
+        self.store.save(session)
+        return session
+
+    def turn(self, session_id: str, message: str, hooks: Optional[TurnHooks] = None) -> TurnResult:
+        """Load, run and save under the session's lock; a failed turn leaves the session as it was"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            with self.store.lock(session_id):
+                session = self.store.load(session_id)
+                tracing.set_context(session_id, tracing.new_trace_id())
+                result = run_turn(session, message, self.client, self.model,
+                                  tool_capable_models=self.tool_capable_models, hooks=hooks)
+                self.store.save(session)
+            ok = True
+            return result
+        finally:
+            with self._stats_lock:
+                self.turn_stats.record((time.perf_counter() - start) * 1000, ok)
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            turns = self.turn_stats.to_dict()
+        return {
+            "pid": os.getpid(),
+            "turns": turns,
+            "scheduler": get_scheduler().get_stats(),
+            "domain_guard": get_guard().get_stats(),
+            "models": get_router(self.model).get_stats(),
+            "tools": get_registry().get_stats()
+        }
+
+
+async def _json_body(request: web.Request) -> Dict:
+    if not request.can_read_body:
+        return {}
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"status": "error", "message": "Body must be JSON"}),
+                                 content_type="application/json")
+    return body if isinstance(body, dict) else {}
+
+
+async def create_session(request: web.Request) -> web.Response:
+    session = await request.app["assistant"].run(request.app["assistant"].create_session)
+    return web.json_response({"session_id": session.session_id}, status=201)
+
+
+async def get_session(request: web.Request) -> web.Response:
+    assistant = request.app["assistant"]
+    try:
+        session = await assistant.run(assistant.store.load, request.match_info["session_id"])
+    except SessionNotFound:
+        return error(404, "Session not found")
+    return web.json_response(session_to_dict(session))
+
+
+async def delete_session(request: web.Request) -> web.Response:
+    assistant = request.app["assistant"]
+    try:
+        deleted = await assistant.run(assistant.store.delete, request.match_info["session_id"])
+    except SessionNotFound:
+        deleted = False
+    if not deleted:
+        return error(404, "Session not found")
+    return web.json_response({"status": "deleted", "session_id": request.match_info["session_id"]})
+
+
+def _sse(event: str, data: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+
+
+async def post_message(request: web.Request) -> web.StreamResponse:
+    assistant = request.app["assistant"]
+    session_id = request.match_info["session_id"]
+    body = await _json_body(request)
+    message = str(body.get("message") or "").strip()
+    if not message:
+        return error(400, "message is required")
+    if len(message) > MAX_MESSAGE_CHARS:
+        return error(413, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+    try:
+        if not assistant.store.exists(session_id):
+            return error(404, "Session not found")
+    except SessionNotFound:
+        return error(404, "Session not found")
+
+    stream = bool(body.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+    if not stream:
+        try:
+            result = await assistant.run(assistant.turn, session_id, message)
+        except SessionNotFound:
+            return error(404, "Session not found")
+        except Exception as e:
+            return error(502, f"Turn failed: {type(e).__name__}: {e}")
+        return web.json_response(turn_to_dict(session_id, result), dumps=lambda o: json.dumps(o, default=str))
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    future = loop.run_in_executor(assistant.pool, assistant.turn, session_id, message, StreamHooks(loop, queue))
+    # queued after the turn's own events, so it marks the end of the stream
+    future.add_done_callback(lambda _: queue.put_nowait(None))
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    try:
+        while (item := await queue.get()) is not None:
+            await response.write(_sse(*item))
+        try:
+            await response.write(_sse("result", turn_to_dict(session_id, future.result())))
+        except SessionNotFound:
+            await response.write(_sse("error", {"status": "error", "message": "Session not found"}))
+        except Exception as e:
+            await response.write(_sse("error", {"status": "error", "message": f"Turn failed: {type(e).__name__}: {e}"}))
+        await response.write_eof()
+    except ConnectionResetError:
+        pass  # the client went away; the turn still finishes and is saved
+    return response
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "pid": os.getpid()})
+
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response(request.app["assistant"].get_stats())
+
+
+def create_app(assistant: Optional[Assistant] = None) -> web.Application:
+    app = web.Application()
+    app["assistant"] = assistant or Assistant()
+
+    async def warm_up(app):
+        # trains the domain guard and builds the similar-case index off the request path
+        def build():
+            get_guard().warm_up()
+            import similar_cases
+            similar_cases.get_index().refresh()
+        threading.Thread(target=build, name="api-warmup", daemon=True).start()
+
+    async def shut_down(app):
+        app["assistant"].pool.shutdown(wait=True)
+        langchain_tools.flush_writes()
+
+    app.on_startup.append(warm_up)
+    app.on_cleanup.append(shut_down)
+    app.add_routes([
+        web.post("/sessions", create_session),
+        web.get("/sessions/{session_id}", get_session),
+        web.delete("/sessions/{session_id}", delete_session),
+        web.post("/sessions/{session_id}/messages", post_message),
+        web.get("/health", health),
+        web.get("/stats", stats)
+    ])
+    return app
+
+
+def serve(host: str, port: int, workers: int):
+    """Bind once, then fork workers that all accept on the same socket"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    print(f"[api] listening on http://{host}:{sock.getsockname()[1]} with {workers} worker(s)", file=sys.stderr)
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        web.run_app(create_app(), sock=sock, print=None)
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                web.run_app(create_app(), sock=sock, print=None)
+            except Exception:
+                code = 1
+            finally:
+                os._exit(code)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for child in children:
+        os.waitpid(child, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the assistant over HTTP")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", 1)),
+                        help="Worker processes (0 = one per CPU)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers or os.cpu_count() or 1)
+
+
+if __name__ == "__main__":
+    main()
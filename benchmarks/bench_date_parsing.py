@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for date_parsing.
+
+Usage:
+    python benchmarks/bench_date_parsing.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import date_parsing
+
+
+SAMPLE_INPUTS = [
+    "21", "21st", "March 15", "15 march", "2025-03-15", "tomorrow", "today",
+    "next week", "next month", "Dec 1", "sept 3rd", "the 9th please", "4th of july"
+]
+
+
+def run(number: int = 20000) -> dict:
+    inputs = SAMPLE_INPUTS * (number // len(SAMPLE_INPUTS) + 1)
+    inputs = inputs[:number]
+
+    def cold():
+        date_parsing.clear_cache()
+        for text in SAMPLE_INPUTS:
+            date_parsing.parse_flexible_date(text)
+
+    def warm():
+        for text in inputs:
+            date_parsing.parse_flexible_date(text)
+
+    def batch():
+        date_parsing.parse_flexible_dates(inputs)
+
+    cold_runs = max(number // len(SAMPLE_INPUTS), 1)
+    results = {
+        "cold_us_per_parse": timeit.timeit(cold, number=cold_runs) / (cold_runs * len(SAMPLE_INPUTS)) * 1e6,
+        "warm_us_per_parse": timeit.timeit(warm, number=1) / number * 1e6,
+        "batch_us_per_parse": timeit.timeit(batch, number=1) / number * 1e6
+    }
+    return {name: round(value, 3) for name, value in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flexible date parsing")
+    parser.add_argument("--number", type=int, default=20000, help="Parses per measurement")
+    args = parser.parse_args()
+
+    for name, value in run(args.number).items():
+        print(f"{name:>22}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
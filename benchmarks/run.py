@@ -0,0 +1,315 @@
+"""
+Benchmark suite for storage, tools and the turn pipeline.
+
+Generates synthetic bookings, issues, tickets and escalations at each size,
+times the storage layer, every tool, the sidebar stats path, date parsing,
+sentiment detection, the domain guard, the ops dashboard aggregates,
+similar-case retrieval, catching the indexes up after another worker's write,
+the memory classes over long conversations and cold startup imports, and
+writes the results as JSON. With --baseline, results are compared against a
+stored run and the exit code is 1 if anything regressed beyond --tolerance.
+
+Usage:
+    python -m benchmarks.run --sizes 1k,10k -o bench.json
+    python -m benchmarks.run --sizes 1k,10k --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --sizes 1k,10k --baseline benchmarks/baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CACHE_DIR = os.path.join(ROOT, "benchmarks", ".data")
+
+# Repeats per dataset size; write benchmarks rewrite the whole file each time
+REPEATS = {"1k": 20, "10k": 10, "100k": 3, "1M": 1}
+
+CONVERSATION_TURNS = [50, 500]
+
+
+def measure(fn: Callable, repeats: int, setup: Optional[Callable] = None) -> Dict:
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeats": repeats,
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4)
+    }
+
+
+def first_page(records, size: int = 20) -> list:
+    with closing(records):
+        return list(itertools.islice(records, size))
+
+
+def bench_storage_and_tools(size: str, dataset_dir: str, work_dir: str) -> Dict[str, Dict]:
+    import langchain_tools as lt
+
+    def reset():
+        for filename in os.listdir(dataset_dir):
+            shutil.copyfile(os.path.join(dataset_dir, filename), os.path.join(work_dir, filename))
+
+    reset()
+    repeats = REPEATS[size]
+    results = {}
+
+    for filepath in [lt.BOOKINGS_FILE, lt.ISSUES_FILE, lt.TICKETS_FILE, lt.ESCALATIONS_FILE]:
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        data = lt.load_json(filepath)
+        results[f"storage.load_json.{name}"] = measure(lambda: lt.load_json(filepath), repeats)
+        results[f"storage.save_json.{name}"] = measure(lambda: lt.save_json(filepath, data), repeats)
+
+    results["storage.iter_records.tickets"] = measure(lambda: sum(1 for _ in lt.iter_records(lt.TICKETS_FILE)), repeats)
+    results["storage.first_page.tickets"] = measure(lambda: first_page(lt.iter_tickets()), repeats)
+    results["storage.scan.critical_tickets"] = measure(lambda: list(lt.iter_tickets(severity="critical")), repeats)
+    results["sidebar.storage_counts"] = measure(lt.get_storage_counts, repeats)
+
+    from customer_index import CustomerIndex
+    index = CustomerIndex()
+    index.refresh()
+    customer = lt.load_json(lt.BOOKINGS_FILE)[0]["customer_name"]
+    results["customer_index.build"] = measure(lambda: CustomerIndex().refresh(), repeats)
+    results["customer_index.lookup"] = measure(lambda: index.lookup(customer), repeats)
+
+    from analytics import OpsAggregates
+    aggregates = OpsAggregates()
+    aggregates.refresh()
+    dashboard = lambda: (aggregates.ticket_matrix(), aggregates.urgent_ticket_ages(),
+                         aggregates.bookings_vs_capacity(), aggregates.escalation_matrix())
+    results["analytics.build"] = measure(lambda: OpsAggregates().refresh(), repeats)
+    results["analytics.dashboard"] = measure(dashboard, repeats)
+
+    from similar_cases import SimilarCaseIndex
+    from benchmarks.synthetic_data import USER_MESSAGES
+    cases = SimilarCaseIndex()
+    cases.refresh()
+    results["similar_cases.build"] = measure(lambda: SimilarCaseIndex().refresh(), repeats)
+    results["similar_cases.search"] = measure(lambda: cases.search(USER_MESSAGES[0]), repeats * 5)
+    results["similar_cases.search_many_x8"] = measure(lambda: cases.search_many(USER_MESSAGES), repeats)
+
+    # Catching up after another API worker appends a ticket (these indexes aren't write listeners)
+    def foreign_append():
+        ticket = dict(lt.load_json(lt.TICKETS_FILE)[-1], ticket_id=lt.generate_id("TKT"), status="resolved")
+        lt.append_json(lt.TICKETS_FILE, [ticket])
+
+    results["customer_index.catch_up"] = measure(index.refresh, repeats, setup=foreign_append)
+    results["analytics.catch_up"] = measure(aggregates.refresh, repeats, setup=foreign_append)
+    results["similar_cases.catch_up"] = measure(cases.refresh, repeats, setup=foreign_append)
+
+    tool_args = {
+        "book_maintenance_appointment": {
+            "customer_name": "Bench Customer", "contact_number": "07700 900000",
+            "issue_description": "Leak under the sink", "preferred_date": "tomorrow",
+            "address": "1 Bench Road"
+        },
+        "log_customer_issue": {
+            "customer_name": "Bench Customer", "issue_type": "leak",
+            "description": "Leak under the sink", "location": "kitchen"
+        },
+        "create_maintenance_ticket": {
+            "issue_type": "plumbing", "severity": "high", "description": "Leak under the sink",
+            "customer_name": "Bench Customer", "location": "kitchen"
+        },
+        "escalate_to_human_representative": {
+            "reason": "complex_issue", "customer_name": "Bench Customer", "issue_summary": "Leak under the sink"
+        },
+        "check_booking_availability": {"date_str": "next week"},
+        "get_customer_profile": {"customer": "Bench Customer"}
+    }
+    for name, args in tool_args.items():
+        tool = lt.available_langchain_functions[name]
+        results[f"tool.{name}"] = measure(lambda: tool.invoke(args), repeats)
+
+    # Restore the pristine dataset for the next size / benchmark
+    reset()
+    return {f"{key}[{size}]": value for key, value in results.items()}
+
+
+def bench_text() -> Dict[str, Dict]:
+    from benchmarks.bench_date_parsing import SAMPLE_INPUTS
+    import date_parsing
+    from pipeline import detect_sentiment
+    from benchmarks.synthetic_data import USER_MESSAGES
+
+    results = {}
+    inputs = SAMPLE_INPUTS * 100
+
+    def cold_parse():
+        date_parsing.clear_cache()
+        for text in SAMPLE_INPUTS:
+            date_parsing.parse_flexible_date(text)
+
+    results["parse_flexible_date.cold_x13"] = measure(cold_parse, 50)
+    results["parse_flexible_date.warm_x1300"] = measure(lambda: [date_parsing.parse_flexible_date(t) for t in inputs], 20)
+    results["parse_flexible_dates.batch_x1300"] = measure(lambda: date_parsing.parse_flexible_dates(inputs), 20)
+
+    messages = USER_MESSAGES * 125
+    results["detect_sentiment.x1000"] = measure(lambda: [detect_sentiment(m) for m in messages], 20)
+
+    from domain_guard import DomainClassifier, DomainGuard, load_examples
+    examples = load_examples()
+    results["domain_guard.train"] = measure(lambda: DomainClassifier.train(examples["in_domain"], examples["off_topic"]), 5)
+    guard = DomainGuard(enabled=True)
+    results["domain_guard.check.x1000"] = measure(lambda: [guard.check(m) for m in messages], 20)
+    return results
+
+
+def bench_memory() -> Dict[str, Dict]:
+    from memory import ConversationManager, EscalationDetector, FollowUpTracker
+    from escalation_rules import EscalationRuleEngine
+    from pipeline import detect_sentiment, build_context_with_facts
+    from benchmarks.synthetic_data import make_conversation
+
+    results = {}
+    for turns in CONVERSATION_TURNS:
+        messages = make_conversation(turns)
+
+        def conversation_run():
+            conversation = ConversationManager("system prompt")
+            detector = EscalationDetector()
+            tracker = FollowUpTracker()
+            for i, msg in enumerate(messages):
+                if msg["role"] == "user":
+                    conversation.add("user", msg["content"])
+                    conversation.set_fact(f"fact_{i % 12}", msg["content"][:20])
+                    tracker.check_if_answered(msg["content"])
+                    detector.should_escalate(conversation, detect_sentiment(msg["content"]))
+                    build_context_with_facts(conversation, "tone")
+                else:
+                    conversation.add("assistant", msg["content"])
+                    tracker.add_ai_response(msg["content"])
+
+        def rule_engine_run():
+            engine = EscalationRuleEngine()
+            for msg in messages:
+                if msg["role"] == "user":
+                    engine.on_user_turn(msg["content"])
+                    engine.on_sentiment(detect_sentiment(msg["content"]))
+                    engine.evaluate()
+
+        results[f"memory.conversation_turns[{turns}]"] = measure(conversation_run, 3)
+        results[f"escalation_rules.engine_turns[{turns}]"] = measure(rule_engine_run, 3)
+    return results
+
+
+def bench_startup() -> Dict[str, Dict]:
+    """Cold import of the modules main.py loads before first paint, in a fresh interpreter"""
+    def cold_import(statement):
+        return lambda: subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+
+    return {
+        "startup.python_baseline": measure(cold_import("pass"), 5),
+        "startup.import_app_modules": measure(cold_import("import langchain_tools, pipeline, tool_registry, tracing"), 5)
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Dict]:
+    """Benchmarks whose median got slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("median_ms"):
+            continue
+        ratio = current["median_ms"] / previous["median_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "benchmark": name,
+                "baseline_ms": previous["median_ms"],
+                "current_ms": current["median_ms"],
+                "ratio": round(ratio, 3)
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Customer360 benchmark suite")
+    parser.add_argument("--sizes", default="1k,10k,100k,1M",
+                        help="Comma-separated dataset sizes (1k, 10k, 100k, 1M)")
+    parser.add_argument("-o", "--output", default=None, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Also write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Where generated datasets are kept")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    from benchmarks.synthetic_data import SIZES, ensure_dataset
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}, choose from {list(SIZES)}")
+
+    # Point storage at a scratch directory and keep tracing out of the timings
+    work_dir = tempfile.mkdtemp(prefix="c360-bench-")
+    os.environ["MAINTENANCE_DATA_DIR"] = work_dir
+    os.environ["TRACING_ENABLED"] = "0"
+
+    results = {}
+    try:
+        for size in sizes:
+            print(f"[bench] dataset {size}", file=sys.stderr)
+            dataset_dir = ensure_dataset(size, args.cache_dir)
+            results.update(bench_storage_and_tools(size, dataset_dir, work_dir))
+        print("[bench] text and memory", file=sys.stderr)
+        results.update(bench_text())
+        results.update(bench_memory())
+        results.update(bench_startup())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes
+        },
+        "results": results
+    }
+
+    exit_code = 0
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        report["regressions"] = regressions
+        for regression in regressions:
+            print(f"[bench] REGRESSION {regression['benchmark']}: "
+                  f"{regression['baseline_ms']} ms -> {regression['current_ms']} ms (x{regression['ratio']})",
+                  file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
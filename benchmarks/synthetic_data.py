@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic datasets for the benchmark suite.
+
+Records have the same shape as the ones the tools write, with time-ordered
+IDs, so storage, tool and dashboard code paths see realistic data.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from record_ids import encode
+
+
+SIZES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1M": 1_000_000
+}
+
+FIRST_NAMES = ["Alex", "Sam", "Priya", "Jordan", "Maria", "Chen", "Fatima", "Liam", "Noah", "Ava", "Ravi", "Zoe"]
+LAST_NAMES = ["Smith", "Patel", "Garcia", "Khan", "Nguyen", "Brown", "Okafor", "Rossi", "Kim", "Murphy"]
+ISSUE_TYPES = ["leak", "damp", "electrical", "heating", "structural", "plumbing", "gas", "mould"]
+LOCATIONS = ["kitchen ceiling", "bedroom wall", "bathroom floor", "living room", "loft", "basement", "garage", "hallway"]
+SEVERITIES = ["low", "medium", "high", "critical"]
+URGENCIES = ["normal", "high", "critical"]
+TIME_SLOTS = ["09:00-12:00", "12:00-15:00", "15:00-18:00", "18:00-21:00"]
+DESCRIPTIONS = [
+    "Water dripping from the {location} after heavy rain",
+    "Black mould spreading on the {location}",
+    "Sockets sparking near the {location}",
+    "Radiator in the {location} not heating up",
+    "Crack widening in the {location}",
+    "Smell of gas near the {location}",
+    "Pipe burst under the {location}",
+    "Damp patch growing on the {location}"
+]
+USER_MESSAGES = [
+    "There is water coming through my kitchen ceiling",
+    "I'm worried the damp in the bedroom wall is getting worse",
+    "This is ridiculous, nobody has called me back",
+    "It's urgent, I can smell gas near the boiler",
+    "Can you book a technician for next week?",
+    "The leak is in the bathroom, above the sink",
+    "What should I do about the mould?",
+    "My number is 07700 900123 and I live at 12 High Street"
+]
+ASSISTANT_MESSAGES = [
+    "I'm sorry to hear that. Where exactly is the water coming from?",
+    "Thanks. Is the area near any electrical fittings?",
+    "I've logged this issue. Would you like me to book a technician?",
+    "For safety, please turn off the gas at the meter. Are you somewhere safe?"
+]
+
+
+class _Clock:
+
+    def __init__(self, n: int, start: datetime):
+        self.start_ms = int(start.timestamp() * 1000)
+        # Spread records over the 90 days before `start`
+        self.step_ms = max(int(90 * 24 * 3600 * 1000 / max(n, 1)), 1)
+        self.base_ms = self.start_ms - self.step_ms * n
+
+    def at(self, i: int):
+        ms = self.base_ms + i * self.step_ms
+        return ms, datetime.fromtimestamp(ms / 1000)
+
+
+def _record_id(prefix: str, ms: int, i: int) -> str:
+    return f"{prefix}-{encode((ms << 80) | i)}"
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def make_bookings(n: int, seed: int = 1, now: datetime = None) -> List[Dict]:
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    clock = _Clock(n, now)
+    records = []
+    for i in range(n):
+        ms, created = clock.at(i)
+        urgency = rng.choice(URGENCIES)
+        location = rng.choice(LOCATIONS)
+        preferred = (now + timedelta(days=rng.randint(-30, 60))).strftime("%Y-%m-%d")
+        records.append({
+            "booking_id": _record_id("BOOK", ms, i),
+            "customer_name": _name(rng),
+            "contact_number": f"07700 9{rng.randint(0, 99999):05d}",
+            "issue_description": rng.choice(DESCRIPTIONS).format(location=location),
+            "preferred_date": preferred,
+            "original_date_input": preferred,
+            "address": f"{rng.randint(1, 200)} High Street",
+            "urgency": urgency,
+            "status": rng.choice(["pending", "confirmed", "completed"]),
+            "created_at": created.isoformat(),
+            "assigned_technician": None,
+            "estimated_time_slot": "ASAP" if urgency == "critical" else rng.choice(TIME_SLOTS)
+        })
+    return records
+
+
+def make_issues(n: int, seed: int = 2, now: datetime = None) -> List[Dict]:
+    rng = random.Random(seed)
+    clock = _Clock(n, now or datetime.now())
+    records = []
+    for i in range(n):
+        ms, created = clock.at(i)
+        location = rng.choice(LOCATIONS)
+        resolved = rng.random() < 0.6
+        records.append({
+            "issue_id": _record_id("ISSUE", ms, i),
+            "customer_name": _name(rng),
+            "issue_type": rng.choice(ISSUE_TYPES),
+            "description": rng.choice(DESCRIPTIONS).format(location=location),
+            "location": location,
+            "severity": rng.choice(SEVERITIES),
+            "contact_info": None,
+            "status": "resolved" if resolved else "open",
+            "created_at": created.isoformat(),
+            "last_updated": created.isoformat(),
+            "notes": [],
+            "resolved": resolved
+        })
+    return records
+
+
+def make_tickets(n: int, seed: int = 3, now: datetime = None) -> List[Dict]:
+    from langchain_tools import TICKET_PRIORITY_MAP
+
+    rng = random.Random(seed)
+    clock = _Clock(n, now or datetime.now())
+    records = []
+    for i in range(n):
+        ms, created = clock.at(i)
+        severity = rng.choice(SEVERITIES)
+        location = rng.choice(LOCATIONS)
+        immediate = severity == "critical" or rng.random() < 0.05
+        priority = TICKET_PRIORITY_MAP[severity]
+        records.append({
+            "ticket_id": _record_id("TKT", ms, i),
+            "issue_type": rng.choice(ISSUE_TYPES),
+            "severity": severity,
+            "priority": priority["priority"],
+            "description": rng.choice(DESCRIPTIONS).format(location=location),
+            "customer_name": _name(rng),
+            "location": location,
+            "requires_immediate_action": immediate,
+            "status": rng.choice(["open", "in_progress", "resolved", "closed"]),
+            "assigned_to": None,
+            "created_at": created.isoformat(),
+            "response_time_target": priority["response_time"],
+            "resolution_notes": [],
+            "escalated": severity in ["high", "critical"] or immediate
+        })
+    return records
+
+
+def make_escalations(n: int, seed: int = 4, now: datetime = None) -> List[Dict]:
+    rng = random.Random(seed)
+    clock = _Clock(n, now or datetime.now())
+    records = []
+    for i in range(n):
+        ms, created = clock.at(i)
+        records.append({
+            "escalation_id": _record_id("ESC", ms, i),
+            "reason": rng.choice(["frustrated_customer", "complex_issue", "safety_concern", "customer_request"]),
+            "customer_name": _name(rng),
+            "issue_summary": rng.choice(DESCRIPTIONS).format(location=rng.choice(LOCATIONS)),
+            "urgency": rng.choice(URGENCIES),
+            "conversation_summary": None,
+            "status": rng.choice(["pending", "resolved"]),
+            "created_at": created.isoformat(),
+            "assigned_agent": None,
+            "estimated_wait_time": "Agent available within 15 minutes",
+            "resolved": False
+        })
+    return records
+
+
+def make_conversation(turns: int, seed: int = 5) -> List[Dict]:
+    """Alternating user/assistant messages for memory benchmarks"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(turns):
+        messages.append({"role": "user", "content": rng.choice(USER_MESSAGES)})
+        messages.append({"role": "assistant", "content": rng.choice(ASSISTANT_MESSAGES)})
+    return messages
+
+
+GENERATORS = {
+    "bookings.json": make_bookings,
+    "customer_issues.json": make_issues,
+    "tickets.json": make_tickets,
+    "escalations.json": make_escalations
+}
+
+
+def ensure_dataset(size_label: str, cache_dir: str) -> str:
+    """Generate (once) and return the directory holding the dataset files for a size"""
+    n = SIZES[size_label]
+    directory = os.path.join(cache_dir, size_label)
+    os.makedirs(directory, exist_ok=True)
+    for filename, generate in GENERATORS.items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(generate(n), f, indent=2)
+            os.replace(tmp_path, path)
+    return directory
@@ -0,0 +1,272 @@
+"""
+Customer 360 index over bookings, issues, tickets and escalations.
+
+Every record is indexed under a normalized name key and, when it carries a
+phone number, a normalized phone key; records that carry both link the two,
+so a lookup by phone also finds that customer's name-only records. A name is
+not an identity, so only a phone match is added to the model's context
+automatically; a name lookup through the tool is flagged as ambiguous. The index
+is built from the data files on first use and then kept current from the
+storage write hook in langchain_tools. A write from another process is
+detected by file version, and only the records it appended or changed are
+re-indexed (record_stream.changes).
+"""
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import langchain_tools
+import record_stream
+
+
+KINDS = ["bookings", "issues", "tickets", "escalations"]
+
+CONTACT_FIELDS = ["contact_number", "contact_info"]
+
+# Facts from the fact extractor that identify the customer
+CONTACT_FACTS = ["contact_number", "phone", "phone_number", "contact"]
+
+MIN_PHONE_DIGITS = 7
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(name: Optional[str]) -> str:
+    text = re.sub(r"[^a-z0-9 ]", " ", (name or "").lower())
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=65536)
+def normalize_phone(text: Optional[str]) -> str:
+    """Digits only, with a +44 prefix folded to a leading 0; '' if too short to be a phone number"""
+    digits = re.sub(r"\D", "", text or "")
+    if digits.startswith("44") and len(digits) == 12:
+        digits = "0" + digits[2:]
+    return digits if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def lookup_key(name_or_contact: str) -> str:
+    phone = normalize_phone(name_or_contact)
+    if phone:
+        return f"phone:{phone}"
+    name = normalize_name(name_or_contact)
+    return f"name:{name}" if name else ""
+
+
+class CustomerIndex:
+
+    def __init__(self):
+        self.files = dict(langchain_tools.RECORD_TYPES)
+        self.id_fields = {kind: langchain_tools.ID_FIELDS[filepath] for filepath, kind in self.files.items()}
+        self._lock = threading.RLock()
+        # kind -> key -> records, in file (ID) order
+        self._records: Dict[str, Dict[str, List[Dict]]] = {kind: {} for kind in KINDS}
+        # kind -> phone key -> name keys seen with that phone (and how many records link them)
+        self._links: Dict[str, Dict[str, Counter]] = {kind: {} for kind in KINDS}
+        # kind -> record ID -> the indexed copy
+        self._by_id: Dict[str, Dict[str, Dict]] = {kind: {} for kind in KINDS}
+        self._checkpoints: Dict[str, record_stream.Checkpoint] = {}
+
+    @staticmethod
+    def _keys(record: Dict):
+        """(name key, phone key) of a record; either may be ''"""
+        name = normalize_name(record.get("customer_name"))
+        phone = ""
+        for field in CONTACT_FIELDS:
+            phone = normalize_phone(record.get(field))
+            if phone:
+                break
+        return (f"name:{name}" if name else "", f"phone:{phone}" if phone else "")
+
+    def _add(self, kind: str, record: Dict):
+        id_field = self.id_fields[kind]
+        self._by_id[kind][record[id_field]] = record
+        name_key, phone_key = self._keys(record)
+        records = self._records[kind]
+        for key in (name_key, phone_key):
+            if key:
+                langchain_tools._insert_sorted(records.setdefault(key, []), record, id_field)
+        if name_key and phone_key:
+            self._links[kind].setdefault(phone_key, Counter())[name_key] += 1
+
+    def _remove(self, kind: str, record: Dict):
+        """Drop an indexed record from every key it was filed under"""
+        id_field = self.id_fields[kind]
+        del self._by_id[kind][record[id_field]]
+        name_key, phone_key = self._keys(record)
+        records = self._records[kind]
+        for key in (name_key, phone_key):
+            if key in records:
+                records[key] = [r for r in records[key] if r[id_field] != record[id_field]]
+                if not records[key]:
+                    del records[key]
+        if name_key and phone_key:
+            links = self._links[kind][phone_key]
+            links[name_key] -= 1
+            if links[name_key] <= 0:
+                del links[name_key]
+
+    def _catch_up(self, filepath: str, full: bool = False):
+        """Index the records appended to or changed in filepath since it was last read"""
+        kind = self.files[filepath]
+        checkpoint = None if full else self._checkpoints.get(filepath)
+        with record_stream.changes(filepath, checkpoint) as (records, checkpoint, rebuild):
+            if rebuild:
+                self._records[kind] = {}
+                self._links[kind] = {}
+                self._by_id[kind] = {}
+            for record in records:
+                existing = self._by_id[kind].get(record[self.id_fields[kind]])
+                if existing is not None:
+                    # refiled under its current keys, which a merge may have changed
+                    self._remove(kind, existing)
+                self._add(kind, record)
+        self._checkpoints[filepath] = checkpoint
+
+    def refresh(self):
+        """Catch up with writes made outside this process since a file was last seen"""
+        with self._lock:
+            for filepath in self.files:
+                checkpoint = self._checkpoints.get(filepath)
+                if checkpoint is None or langchain_tools.file_version(filepath) != checkpoint.version:
+                    self._catch_up(filepath)
+
+    def on_write(self, filepath: str, records: Optional[List[Dict]], previous_version: tuple, updated=()):
+        kind = self.files.get(filepath)
+        if kind is None:
+            return
+        with self._lock:
+            if filepath not in self._checkpoints:
+                return  # not built yet; the first lookup reads the file
+            # the file has this write's records, and any writes from elsewhere since the last read
+            self._catch_up(filepath, full=records is None)
+
+    def lookup(self, name_or_contact: str) -> Dict[str, List[Dict]]:
+        """Records per kind for a customer name or phone number"""
+        key = lookup_key(name_or_contact)
+        self.refresh()
+        result = {kind: [] for kind in KINDS}
+        if not key:
+            return result
+
+        with self._lock:
+            for kind in KINDS:
+                records = self._records[kind]
+                keys = [key]
+                if key.startswith("phone:"):
+                    # name-only records of the customer(s) who gave this number anywhere
+                    for links in self._links.values():
+                        keys.extend(links.get(key, ()))
+                seen = set()
+                for k in keys:
+                    for record in records.get(k, ()):
+                        if k != key and self._keys(record)[1]:
+                            continue  # under a linked name, but filed with another number
+                        if id(record) not in seen:
+                            seen.add(id(record))
+                            result[kind].append(record)
+                if len(keys) > 1:
+                    id_field = self.id_fields[kind]
+                    result[kind].sort(key=lambda r: langchain_tools.id_sort_key(r[id_field]))
+        return result
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> CustomerIndex:
+    """Process-wide index, kept current by the storage write hook"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CustomerIndex()
+            langchain_tools.add_write_listener(_index.on_write)
+        return _index
+
+
+def get_customer_profile(name_or_contact: str) -> Dict:
+    """
+    A customer's bookings, issues, tickets and escalations in one lookup. A
+    name lookup is marked ambiguous: anyone sharing the name is included.
+    """
+    key = lookup_key(name_or_contact or "")
+    if not key:
+        return {"status": "error", "message": "A customer name or contact number is required"}
+
+    records = get_index().lookup(name_or_contact)
+    if not any(records.values()):
+        return {"status": "not_found", "message": f"No records found for '{name_or_contact}'"}
+
+    names = [r["customer_name"] for kind in KINDS for r in records[kind] if r.get("customer_name")]
+    contacts = []
+    for kind in KINDS:
+        for r in records[kind]:
+            for field in CONTACT_FIELDS:
+                if r.get(field) and r[field] not in contacts:
+                    contacts.append(r[field])
+
+    return {
+        "status": "success",
+        "customer_name": names[-1] if names else None,
+        "contact_numbers": contacts,
+        "matched_by": key.split(":", 1)[0],
+        "ambiguous": key.startswith("name:"),
+        "counts": {kind: len(records[kind]) for kind in KINDS},
+        **{kind: list(records[kind]) for kind in KINDS}
+    }
+
+
+def _is_open(record: Dict) -> bool:
+    return not record.get("resolved") and record.get("status") not in ("resolved", "closed", "completed", "cancelled")
+
+
+def summarize_profile(profile: Dict, max_items: int = 3) -> str:
+    """Compact text summary of a profile for the model's context"""
+    if profile.get("status") != "success":
+        return ""
+
+    name = profile.get("customer_name") or "Unknown"
+    contacts = ", ".join(profile["contact_numbers"][:2])
+    lines = [f"Customer Profile: {name}" + (f" ({contacts})" if contacts else "")]
+
+    bookings = profile["bookings"][-max_items:]
+    if bookings:
+        items = "; ".join(f"{b['preferred_date']} {b['status']} - {b['issue_description'][:60]}" for b in reversed(bookings))
+        lines.append(f"  • Bookings ({profile['counts']['bookings']}): {items}")
+
+    open_issues = [i for i in profile["issues"] if _is_open(i)]
+    if open_issues:
+        items = "; ".join(f"{i['issue_type']} in {i['location']} ({i['severity']})" for i in reversed(open_issues[-max_items:]))
+        lines.append(f"  • Open issues ({len(open_issues)}): {items}")
+
+    open_tickets = [t for t in profile["tickets"] if _is_open(t)]
+    if open_tickets:
+        items = "; ".join(f"{t['ticket_id']} {t['issue_type']} {t['severity']}" for t in reversed(open_tickets[-max_items:]))
+        lines.append(f"  • Open tickets ({len(open_tickets)}): {items}")
+
+    escalations = profile["escalations"][-max_items:]
+    if escalations:
+        items = "; ".join(f"{e['reason']} ({e['status']})" for e in reversed(escalations))
+        lines.append(f"  • Escalations ({profile['counts']['escalations']}): {items}")
+
+    return "\n".join(lines)
+
+
+def get_customer_profile_summary(name_or_contact: str, max_items: int = 3) -> str:
+    return summarize_profile(get_customer_profile(name_or_contact), max_items)
+
+
+def profile_summary_for_facts(facts: Dict) -> str:
+    """
+    Summary for the customer whose phone number is in the conversation's facts,
+    or ''. A name alone isn't enough: the summary is shown to whoever is chatting.
+    """
+    for fact in CONTACT_FACTS:
+        value = facts.get(fact)
+        if isinstance(value, str) and normalize_phone(value):
+            summary = get_customer_profile_summary(value)
+            if summary:
+                return summary
+    return ""
@@ -0,0 +1,162 @@
+"""
+Flexible date parsing for bookings and availability checks.
+
+The grammar is compiled once at import, month names are matched as whole
+tokens (so "mar" no longer matches inside "summary"), and results are
+memoized per (input, today) in a bounded LRU so the availability check and
+the booking that follows it don't parse the same string twice.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+
+CACHE_SIZE = 4096
+
+ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+DAY_RE = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?\b')
+WORD_RE = re.compile(r'[a-z]+')
+
+MONTHS = {
+    'january': 1, 'jan': 1,
+    'february': 2, 'feb': 2,
+    'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'may': 5,
+    'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12
+}
+
+KEYWORD_OFFSETS = {
+    "today": 0,
+    "now": 0,
+    "tomorrow": 1
+}
+
+PHRASE_OFFSETS = [
+    ("next week", 7),
+    ("next month", 30)
+]
+
+
+def _find_month(text: str) -> Optional[int]:
+    for word in WORD_RE.findall(text):
+        month = MONTHS.get(word)
+        if month is not None:
+            return month
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text: str, today: date):
+    """Returns (date string, None) or (None, error message); errors are cached too"""
+    if text in KEYWORD_OFFSETS:
+        return (today + timedelta(days=KEYWORD_OFFSETS[text])).strftime("%Y-%m-%d"), None
+
+    for phrase, days in PHRASE_OFFSETS:
+        if phrase in text:
+            return (today + timedelta(days=days)).strftime("%Y-%m-%d"), None
+
+    if ISO_DATE_RE.match(text):
+        return text, None
+
+    day_match = DAY_RE.search(text)
+    if not day_match:
+        return None, f"Could not parse date: '{text}'. Use format like '21', 'March 15', or '2025-03-15'"
+
+    day = int(day_match.group(1))
+    month = _find_month(text)
+    year = today.year
+
+    if month is None:
+        month = today.month
+        if day < today.day:
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+    elif month < today.month or (month == today.month and day < today.day):
+        year += 1
+
+    try:
+        return date(year, month, day).strftime("%Y-%m-%d"), None
+    except ValueError:
+        return None, f"Invalid date: day {day} doesn't exist in month {month}"
+
+
+def parse_flexible_date(date_input: str, today: Optional[date] = None) -> str:
+    """
+    Parse flexible date formats and convert to YYYY-MM-DD.
+    Assumes current year and month when not specified.
+
+    Supported formats:
+    - "21" or "21st" → current year and month, day 21
+    - "March 15" or "15 March" → current year, March 15
+    - "2025-03-15" → exact date
+    - "tomorrow" → tomorrow's date
+    - "next week" → 7 days from now
+    - "next month" → same day next month
+
+    Args:
+        date_input: Flexible date string
+        today: Reference date (defaults to the current date)
+
+    Returns:
+        Date in YYYY-MM-DD format
+    """
+    if today is None:
+        today = datetime.now().date()
+    elif isinstance(today, datetime):
+        today = today.date()
+
+    parsed, error = _parse(date_input.lower().strip(), today)
+    if error:
+        raise ValueError(error)
+    return parsed
+
+
+def parse_flexible_dates(date_inputs: Iterable[str], today: Optional[date] = None,
+                         errors: str = "raise") -> List[Optional[str]]:
+    """
+    Parse many date strings at once. Each distinct input is parsed only once.
+
+    Args:
+        date_inputs: Flexible date strings
+        today: Reference date (defaults to the current date)
+        errors: "raise" to raise on the first unparseable input, "coerce" to return None for it
+
+    Returns:
+        List of YYYY-MM-DD strings (or None when coerced), in input order
+    """
+    if errors not in ("raise", "coerce"):
+        raise ValueError("errors must be 'raise' or 'coerce'")
+
+    if today is None:
+        today = datetime.now().date()
+    elif isinstance(today, datetime):
+        today = today.date()
+
+    resolved = {}
+    results = []
+    for date_input in date_inputs:
+        if date_input not in resolved:
+            parsed, error = _parse(date_input.lower().strip(), today)
+            if error and errors == "raise":
+                raise ValueError(error)
+            resolved[date_input] = parsed
+        results.append(resolved[date_input])
+    return results
+
+
+def cache_info():
+    return _parse.cache_info()
+
+
+def clear_cache():
+    _parse.cache_clear()
@@ -0,0 +1,207 @@
+"""
+Near-duplicate detection for open issues and tickets.
+
+Open records are bucketed by normalized customer, contact (phone number, or
+address / email text), issue type and location; within a bucket, a new report
+is a duplicate of an open record when their description shingle hashes overlap
+by at least DEDUP_THRESHOLD (overlap coefficient, so a longer retelling of the
+same problem still matches). Records without a real customer name or without
+contact details are never merged, since nothing ties two such reports to the
+same caller, and an empty description matches nothing unless DEDUP_THRESHOLD=0. The
+index is consulted inside the file's storage lock by the deduplicating write
+path in langchain_tools, and kept current by the storage write hook.
+
+Config (env):
+    DEDUP_THRESHOLD   minimum description overlap, 0-1 (default 0.5); 0 matches on the bucket alone
+    DEDUP_ENABLED     "0" to always append (default enabled)
+"""
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import langchain_tools
+import record_stream
+from customer_index import normalize_name, normalize_phone
+
+
+DEFAULT_THRESHOLD = 0.5
+
+# Customer names the model fills in when it doesn't know the caller
+PLACEHOLDER_NAMES = {"unknown", "unknown customer", "unknown caller", "unknown user", "customer", "the customer",
+                     "anonymous", "anonymous user", "anon", "caller", "guest", "guest user", "visitor", "client",
+                     "resident", "tenant", "occupant", "homeowner", "someone", "me", "name", "no name", "none",
+                     "n a", "na", "not provided", "not given", "user", "test"}
+
+STOP_WORDS = {
+    "the", "and", "for", "from", "with", "this", "that", "there", "are", "was", "has", "have",
+    "been", "into", "onto", "its", "our", "your", "my", "in", "on", "of", "to", "a", "an", "is", "it", "at"
+}
+
+
+def dedup_enabled() -> bool:
+    return os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False")
+
+
+def dedup_threshold() -> float:
+    return float(os.getenv("DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+
+
+@lru_cache(maxsize=65536)
+def content_tokens(text: Optional[str]) -> Tuple[str, ...]:
+    """Lowercased content words with stop words and plural/verb suffixes stripped"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if word in STOP_WORDS or len(word) < 3:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tuple(tokens)
+
+
+def shingle_hashes(description: Optional[str]) -> FrozenSet[int]:
+    """
+    CRC32 hashes of the description's content words. Reports are short, so word
+    pairs mostly just dilute the overlap between two tellings of the same problem.
+    """
+    return frozenset(zlib.crc32(token.encode("utf-8")) for token in content_tokens(description))
+
+
+def similarity(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Overlap coefficient; an empty description overlaps nothing"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def contact_key(record: Dict) -> str:
+    """Phone number digits if the contact details hold one, else the normalized text (address / email)"""
+    contact = record.get("contact_info") or record.get("contact_number") or ""
+    return normalize_phone(contact) or normalize_name(contact)
+
+
+def bucket_key(record: Dict) -> Optional[Tuple[str, str, str, str]]:
+    """None if the record can't be tied to a caller (placeholder name or no contact details)"""
+    customer = normalize_name(record.get("customer_name"))
+    contact = contact_key(record)
+    if not customer or customer in PLACEHOLDER_NAMES or not contact:
+        return None
+    location = " ".join(sorted(set(content_tokens(record.get("location")))))
+    return (
+        customer,
+        contact,
+        (record.get("issue_type") or "").strip().lower(),
+        location
+    )
+
+
+def is_open(record: Dict) -> bool:
+    return record.get("status", "open") == "open" and not record.get("resolved")
+
+
+class DuplicateIndex:
+    """Open records of one data file, bucketed for duplicate lookup"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.id_field = langchain_tools.ID_FIELDS[filepath]
+        self.version = None
+        # how far the file has been read, for an index kept current from storage
+        self.checkpoint: Optional[record_stream.Checkpoint] = None
+        self.lock = threading.RLock()
+        self._buckets: Dict[Tuple[str, str, str, str], Dict[str, FrozenSet[int]]] = {}
+        self._bucket_of: Dict[str, Tuple[str, str, str, str]] = {}
+
+    def rebuild(self, data: Iterable[Dict], version: tuple):
+        with self.lock:
+            self._buckets = {}
+            self._bucket_of = {}
+            for record in data:
+                self.add(record)
+            self.version = version
+
+    def add(self, record: Dict):
+        """Index (or re-index) a record; closed records are dropped"""
+        record_id = record[self.id_field]
+        with self.lock:
+            self.remove(record_id)
+            key = bucket_key(record)
+            if key is None or not is_open(record):
+                return
+            self._buckets.setdefault(key, {})[record_id] = shingle_hashes(record.get("description"))
+            self._bucket_of[record_id] = key
+
+    def remove(self, record_id: str):
+        with self.lock:
+            key = self._bucket_of.pop(record_id, None)
+            if key is not None:
+                bucket = self._buckets[key]
+                bucket.pop(record_id, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def find(self, record: Dict, threshold: Optional[float] = None) -> Optional[str]:
+        """ID of the most similar open duplicate of record, or None"""
+        threshold = dedup_threshold() if threshold is None else threshold
+        key = bucket_key(record)
+        if key is None:
+            return None
+        with self.lock:
+            bucket = self._buckets.get(key)
+            if not bucket:
+                return None
+            hashes = shingle_hashes(record.get("description"))
+            best_id, best_score = None, threshold
+            for record_id, existing in bucket.items():
+                score = similarity(hashes, existing)
+                if score >= best_score:
+                    best_id, best_score = record_id, score
+            return best_id
+
+    def catch_up(self, full: bool = False):
+        """Index the records appended to or changed in the file since it was last read (under the storage lock)"""
+        with self.lock, record_stream.changes(self.filepath, None if full else self.checkpoint) as \
+                (records, checkpoint, rebuild):
+            if rebuild:
+                self._buckets = {}
+                self._bucket_of = {}
+            for record in records:
+                self.add(record)
+            self.checkpoint = checkpoint
+            self.version = checkpoint.version
+
+    def sync(self, data: List[Dict], version: tuple):
+        """Called under the storage lock with the file's current contents"""
+        with self.lock:
+            if self.checkpoint is None:
+                self.rebuild(data, version)
+                with record_stream.changes(self.filepath) as (_, self.checkpoint, _):
+                    pass  # data is the whole file, already indexed
+            elif self.version != version:
+                self.catch_up()
+
+    def on_write(self, filepath: str, records: Optional[List[Dict]], previous_version: tuple, updated=()):
+        if filepath != self.filepath:
+            return
+        with self.lock:
+            if self.checkpoint is None or self.version == langchain_tools.file_version(filepath):
+                return  # not built yet, or already applied by the deduplicating writer
+            self.catch_up(full=records is None)
+
+
+_indexes: Dict[str, DuplicateIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_duplicate_index(filepath: str) -> DuplicateIndex:
+    with _indexes_lock:
+        index = _indexes.get(filepath)
+        if index is None:
+            index = _indexes[filepath] = DuplicateIndex(filepath)
+            langchain_tools.add_write_listener(index.on_write)
+        return index
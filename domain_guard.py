@@ -0,0 +1,199 @@
+"""
+Local domain guard: answers clearly off-topic messages before any LLM call.
+
+A small logistic regression over TF-IDF word unigrams and bigrams is trained
+with NumPy from the bundled labeled examples (DOMAIN_GUARD_EXAMPLES_PATH,
+default domain_guard_examples.json) once per process, under a lock so
+concurrent first checks share one training run, and again only if the file
+changes. Apps call DomainGuard.warm_up() at startup so no turn waits for it. Scoring a message is a sparse dot product over
+its known terms, tens of microseconds per message. Words the model has never
+seen carry no weight, so a message is only blocked when it looks like the
+off-topic examples, never just for being unfamiliar. Messages that match a
+tool intent (see tool_selection.py) always pass.
+
+Messages whose off-topic probability is at or above the threshold get a
+canned reply instead of fact extraction and a completion. Short follow-ups
+("tomorrow works") look off-topic on their own, so inside a conversation that
+already has an active maintenance intent the follow-up threshold applies
+instead. Blocked / passed counts and check latency are exposed through
+get_stats(); each check is also recorded as a "domain_guard" span.
+
+Config (env):
+    DOMAIN_GUARD                     "0" to let every message through (default enabled)
+    DOMAIN_GUARD_THRESHOLD           off-topic probability that blocks a message (default 0.8)
+    DOMAIN_GUARD_FOLLOWUP_THRESHOLD  the same, mid-conversation (default 0.9)
+    DOMAIN_GUARD_EXAMPLES_PATH       labeled examples: {"in_domain": [...], "off_topic": [...]}
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from tool_registry import ToolStats
+from tool_selection import classify_intents
+
+
+DEFAULT_EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_guard_examples.json")
+
+REFUSAL = (
+    "I can only help with home maintenance: repairs, leaks, damp and mould, heating, "
+    "electrics, safety issues and booking a technician. Is there a problem in your home I can help with?"
+)
+
+_WORDS = re.compile(r"[a-z0-9']+")
+
+
+def features(text: str) -> List[str]:
+    """Unigrams and bigrams of a message"""
+    words = _WORDS.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class DomainClassifier:
+    """Off-topic probability from per-term weights (weight x idf folded together)"""
+
+    def __init__(self, weights: Dict[str, float], idf: Dict[str, float], bias: float):
+        self.weights = weights
+        self.idf = idf
+        self.bias = bias
+
+    @classmethod
+    def train(cls, in_domain: List[str], off_topic: List[str], epochs: int = 400,
+              learning_rate: float = 8.0, l2: float = 1e-4) -> "DomainClassifier":
+        # imported here so loading the pipeline before first paint doesn't pay for NumPy
+        import numpy as np
+
+        docs = [set(features(text)) for text in in_domain + off_topic]
+        labels = np.array([0.0] * len(in_domain) + [1.0] * len(off_topic))
+
+        vocab = sorted(set().union(*docs))
+        index = {term: i for i, term in enumerate(vocab)}
+        df = np.zeros(len(vocab))
+        for doc in docs:
+            df[[index[term] for term in doc]] += 1
+        idf = np.log((1 + len(docs)) / (1 + df)) + 1
+
+        x = np.zeros((len(docs), len(vocab)))
+        for row, doc in enumerate(docs):
+            cols = [index[term] for term in doc]
+            x[row, cols] = idf[cols]
+        x /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+        w = np.zeros(len(vocab))
+        b = 0.0
+        for _ in range(epochs):
+            p = 1 / (1 + np.exp(-(x @ w + b)))
+            error = p - labels
+            w -= learning_rate * (x.T @ error / len(docs) + l2 * w)
+            b -= learning_rate * error.mean()
+
+        return cls({term: float(w[i] * idf[i]) for i, term in enumerate(vocab)},
+                   {term: float(idf[i]) for i, term in enumerate(vocab)}, float(b))
+
+    def predict_proba(self, text: str) -> float:
+        score = norm = 0.0
+        for term in set(features(text)):
+            weight = self.weights.get(term)
+            if weight is not None:
+                score += weight
+                norm += self.idf[term] ** 2
+        z = self.bias + (score / math.sqrt(norm) if norm else 0.0)
+        return 1 / (1 + math.exp(-z))
+
+
+def load_examples(path: Optional[str] = None) -> Dict[str, List[str]]:
+    path = path or os.getenv("DOMAIN_GUARD_EXAMPLES_PATH", DEFAULT_EXAMPLES_PATH)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=4)
+def _train(path: str, mtime: float) -> DomainClassifier:
+    examples = load_examples(path)
+    return DomainClassifier.train(examples["in_domain"], examples["off_topic"])
+
+
+_train_lock = threading.Lock()
+
+
+def get_classifier(path: Optional[str] = None) -> DomainClassifier:
+    """Train once per examples file (retrained only if the file changes)"""
+    path = path or os.getenv("DOMAIN_GUARD_EXAMPLES_PATH", DEFAULT_EXAMPLES_PATH)
+    mtime = os.path.getmtime(path)
+    # lru_cache alone lets every concurrent first caller train its own copy
+    with _train_lock:
+        return _train(path, mtime)
+
+
+class GuardDecision:
+
+    def __init__(self, allowed: bool, off_topic: float, elapsed_ms: float):
+        self.allowed = allowed
+        self.off_topic = off_topic
+        self.elapsed_ms = elapsed_ms
+
+
+class DomainGuard:
+
+    def __init__(self, classifier: Optional[DomainClassifier] = None, threshold: Optional[float] = None,
+                 followup_threshold: Optional[float] = None, enabled: Optional[bool] = None, reply: str = REFUSAL):
+        self.enabled = enabled if enabled is not None else \
+            os.getenv("DOMAIN_GUARD", "1") not in ("0", "false", "False")
+        # None: the classifier for the current examples file, looked up on each check
+        self._classifier = classifier
+        self.threshold = threshold if threshold is not None else float(os.getenv("DOMAIN_GUARD_THRESHOLD", 0.8))
+        self.followup_threshold = followup_threshold if followup_threshold is not None else \
+            float(os.getenv("DOMAIN_GUARD_FOLLOWUP_THRESHOLD", 0.9))
+        self.reply = reply
+        self._counts = {"checked": 0, "blocked": 0, "passed": 0}
+        self._latency = ToolStats()
+        self._lock = threading.Lock()
+
+    @property
+    def classifier(self) -> DomainClassifier:
+        return self._classifier or get_classifier()
+
+    def warm_up(self):
+        """Train the classifier now rather than on the first check"""
+        if self.enabled and self._classifier is None:
+            get_classifier()
+
+    def check(self, message: str, in_conversation: bool = False) -> GuardDecision:
+        """in_conversation: the conversation already has an active maintenance intent"""
+        if not self.enabled:
+            return GuardDecision(True, 0.0, 0.0)
+        # outside the timed part: a (re)training is not check latency
+        classifier = self.classifier
+        start = time.perf_counter()
+        off_topic = classifier.predict_proba(message)
+        threshold = self.followup_threshold if in_conversation else self.threshold
+        allowed = off_topic < threshold or bool(classify_intents(message))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._counts["checked"] += 1
+            self._counts["passed" if allowed else "blocked"] += 1
+            self._latency.record(elapsed_ms, True)
+        return GuardDecision(allowed, off_topic, elapsed_ms)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"enabled": self.enabled, "threshold": self.threshold,
+                    "followup_threshold": self.followup_threshold, **self._counts,
+                    "latency_ms": self._latency.to_dict()}
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_guard() -> DomainGuard:
+    """Process-wide guard shared by every session"""
+    global _guard
+    with _guard_lock:
+        if _guard is None:
+            _guard = DomainGuard()
+        return _guard
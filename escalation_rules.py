@@ -0,0 +1,246 @@
+"""
+Declarative escalation rules, compiled once and evaluated incrementally.
+
+Rules live in a JSON config (ESCALATION_RULES_PATH, default the bundled
+escalation_rules.json, which is their only definition) and are conditions
+over a small conversation state:
+
+    turn_count, tool_call_count, is_frustrated, is_anxious, is_urgent,
+    tone, repeated_questions, critical_safety, session_tokens,
+    token_budget_exceeded
+
+Each conversation gets an EscalationRuleEngine. Events (new turn, tool call,
+sentiment change) update the state, and only rules that read a changed field
+are re-evaluated, so a single evaluation costs O(rules changed).
+"""
+import json
+import operator
+import os
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from memory import SEVERITY_LEVELS, SEVERITY_RANK, question_words, is_repeating
+
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "escalation_rules.json")
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "in": lambda value, options: value in options
+}
+
+STATE_FIELDS = {
+    "turn_count": 0,
+    "tool_call_count": 0,
+    "is_frustrated": False,
+    "is_anxious": False,
+    "is_urgent": False,
+    "tone": "calm",
+    "repeated_questions": False,
+    "critical_safety": False,
+    "session_tokens": 0,
+    "token_budget_exceeded": False
+}
+
+
+class CompiledRule:
+
+    def __init__(self, index: int, spec: dict):
+        self.index = index
+        self.name = spec["name"]
+        self.reason = spec.get("reason", self.name)
+        self.exclusive = bool(spec.get("exclusive", False))
+
+        severity = spec.get("severity", "medium")
+        if severity not in SEVERITY_RANK:
+            raise ValueError(f"Rule '{self.name}': unknown severity '{severity}', expected one of {SEVERITY_LEVELS}")
+        self.severity = severity
+        self.rank = SEVERITY_RANK[severity]
+
+        self.conditions = []
+        for field, condition in spec.get("when", {}).items():
+            if field not in STATE_FIELDS:
+                raise ValueError(f"Rule '{self.name}': unknown field '{field}'")
+            if not isinstance(condition, dict):
+                condition = {"==": condition}
+            for op_name, value in condition.items():
+                if op_name not in OPERATORS:
+                    raise ValueError(f"Rule '{self.name}': unknown operator '{op_name}'")
+                self.conditions.append((field, OPERATORS[op_name], value))
+
+        if not self.conditions:
+            raise ValueError(f"Rule '{self.name}' has no conditions")
+        self.fields = frozenset(field for field, _, _ in self.conditions)
+
+    def matches(self, state: dict) -> bool:
+        return all(op(state[field], value) for field, op, value in self.conditions)
+
+    def format_reason(self, state: dict) -> str:
+        try:
+            return self.reason.format_map(state)
+        except (KeyError, IndexError, ValueError):
+            return self.reason
+
+
+class RuleSet:
+    """Compiled rules plus an index from state field to the rules that read it"""
+
+    def __init__(self, specs: List[dict], path: Optional[str] = None):
+        # the rules file these came from (None: built from specs in memory), so a pickled engine can find them again
+        self.path = path
+        self.specs = specs
+        self.rules = [CompiledRule(i, spec) for i, spec in enumerate(specs)]
+
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Escalation rule names must be unique")
+
+        self.by_field: Dict[str, List[CompiledRule]] = {field: [] for field in STATE_FIELDS}
+        for rule in self.rules:
+            for field in rule.fields:
+                self.by_field[field].append(rule)
+
+
+def rules_path(path: Optional[str] = None) -> str:
+    """The configured rules file, or the bundled one if that doesn't exist"""
+    path = path or os.getenv("ESCALATION_RULES_PATH", DEFAULT_RULES_PATH)
+    return path if os.path.exists(path) else DEFAULT_RULES_PATH
+
+
+def load_rule_specs(path: Optional[str] = None) -> List[dict]:
+    path = rules_path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return config["rules"] if isinstance(config, dict) else config
+
+
+@lru_cache(maxsize=8)
+def _compile(path: str, mtime: float) -> RuleSet:
+    return RuleSet(load_rule_specs(path), path)
+
+
+def get_rule_set(path: Optional[str] = None) -> RuleSet:
+    """Compile the configured rules once (recompiled only if the file changes)"""
+    path = rules_path(path)
+    return _compile(path, os.path.getmtime(path))
+
+
+class EscalationRuleEngine:
+    """Per-conversation escalation state driven by conversation events"""
+
+    def __init__(self, rule_set: Optional[RuleSet] = None):
+        self.rule_set = rule_set or get_rule_set()
+        self.state = dict(STATE_FIELDS)
+        self.active = set()
+        self._severity_counts = [0] * len(SEVERITY_LEVELS)
+        self._exclusive_active = 0
+        self._recent_questions = deque(maxlen=3)
+
+        for rule in self.rule_set.rules:
+            self._apply(rule)
+
+    def __getstate__(self):
+        """
+        Pickled as its state and where its rules came from; they are compiled
+        again (from the file, if it has one) on load
+        """
+        saved = {"state": self.state, "recent_questions": list(self._recent_questions)}
+        if self.rule_set.path:
+            saved["rules_path"] = self.rule_set.path
+        else:
+            saved["rule_specs"] = self.rule_set.specs
+        return saved
+
+    def __setstate__(self, saved):
+        if saved.get("rules_path"):
+            rule_set = get_rule_set(saved["rules_path"])
+        elif saved.get("rule_specs"):
+            rule_set = RuleSet(saved["rule_specs"])
+        else:
+            rule_set = None
+        self.__init__(rule_set)
+        self._recent_questions.extend(saved["recent_questions"])
+        self.update(**{field: value for field, value in saved["state"].items() if field in self.state})
+
+    def update(self, **fields):
+        """Set state fields and re-evaluate only the rules that depend on them"""
+        dirty = {}
+        for field, value in fields.items():
+            if field not in self.state:
+                raise KeyError(f"Unknown escalation state field '{field}'")
+            if self.state[field] != value:
+                self.state[field] = value
+                for rule in self.rule_set.by_field[field]:
+                    dirty[rule.index] = rule
+
+        for rule in dirty.values():
+            self._apply(rule)
+
+    def on_user_turn(self, message: str):
+        self._recent_questions.append(question_words(message))
+        self.update(
+            turn_count=self.state["turn_count"] + 1,
+            repeated_questions=is_repeating(list(self._recent_questions))
+        )
+
+    def on_tool_call(self, count: int = 1):
+        self.update(tool_call_count=self.state["tool_call_count"] + count)
+
+    def on_sentiment(self, sentiment: dict):
+        self.update(
+            tone=sentiment.get("tone", "calm"),
+            is_frustrated=bool(sentiment.get("is_frustrated")),
+            is_anxious=bool(sentiment.get("is_anxious")),
+            is_urgent=bool(sentiment.get("is_urgent"))
+        )
+
+    def set_critical_safety(self, critical: bool):
+        self.update(critical_safety=bool(critical))
+
+    def on_token_usage(self, total_tokens: int, over_budget: bool):
+        self.update(session_tokens=total_tokens, token_budget_exceeded=bool(over_budget))
+
+    def evaluate(self):
+        """
+        Returns:
+            tuple: (should_escalate: bool, reasons: list, severity: str)
+        """
+        if not self.active:
+            return False, [], "low"
+
+        rules = sorted((self.rule_set.rules[i] for i in self.active), key=lambda r: r.index)
+        if self._exclusive_active:
+            rules = [rule for rule in rules if rule.exclusive]
+            severity = SEVERITY_LEVELS[max(rule.rank for rule in rules)]
+        else:
+            severity = self.get_severity()
+
+        reasons = [rule.format_reason(self.state) for rule in rules]
+        return True, reasons, severity
+
+    def get_severity(self) -> str:
+        for rank in range(len(SEVERITY_LEVELS) - 1, -1, -1):
+            if self._severity_counts[rank]:
+                return SEVERITY_LEVELS[rank]
+        return "low"
+
+    def _apply(self, rule: CompiledRule):
+        matched = rule.matches(self.state)
+        was_active = rule.index in self.active
+        if matched == was_active:
+            return
+
+        delta = 1 if matched else -1
+        if matched:
+            self.active.add(rule.index)
+        else:
+            self.active.discard(rule.index)
+        self._severity_counts[rule.rank] += delta
+        if rule.exclusive:
+            self._exclusive_active += delta
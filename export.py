@@ -0,0 +1,320 @@
+"""
+Parquet export of bookings, issues, tickets and escalations for analytics.
+
+Each dataset is streamed from its data file (record_stream.scan) in
+chunks and written with an explicit schema to Hive-style date partitions:
+
+    <output>/<dataset>/created_date=YYYY-MM-DD/part-<run>-<n>.parquet
+
+Records are ID-ordered and IDs sort by creation time, so an export run keeps
+the last exported ID per dataset in <output>/_export_state.json and the next
+run only writes records created after it. A record's ID is assigned before it
+reaches storage (before the storage lock, or the write-behind queue), so one
+from another process or API worker can land after a newer one; a run therefore
+only exports records created at least EXPORT_SAFETY_LAG_S ago, and the rest
+wait for a later run. Part files are written under a
+hidden name and renamed when the run completes, and the state is only
+advanced after that, so an interrupted run leaves nothing half-exported.
+
+Records merged into after their export (repeat reports) are not re-exported;
+use --full for a complete snapshot. A full run writes each dataset to a hidden
+sibling directory and swaps it in for the old one when it completes, so the
+snapshot replaces earlier exports instead of adding to them.
+
+Usage:
+    python export.py -o exports/
+    python export.py -o exports/ --datasets tickets issues --full
+
+Config (env):
+    EXPORT_SAFETY_LAG_S   minimum age in seconds of an exported record (default 300; --safety-lag)
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import langchain_tools
+import record_stream
+from record_ids import id_timestamp, new_id
+
+
+STATE_FILE = "_export_state.json"
+
+DEFAULT_SAFETY_LAG_S = 300
+
+DATASETS = {
+    "bookings": langchain_tools.BOOKINGS_FILE,
+    "issues": langchain_tools.ISSUES_FILE,
+    "tickets": langchain_tools.TICKETS_FILE,
+    "escalations": langchain_tools.ESCALATIONS_FILE
+}
+
+# Column name -> type name; see _arrow_type
+COLUMNS = {
+    "bookings": [
+        ("booking_id", "string"), ("customer_name", "string"), ("contact_number", "string"),
+        ("issue_description", "string"), ("preferred_date", "date"), ("original_date_input", "string"),
+        ("address", "string"), ("urgency", "string"), ("status", "string"), ("created_at", "timestamp"),
+        ("assigned_technician", "string"), ("estimated_time_slot", "string")
+    ],
+    "issues": [
+        ("issue_id", "string"), ("customer_name", "string"), ("issue_type", "string"),
+        ("description", "string"), ("location", "string"), ("severity", "string"),
+        ("contact_info", "string"), ("status", "string"), ("created_at", "timestamp"),
+        ("last_updated", "timestamp"), ("notes", "notes"), ("resolved", "bool"), ("report_count", "int")
+    ],
+    "tickets": [
+        ("ticket_id", "string"), ("issue_type", "string"), ("severity", "string"), ("priority", "string"),
+        ("description", "string"), ("customer_name", "string"), ("contact_info", "string"),
+        ("location", "string"), ("requires_immediate_action", "bool"), ("status", "string"), ("assigned_to", "string"),
+        ("created_at", "timestamp"), ("last_updated", "timestamp"), ("response_time_target", "string"),
+        ("resolution_notes", "notes"), ("escalated", "bool"), ("report_count", "int")
+    ],
+    "escalations": [
+        ("escalation_id", "string"), ("reason", "string"), ("customer_name", "string"),
+        ("issue_summary", "string"), ("urgency", "string"), ("conversation_summary", "string"),
+        ("status", "string"), ("created_at", "timestamp"), ("assigned_agent", "string"),
+        ("estimated_wait_time", "string"), ("resolved", "bool")
+    ]
+}
+
+
+def _arrow_type(pa, type_name: str):
+    return {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "int": pa.int32(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "notes": pa.list_(pa.struct([("at", pa.timestamp("us")), ("note", pa.string())]))
+    }[type_name]
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce(value, type_name: str):
+    """A record value as the column's Python type; None if it doesn't fit"""
+    if value is None:
+        return None
+    if type_name == "string":
+        return value if isinstance(value, str) else json.dumps(value)
+    if type_name == "bool":
+        return bool(value)
+    if type_name == "int":
+        return value if isinstance(value, int) else None
+    if type_name == "date":
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    if type_name == "timestamp":
+        return _parse_timestamp(value)
+    if type_name == "notes":
+        notes = []
+        for note in value if isinstance(value, list) else []:
+            if isinstance(note, dict):
+                notes.append({"at": _parse_timestamp(note.get("at")), "note": note.get("note")})
+            else:
+                notes.append({"at": None, "note": str(note)})
+        return notes
+    raise ValueError(f"Unknown column type '{type_name}'")
+
+
+def load_state(output_dir: str) -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(output_dir: str, state: Dict[str, Dict]):
+    path = os.path.join(output_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class PartitionWriter:
+    """
+    Writes one dataset's rows to date partitions, a row group per chunk. With
+    replace=True the rows are staged in a hidden directory that replaces the
+    dataset's directory on commit.
+    """
+
+    def __init__(self, dataset: str, output_dir: str, run_id: str, chunk_size: int = 10000, replace: bool = False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.dataset = dataset
+        self.columns = COLUMNS[dataset]
+        self.schema = pa.schema([(name, _arrow_type(pa, type_name)) for name, type_name in self.columns])
+        self.output_dir = output_dir
+        self.run_id = run_id
+        self.replace = replace
+        self.directory = os.path.join(output_dir, dataset)
+        self.root = os.path.join(output_dir, f".{dataset}-{run_id}.tmp") if replace else self.directory
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self.files: List[str] = []
+        self._partition = None
+        self._writer = None
+        self._tmp_path = None
+        self._buffer: List[Dict] = []
+
+    def write(self, record: Dict, partition: str):
+        if partition != self._partition:
+            self._close_file()
+            self._partition = partition
+        self._buffer.append(record)
+        if len(self._buffer) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            directory = os.path.join(self.root, f"created_date={self._partition}")
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{self.run_id}-{len(self.files):05d}.parquet"
+            # dot-prefixed files are skipped by dataset readers until renamed in commit()
+            self._tmp_path = os.path.join(directory, f".{name}.tmp")
+            self.files.append(os.path.join(directory, name))
+            self._writer = self._pq.ParquetWriter(self._tmp_path, self.schema, compression="zstd")
+        columns = {
+            name: [_coerce(record.get(name), type_name) for record in self._buffer]
+            for name, type_name in self.columns
+        }
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def _close_file(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def commit(self):
+        """Close the open file and publish every part written this run"""
+        self._close_file()
+        for path in self.files:
+            directory, name = os.path.split(path)
+            os.replace(os.path.join(directory, f".{name}.tmp"), path)
+        if self.replace:
+            os.makedirs(self.root, exist_ok=True)
+            old = os.path.join(self.output_dir, f".{self.dataset}-{self.run_id}.old")
+            if os.path.exists(self.directory):
+                os.replace(self.directory, old)
+            os.replace(self.root, self.directory)
+            shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for path in self.files:
+            directory, name = os.path.split(path)
+            try:
+                os.remove(os.path.join(directory, f".{name}.tmp"))
+            except FileNotFoundError:
+                pass
+        if self.replace:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def safety_lag() -> float:
+    return float(os.getenv("EXPORT_SAFETY_LAG_S", DEFAULT_SAFETY_LAG_S))
+
+
+def export_dataset(dataset: str, output_dir: str, run_id: str, after_id: Optional[str] = None,
+                   chunk_size: int = 10000, until: Optional[datetime] = None, replace: bool = False) -> Dict:
+    """
+    Export one dataset's records created after after_id (all if None) and no
+    later than until (no limit if None); nothing is published on error. With
+    replace=True the export replaces the dataset's earlier files.
+    """
+    filepath = DATASETS[dataset]
+    id_field = langchain_tools.ID_FIELDS[filepath]
+    writer = PartitionWriter(dataset, output_dir, run_id, chunk_size, replace)
+    last_id = after_id
+    skipped = 0
+    try:
+        # the ID range is found by binary search, so only new records are decoded
+        with closing(record_stream.scan(filepath, id_field, until=until, after_id=after_id)) as records:
+            for record in records:
+                record_id = record.get(id_field)
+                if not record_id:
+                    skipped += 1
+                    continue
+                writer.write(record, id_timestamp(record_id).date().isoformat())
+                last_id = record_id
+        writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+    return {
+        "rows": writer.rows_written,
+        "files": len(writer.files),
+        "skipped": skipped,
+        "last_id": last_id
+    }
+
+
+def run_export(output_dir: str, datasets: Optional[List[str]] = None, full: bool = False,
+               chunk_size: int = 10000, lag_s: Optional[float] = None) -> Dict:
+    """
+    Export each dataset up to lag_s seconds ago (EXPORT_SAFETY_LAG_S by default),
+    advancing its incremental state once its files are published
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+    run_id = new_id("RUN").split("-", 1)[1].lower()
+    lag_s = safety_lag() if lag_s is None else lag_s
+    until = datetime.now() - timedelta(seconds=lag_s)
+    start = time.perf_counter()
+
+    summary = {"run_id": run_id, "output": output_dir, "full": full, "until": until.isoformat(), "datasets": {}}
+    for dataset in datasets or list(DATASETS):
+        after_id = None if full else state.get(dataset, {}).get("last_id")
+        result = export_dataset(dataset, output_dir, run_id, after_id, chunk_size, until, replace=full)
+        summary["datasets"][dataset] = result
+        if result["rows"] or full or dataset not in state:
+            state[dataset] = {"last_id": result["last_id"], "exported_at": datetime.now().isoformat()}
+            save_state(output_dir, state)
+
+    summary["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export maintenance data to partitioned Parquet")
+    parser.add_argument("-o", "--output", default="exports", help="Output directory")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=None,
+                        help="Datasets to export (default: all)")
+    parser.add_argument("--full", action="store_true",
+                        help="Export every record instead of those created since the last run")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per Parquet row group")
+    parser.add_argument("--safety-lag", type=float, default=None,
+                        help="Only export records at least this many seconds old (default EXPORT_SAFETY_LAG_S or 300)")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(run_export(args.output, args.datasets, args.full, args.chunk_size, args.safety_lag), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,144 +1,581 @@
-from langchain.tools import tool
-from langchain_core.tools import Tool
+import functools
 import json
 import os
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
-import random
+from typing import Optional, Dict, Iterator, List
+from contextlib import contextmanager
+import bisect
+import threading
+from record_ids import new_id, id_sort_key
+from date_parsing import parse_flexible_date
+from memory import max_severity
+import record_stream
+from tracing import span
 
-DATA_DIR = "maintenance_data"
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DATA_DIR = os.getenv("MAINTENANCE_DATA_DIR", "maintenance_data")
 BOOKINGS_FILE = os.path.join(DATA_DIR, "bookings.json")
 ISSUES_FILE = os.path.join(DATA_DIR, "customer_issues.json")
 TICKETS_FILE = os.path.join(DATA_DIR, "tickets.json")
 ESCALATIONS_FILE = os.path.join(DATA_DIR, "escalations.json")
+DATA_FILES = [BOOKINGS_FILE, ISSUES_FILE, TICKETS_FILE, ESCALATIONS_FILE]
+RECORD_TYPES = {
+    BOOKINGS_FILE: "bookings",
+    ISSUES_FILE: "issues",
+    TICKETS_FILE: "tickets",
+    ESCALATIONS_FILE: "escalations"
+}
+
+ID_FIELDS = {
+    BOOKINGS_FILE: "booking_id",
+    ISSUES_FILE: "issue_id",
+    TICKETS_FILE: "ticket_id",
+    ESCALATIONS_FILE: "escalation_id"
+}
 
 def init_storage():
 
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    for filepath in [BOOKINGS_FILE, ISSUES_FILE, TICKETS_FILE, ESCALATIONS_FILE]:
+    for filepath in DATA_FILES:
         if not os.path.exists(filepath):
             with open(filepath, 'w') as f:
                 json.dump([], f)
 
 
-init_storage()
+# Storage is created on first write rather than at import; reads of a missing file return []
+_storage_ready = False
+
+def _ensure_storage():
+    global _storage_ready
+    if not _storage_ready:
+        init_storage()
+        _storage_ready = True
 
 def load_json(filepath: str) -> List[Dict]:
     """Load data from JSON file"""
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    with span("storage.load_json", file=os.path.basename(filepath)):
+        try:
+            with open(filepath, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
 
 def save_json(filepath: str, data: List[Dict]):
-    """Save data to JSON file"""
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Save data to JSON file (atomically, so readers never see a partial file)"""
+    with span("storage.save_json", file=os.path.basename(filepath), records=len(data)):
+        _ensure_storage()
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, filepath)
 
-def generate_id(prefix: str) -> str:
-    """Generate unique ID with prefix"""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    random_suffix = random.randint(1000, 9999)
-    return f"{prefix}-{timestamp}-{random_suffix}"
+_thread_locks: Dict[str, threading.RLock] = {}
+_thread_locks_guard = threading.Lock()
+
+@contextmanager
+def storage_lock(filepath: str):
+    """Serialize read-modify-write cycles on a data file across threads and processes"""
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(filepath, threading.RLock())
+    _ensure_storage()
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{filepath}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def file_version(filepath: str) -> tuple:
+    """Cheap change token for a data file; every save replaces the file, so it changes on write"""
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return (0, 0, 0)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def storage_version() -> tuple:
+    return tuple(view_version(filepath) for filepath in DATA_FILES)
 
-def parse_flexible_date(date_input: str) -> str:
+# Listeners are called as listener(filepath, records, previous_version, updated) inside
+# the file's storage lock after every write: records is the list just appended, or None
+# if the file was replaced wholesale, updated holds existing records changed in place,
+# and previous_version is the file_version() before the write, so a listener can tell
+# whether it missed a write from elsewhere
+_write_listeners = []
+
+def add_write_listener(listener):
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def remove_write_listener(listener):
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+def _notify_write(filepath: str, records: Optional[List[Dict]], previous_version: tuple, updated: List[Dict] = ()):
+    for listener in list(_write_listeners):
+        try:
+            listener(filepath, records, previous_version, list(updated))
+        except Exception as e:
+            print(f" Write listener failed for {os.path.basename(filepath)}: {str(e)}")
+
+def _insert_sorted(data: List[Dict], record: Dict, id_field: Optional[str]):
+    if id_field and data and id_sort_key(record[id_field]) < id_sort_key(data[-1][id_field]):
+        bisect.insort(data, record, key=lambda r: id_sort_key(r[id_field]))
+    else:
+        data.append(record)
+
+def _find_by_id(data: List[Dict], id_field: str, record_id: str) -> Optional[Dict]:
+    """Binary search an ID-ordered record list"""
+    key = id_sort_key(record_id)
+    i = bisect.bisect_left(data, key, key=lambda r: id_sort_key(r[id_field]))
+    if i < len(data) and data[i][id_field] == record_id:
+        return data[i]
+    return None
+
+def append_json(filepath: str, records: List[Dict]):
+    """Append records to a JSON file with a single load and save, keeping ID order"""
+    with storage_lock(filepath):
+        previous_version = file_version(filepath)
+        data = load_json(filepath)
+        id_field = ID_FIELDS.get(filepath)
+        for record in records:
+            _insert_sorted(data, record, id_field)
+        save_json(filepath, data)
+        _notify_write(filepath, records, previous_version)
+
+def append_deduplicated(filepath: str, records: List[Dict], merge) -> List[Optional[Dict]]:
     """
-    Parse flexible date formats and convert to YYYY-MM-DD.
-    Assumes current year and month when not specified.
-    
-    Supported formats:
-    - "21" or "21st" → current year and month, day 21
-    - "March 15" or "15 March" → current year, March 15
-    - "2025-03-15" → exact date
-    - "tomorrow" → tomorrow's date
-    - "next week" → 7 days from now
-    - "next month" → same day next month
-    
-    Args:
-        date_input: Flexible date string
-        
-    Returns:
-        Date in YYYY-MM-DD format
+    Like append_json, but a record that near-duplicates an open record (see dedup.py)
+    is merged into it with merge(existing, new) instead of being appended.
+
+    Returns merge's result for each merged record and None for each appended one.
     """
-    import re
-    
-    date_input = date_input.lower().strip()
-    today = datetime.now()
-    
+    from dedup import dedup_enabled, get_duplicate_index
 
-    if date_input in ["today", "now"]:
-        return today.strftime("%Y-%m-%d")
-    
-    if date_input == "tomorrow":
-        return (today + timedelta(days=1)).strftime("%Y-%m-%d")
-    
-    if "next week" in date_input:
-        return (today + timedelta(days=7)).strftime("%Y-%m-%d")
-    
-    if "next month" in date_input:
-   
-        return (today + timedelta(days=30)).strftime("%Y-%m-%d")
-    
-   
-    if re.match(r'^\d{4}-\d{2}-\d{2}$', date_input):
-        return date_input
-    
-    
-    day_match = re.search(r'\b(\d{1,2})(?:st|nd|rd|th)?\b', date_input)
-    
- 
-    months = {
-        'january': 1, 'jan': 1,
-        'february': 2, 'feb': 2,
-        'march': 3, 'mar': 3,
-        'april': 4, 'apr': 4,
-        'may': 5,
-        'june': 6, 'jun': 6,
-        'july': 7, 'jul': 7,
-        'august': 8, 'aug': 8,
-        'september': 9, 'sep': 9, 'sept': 9,
-        'october': 10, 'oct': 10,
-        'november': 11, 'nov': 11,
-        'december': 12, 'dec': 12
+    if not dedup_enabled():
+        append_json(filepath, records)
+        return [None] * len(records)
+
+    index = get_duplicate_index(filepath)
+    id_field = ID_FIELDS[filepath]
+    with storage_lock(filepath):
+        previous_version = file_version(filepath)
+        data = load_json(filepath)
+        index.sync(data, previous_version)
+
+        appended, updated, outcomes = [], [], []
+        for record in records:
+            match_id = index.find(record)
+            existing = _find_by_id(data, id_field, match_id) if match_id else None
+            if existing is not None:
+                outcomes.append(merge(existing, record))
+                if existing not in updated:
+                    updated.append(existing)
+                index.add(existing)
+            else:
+                _insert_sorted(data, record, id_field)
+                appended.append(record)
+                outcomes.append(None)
+                index.add(record)
+
+        save_json(filepath, data)
+        index.version = file_version(filepath)
+        _notify_write(filepath, appended, previous_version, updated)
+    return outcomes
+
+def _write_behind_store(create: bool = True):
+    """The write-behind store if WRITE_BEHIND is on (see write_behind.py), else None"""
+    from write_behind import get_store, write_behind_enabled
+    return get_store(create) if write_behind_enabled() else None
+
+def persist(filepath: str, records: List[Dict], merge=None) -> List[Optional[Dict]]:
+    """
+    Store tool-created records. With merge, near-duplicates of open records are merged
+    (see append_deduplicated). Goes through the write-behind queue when enabled.
+    """
+    store = _write_behind_store()
+    if store is not None:
+        return store.submit(filepath, records, merge)
+    if merge is None:
+        append_json(filepath, records)
+        return [None] * len(records)
+    return append_deduplicated(filepath, records, merge)
+
+def read_records(filepath: str) -> List[Dict]:
+    """Current records, including queued write-behind writes"""
+    store = _write_behind_store(create=False)
+    if store is not None:
+        return store.views[filepath].snapshot()
+    return load_json(filepath)
+
+def view_version(filepath: str) -> tuple:
+    """Change token for read_records(filepath)"""
+    store = _write_behind_store(create=False)
+    if store is not None:
+        return store.views[filepath].version()
+    return file_version(filepath)
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    """Wait for queued write-behind writes to reach storage"""
+    store = _write_behind_store(create=False)
+    return store.flush(timeout) if store is not None else True
+
+def iter_records(filepath: str) -> Iterator[Dict]:
+    """
+    Stream records from a data file one at a time (memory-mapped, see
+    record_stream.py) instead of loading the whole array. Reads the file
+    itself, not queued write-behind writes.
+    """
+    return record_stream.scan(filepath)
+
+def scan_records(filepath: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 after_id: Optional[str] = None, predicate=None, **where) -> Iterator[Dict]:
+    """
+    Current records matching the filters, streamed in ID order: created in
+    [since, until], after after_id, with each where field equal to its value
+    (or one of a list of values) and passing predicate. The range and field
+    filters are pushed down to the file scan (see record_stream.py). With
+    write-behind on, this filters the in-memory view, which includes queued writes.
+    """
+    store = _write_behind_store(create=False)
+    if store is not None:
+        return record_stream.select(store.views[filepath].snapshot(), ID_FIELDS[filepath],
+                                    since, until, after_id, where, predicate)
+    return record_stream.scan(filepath, ID_FIELDS[filepath], since, until, after_id, where, predicate)
+
+def count_records(filepath: str, **filters) -> int:
+    """Number of current records matching scan_records filters; with none, nothing is decoded"""
+    store = _write_behind_store(create=False)
+    if not filters and store is None:
+        return record_stream.count(filepath)
+    return sum(1 for _ in scan_records(filepath, **filters))
+
+def get_records_between(filepath: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+    """Records created in [start, end], found by binary search on the time-sorted IDs"""
+    return list(record_stream.scan(filepath, ID_FIELDS[filepath], since=start, until=end))
+
+class lazy_tool:
+    """
+    @tool that defers importing langchain until the tool object is first used.
+    The app dispatches through tool_implementations, so it never pays for it.
+    """
+
+    def __init__(self, fn):
+        self._fn = fn
+        self._tool = None
+        functools.update_wrapper(self, fn)
+
+    def _get(self):
+        if self._tool is None:
+            from langchain.tools import tool
+            self._tool = tool(self._fn)
+        return self._tool
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._get()(*args, **kwargs)
+
+
+def generate_id(prefix: str) -> str:
+    """Generate unique, time-sortable ID with prefix"""
+    return new_id(prefix)
+
+def _new_booking(
+    customer_name: str,
+    contact_number: str,
+    issue_description: str,
+    preferred_date: str,
+    address: str,
+    urgency: str = "normal"
+):
+    """Validate a booking and build its record. Returns (record or None, result)"""
+    try:
+        try:
+            parsed_date = parse_flexible_date(preferred_date)
+        except ValueError as e:
+            return None, {
+                "status": "error",
+                "message": str(e)
+            }
+
+        booking_date = datetime.strptime(parsed_date, "%Y-%m-%d")
+
+        if booking_date.date() < datetime.now().date():
+            return None, {
+                "status": "error",
+                "message": f"Cannot book appointments in the past. Today's date is {datetime.now().strftime('%Y-%m-%d')}. Please choose today or a future date."
+            }
+
+    except ValueError as e:
+        return None, {
+            "status": "error",
+            "message": f"Date parsing error: {str(e)}"
+        }
+
+    booking_id = generate_id("BOOK")
+
+    booking = {
+        "booking_id": booking_id,
+        "customer_name": customer_name,
+        "contact_number": contact_number,
+        "issue_description": issue_description,
+        "preferred_date": parsed_date,
+        "original_date_input": preferred_date,
+        "address": address,
+        "urgency": urgency,
+        "status": "pending",
+        "created_at": datetime.now().isoformat(),
+        "assigned_technician": None,
+        "estimated_time_slot": "09:00-12:00" if urgency != "critical" else "ASAP"
     }
- 
-    month = None
-    for month_name, month_num in months.items():
-        if month_name in date_input:
-            month = month_num
-            break
-
-    if day_match:
-        day = int(day_match.group(1))
-        year = today.year
-        
-        if month is None:
- 
-            month = today.month
 
-            if day < today.day:
-                month += 1
-                if month > 12:
-                    month = 1
-                    year += 1
-        else:
-        
-            if month < today.month or (month == today.month and day < today.day):
-                year += 1
-        
+    return booking, {
+        "status": "success",
+        "booking_id": booking_id,
+        "customer_name": customer_name,
+        "preferred_date": parsed_date,
+        "original_input": preferred_date,
+        "time_slot": booking["estimated_time_slot"],
+        "urgency": urgency,
+        "message": f"Appointment booked successfully! Booking ID: {booking_id}. "
+                  f"Date: {parsed_date}. A technician will contact you at {contact_number} to confirm the exact time."
+    }
+
+
+def _new_issue(
+    customer_name: str,
+    issue_type: str,
+    description: str,
+    location: str,
+    severity: str = "medium",
+    contact_info: Optional[str] = None
+):
+    """Build a customer issue record. Returns (record, result)"""
+    issue_id = generate_id("ISSUE")
+
+    issue = {
+        "issue_id": issue_id,
+        "customer_name": customer_name,
+        "issue_type": issue_type.lower(),
+        "description": description,
+        "location": location,
+        "severity": severity,
+        "contact_info": contact_info,
+        "status": "open",
+        "created_at": datetime.now().isoformat(),
+        "last_updated": datetime.now().isoformat(),
+        "notes": [],
+        "resolved": False
+    }
+
+    return issue, {
+        "status": "success",
+        "issue_id": issue_id,
+        "message": f"Issue logged successfully with ID: {issue_id}. "
+                  f"This will be tracked for follow-up and resolution.",
+        "severity": severity,
+        "next_steps": "Our team will review this issue and contact you for next steps."
+    }
+
+
+TICKET_PRIORITY_MAP = {
+    "critical": {"priority": "P1", "response_time": "Immediate (within 1 hour)"},
+    "high": {"priority": "P2", "response_time": "Same day (within 4 hours)"},
+    "medium": {"priority": "P3", "response_time": "Next business day"},
+    "low": {"priority": "P4", "response_time": "Within 3 business days"}
+}
+
+
+def _new_ticket(
+    issue_type: str,
+    severity: str,
+    description: str,
+    customer_name: str,
+    location: str,
+    requires_immediate_action: bool = False,
+    contact_info: Optional[str] = None
+):
+    """Build a maintenance ticket record. Returns (record, result)"""
+    ticket_id = generate_id("TKT")
+
+    priority_info = TICKET_PRIORITY_MAP.get(severity, TICKET_PRIORITY_MAP["medium"])
+
+    ticket = {
+        "ticket_id": ticket_id,
+        "issue_type": issue_type,
+        "severity": severity,
+        "priority": priority_info["priority"],
+        "description": description,
+        "customer_name": customer_name,
+        "location": location,
+        "contact_info": contact_info,
+        "requires_immediate_action": requires_immediate_action,
+        "status": "open",
+        "assigned_to": None,
+        "created_at": datetime.now().isoformat(),
+        "response_time_target": priority_info["response_time"],
+        "resolution_notes": [],
+        "escalated": severity in ["high", "critical"] or requires_immediate_action
+    }
+
+    message = f"Maintenance ticket {ticket_id} created successfully.\n"
+    message += f"Priority: {priority_info['priority']} ({severity})\n"
+    message += f"Expected Response: {priority_info['response_time']}\n"
+
+    if severity == "critical" or requires_immediate_action:
+        message += "\nURGENT: This ticket has been flagged for immediate attention. "
+        message += "Emergency team has been notified."
+
+    return ticket, {
+        "status": "success",
+        "ticket_id": ticket_id,
+        "priority": priority_info["priority"],
+        "severity": severity,
+        "response_time": priority_info["response_time"],
+        "escalated": ticket["escalated"],
+        "message": message
+    }
+
+
+def _record_repeat_report(existing: Dict, new: Dict, notes_field: str):
+    """Shared part of merging a repeat report into an existing open record"""
+    now = datetime.now().isoformat()
+    existing["report_count"] = existing.get("report_count", 1) + 1
+    existing["last_updated"] = now
+    if new.get("description") and new["description"] != existing.get("description"):
+        existing.setdefault(notes_field, []).append({"at": now, "note": f"Repeat report: {new['description']}"})
+
+
+def _merge_issue(existing: Dict, new: Dict) -> Dict:
+    """Fold a repeat report into an open issue. Returns the issue result dict"""
+    _record_repeat_report(existing, new, "notes")
+    existing["severity"] = max_severity(existing.get("severity", "medium"), new.get("severity", "medium"))
+    if new.get("contact_info") and not existing.get("contact_info"):
+        existing["contact_info"] = new["contact_info"]
+
+    issue_id = existing["issue_id"]
+    return {
+        "status": "success",
+        "issue_id": issue_id,
+        "duplicate_of": issue_id,
+        "report_count": existing["report_count"],
+        "message": f"This matches open issue {issue_id}, which is already being tracked. "
+                  f"The new details have been added to it.",
+        "severity": existing["severity"],
+        "next_steps": "Our team will review this issue and contact you for next steps."
+    }
+
+
+def _merge_ticket(existing: Dict, new: Dict) -> Dict:
+    """Fold a repeat report into an open ticket. Returns the ticket result dict"""
+    _record_repeat_report(existing, new, "resolution_notes")
+    previous_severity = existing.get("severity", "medium")
+    severity = max_severity(previous_severity, new.get("severity", "medium"))
+    priority_info = TICKET_PRIORITY_MAP.get(severity, TICKET_PRIORITY_MAP["medium"])
+    existing["severity"] = severity
+    existing["priority"] = priority_info["priority"]
+    existing["response_time_target"] = priority_info["response_time"]
+    existing["requires_immediate_action"] = existing.get("requires_immediate_action") or new.get("requires_immediate_action", False)
+    existing["escalated"] = severity in ["high", "critical"] or existing["requires_immediate_action"]
+    if new.get("contact_info") and not existing.get("contact_info"):
+        existing["contact_info"] = new["contact_info"]
+
+    ticket_id = existing["ticket_id"]
+    message = f"This matches open ticket {ticket_id}, which is already being handled.\n"
+    message += f"Priority: {priority_info['priority']} ({severity})\n"
+    message += f"Expected Response: {priority_info['response_time']}\n"
+    # A critical / immediate-action report always alerts, even if the ticket already was;
+    # otherwise only alert again if the repeat report raised the severity
+    urgent_report = new.get("severity") == "critical" or new.get("requires_immediate_action")
+    if urgent_report or (severity != previous_severity and (severity == "critical" or existing["requires_immediate_action"])):
+        message += "\nURGENT: This ticket has been flagged for immediate attention. "
+        message += "Emergency team has been notified."
+
+    return {
+        "status": "success",
+        "ticket_id": ticket_id,
+        "duplicate_of": ticket_id,
+        "report_count": existing["report_count"],
+        "priority": priority_info["priority"],
+        "severity": severity,
+        "response_time": priority_info["response_time"],
+        "escalated": existing["escalated"],
+        "message": message
+    }
+
+
+def _write_records(filepath: str, tool_name: str, items: List[Dict], build, failure_message: str, merge=None) -> List[Dict]:
+    """
+    Validate and build each item, then persist every successful record in one write.
+
+    Returns one result per item, in input order, shaped like the single-record tool result.
+    With merge, near-duplicates of open records are merged instead (see persist).
+    """
+    records = []
+    positions = []
+    results = []
+    for item in items:
+        errors = validate_tool_args(tool_name, item)
+        if errors:
+            results.append({"status": "error", "message": f"Invalid {tool_name} record: {'; '.join(errors)}"})
+            continue
         try:
-            parsed_date = datetime(year, month, day)
-            return parsed_date.strftime("%Y-%m-%d")
-        except ValueError:
-          
-            raise ValueError(f"Invalid date: day {day} doesn't exist in month {month}")
-    
+            record, result = build(**item)
+        except Exception as e:
+            record, result = None, {"status": "error", "message": f"{failure_message}: {str(e)}"}
+        if record is not None:
+            records.append(record)
+            positions.append(len(results))
+        results.append(result)
+
+    if records:
+        try:
+            for position, merged in zip(positions, persist(filepath, records, merge)):
+                if merged is not None:
+                    results[position] = merged
+        except Exception as e:
+            failed = {"status": "error", "message": f"{failure_message}: {str(e)}"}
+            results = [failed if r.get("status") == "success" else r for r in results]
+
+    return results
+
+
+def _book_maintenance_appointment(
+    customer_name: str,
+    contact_number: str,
+    issue_description: str,
+    preferred_date: str,
+    address: str,
+    urgency: str = "normal"
+) -> Dict:
+    """Book an appointment. Returns the booking result dict"""
+    try:
+        booking, result = _new_booking(
+            customer_name, contact_number, issue_description, preferred_date, address, urgency
+        )
+        if booking is not None:
+            persist(BOOKINGS_FILE, [booking])
+        return result
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to create booking: {str(e)}"
+        }
 
-    raise ValueError(f"Could not parse date: '{date_input}'. Use format like '21', 'March 15', or '2025-03-15'")
 
-@tool
+@lazy_tool
 def book_maintenance_appointment(
     customer_name: str,
     contact_number: str,
@@ -165,77 +602,48 @@ def book_maintenance_appointment(
     Returns:
         JSON string with booking confirmation details
     """
-    try:
-     
-        try:
-            parsed_date = parse_flexible_date(preferred_date)
-        except ValueError as e:
-            return json.dumps({
-                "status": "error",
-                "message": str(e)
-            })
-        
+    return json.dumps(_book_maintenance_appointment(
+        customer_name, contact_number, issue_description, preferred_date, address, urgency
+    ))
 
-        booking_date = datetime.strptime(parsed_date, "%Y-%m-%d")
-        
 
-        if booking_date.date() < datetime.now().date():
-            return json.dumps({
-                "status": "error",
-                "message": f"Cannot book appointments in the past. Today's date is {datetime.now().strftime('%Y-%m-%d')}. Please choose today or a future date."
-            })
+def book_maintenance_appointments_bulk(records: List[Dict]) -> str:
+    """
+    Book many appointments with a single storage write.
 
-        bookings = load_json(BOOKINGS_FILE)
-        
-    
-        booking_id = generate_id("BOOK")
-        
-        
-        booking = {
-            "booking_id": booking_id,
-            "customer_name": customer_name,
-            "contact_number": contact_number,
-            "issue_description": issue_description,
-            "preferred_date": parsed_date, 
-            "original_date_input": preferred_date, 
-            "address": address,
-            "urgency": urgency,
-            "status": "pending",
-            "created_at": datetime.now().isoformat(),
-            "assigned_technician": None,
-            "estimated_time_slot": "09:00-12:00" if urgency != "critical" else "ASAP"
-        }
-  
-        bookings.append(booking)
+    Args:
+        records: List of dicts with book_maintenance_appointment arguments
+
+    Returns:
+        JSON list with one booking result per record, in input order
+    """
+    return json.dumps(_write_records(
+        BOOKINGS_FILE, "book_maintenance_appointment", records, _new_booking, "Failed to create booking"
+    ))
+
+
+def _log_customer_issue(
+    customer_name: str,
+    issue_type: str,
+    description: str,
+    location: str,
+    severity: str = "medium",
+    contact_info: Optional[str] = None
+) -> Dict:
+    """Log an issue. Returns the issue result dict"""
+    try:
+        issue, result = _new_issue(customer_name, issue_type, description, location, severity, contact_info)
+        merged = persist(ISSUES_FILE, [issue], _merge_issue)[0]
+        return merged or result
 
-        save_json(BOOKINGS_FILE, bookings)
-        
-        return json.dumps({
-            "status": "success",
-            "booking_id": booking_id,
-            "customer_name": customer_name,
-            "preferred_date": parsed_date,
-            "original_input": preferred_date,
-            "time_slot": booking["estimated_time_slot"],
-            "urgency": urgency,
-            "message": f"Appointment booked successfully! Booking ID: {booking_id}. "
-                      f"Date: {parsed_date}. A technician will contact you at {contact_number} to confirm the exact time."
-        })
-        
-    except ValueError as e:
-        return json.dumps({
-            "status": "error",
-            "message": f"Date parsing error: {str(e)}"
-        })
     except Exception as e:
-        return json.dumps({
+        return {
             "status": "error",
-            "message": f"Failed to create booking: {str(e)}"
-        })
-
+            "message": f"Failed to log issue: {str(e)}"
+        }
 
 
-@tool
+@lazy_tool
 def log_customer_issue(
     customer_name: str,
     issue_type: str,
@@ -258,57 +666,59 @@ def log_customer_issue(
     Returns:
         JSON string with issue ID and confirmation
     """
-    try:
-   
-        issues = load_json(ISSUES_FILE)
- 
-        issue_id = generate_id("ISSUE")
-        
+    return json.dumps(_log_customer_issue(
+        customer_name, issue_type, description, location, severity, contact_info
+    ))
 
-        issue = {
-            "issue_id": issue_id,
-            "customer_name": customer_name,
-            "issue_type": issue_type.lower(),
-            "description": description,
-            "location": location,
-            "severity": severity,
-            "contact_info": contact_info,
-            "status": "open",
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-            "notes": [],
-            "resolved": False
-        }
-        
 
-        issues.append(issue)
+def log_customer_issues_bulk(records: List[Dict]) -> str:
+    """
+    Log many customer issues with a single storage write.
+
+    Args:
+        records: List of dicts with log_customer_issue arguments
+
+    Returns:
+        JSON list with one issue result per record, in input order
+    """
+    return json.dumps(_write_records(
+        ISSUES_FILE, "log_customer_issue", records, _new_issue, "Failed to log issue", merge=_merge_issue
+    ))
+
+
+def _create_maintenance_ticket(
+    issue_type: str,
+    severity: str,
+    description: str,
+    customer_name: str,
+    location: str,
+    requires_immediate_action: bool = False,
+    contact_info: Optional[str] = None
+) -> Dict:
+    """Create a ticket. Returns the ticket result dict"""
+    try:
+        ticket, result = _new_ticket(
+            issue_type, severity, description, customer_name, location, requires_immediate_action, contact_info
+        )
+        merged = persist(TICKETS_FILE, [ticket], _merge_ticket)[0]
+        return merged or result
 
-        save_json(ISSUES_FILE, issues)
-        
-        return json.dumps({
-            "status": "success",
-            "issue_id": issue_id,
-            "message": f"Issue logged successfully with ID: {issue_id}. "
-                      f"This will be tracked for follow-up and resolution.",
-            "severity": severity,
-            "next_steps": "Our team will review this issue and contact you for next steps."
-        })
-        
     except Exception as e:
-        return json.dumps({
+        return {
             "status": "error",
-            "message": f"Failed to log issue: {str(e)}"
-        })
+            "message": f"Failed to create ticket: {str(e)}"
+        }
 
 
-@tool
+@lazy_tool
 def create_maintenance_ticket(
     issue_type: str,
     severity: str,
     description: str,
     customer_name: str,
     location: str,
-    requires_immediate_action: bool = False
+    requires_immediate_action: bool = False,
+    contact_info: Optional[str] = None
 ) -> str:
     """
     Create a formal maintenance or safety ticket for urgent issues.
@@ -321,103 +731,40 @@ def create_maintenance_ticket(
         customer_name: Customer's name
         location: Address or specific location
         requires_immediate_action: Whether this needs urgent response
+        contact_info: Customer's phone number or address, if known
     
     Returns:
         JSON string with ticket details and priority information
     """
-    try:
+    return json.dumps(_create_maintenance_ticket(
+        issue_type, severity, description, customer_name, location, requires_immediate_action, contact_info
+    ))
 
-        tickets = load_json(TICKETS_FILE)
-  
-        ticket_id = generate_id("TKT")
-        
 
-        priority_map = {
-            "critical": {"priority": "P1", "response_time": "Immediate (within 1 hour)"},
-            "high": {"priority": "P2", "response_time": "Same day (within 4 hours)"},
-            "medium": {"priority": "P3", "response_time": "Next business day"},
-            "low": {"priority": "P4", "response_time": "Within 3 business days"}
-        }
-        
-        priority_info = priority_map.get(severity, priority_map["medium"])
-
-        ticket = {
-            "ticket_id": ticket_id,
-            "issue_type": issue_type,
-            "severity": severity,
-            "priority": priority_info["priority"],
-            "description": description,
-            "customer_name": customer_name,
-            "location": location,
-            "requires_immediate_action": requires_immediate_action,
-            "status": "open",
-            "assigned_to": None,
-            "created_at": datetime.now().isoformat(),
-            "response_time_target": priority_info["response_time"],
-            "resolution_notes": [],
-            "escalated": severity in ["high", "critical"] or requires_immediate_action
-        }
-        
-      
-        tickets.append(ticket)
-      
-        save_json(TICKETS_FILE, tickets)
-      
-        message = f"Maintenance ticket {ticket_id} created successfully.\n"
-        message += f"Priority: {priority_info['priority']} ({severity})\n"
-        message += f"Expected Response: {priority_info['response_time']}\n"
-        
-        if severity == "critical" or requires_immediate_action:
-            message += "\nURGENT: This ticket has been flagged for immediate attention. "
-            message += "Emergency team has been notified."
-        
-        return json.dumps({
-            "status": "success",
-            "ticket_id": ticket_id,
-            "priority": priority_info["priority"],
-            "severity": severity,
-            "response_time": priority_info["response_time"],
-            "escalated": ticket["escalated"],
-            "message": message
-        })
-        
-    except Exception as e:
-        return json.dumps({
-            "status": "error",
-            "message": f"Failed to create ticket: {str(e)}"
-        })
+def create_maintenance_tickets_bulk(records: List[Dict]) -> str:
+    """
+    Create many maintenance tickets with a single storage write.
 
+    Args:
+        records: List of dicts with create_maintenance_ticket arguments
 
-@tool
-def escalate_to_human_representative(
+    Returns:
+        JSON list with one ticket result per record, in input order
+    """
+    return json.dumps(_write_records(
+        TICKETS_FILE, "create_maintenance_ticket", records, _new_ticket, "Failed to create ticket", merge=_merge_ticket
+    ))
+
+
+def _escalate_to_human_representative(
     reason: str,
     customer_name: str,
     issue_summary: str,
     urgency: str = "normal",
     conversation_history_summary: Optional[str] = None
-) -> str:
-    """
-    Escalate the conversation to a human representative.
-    Use this when:
-    - Issue is too complex for AI to handle
-    - Customer is frustrated or dissatisfied
-    - Safety concerns require human judgment
-    - Customer explicitly requests human assistance
-    
-    Args:
-        reason: Why escalation is needed (frustrated_customer, complex_issue, safety_concern, customer_request, etc.)
-        customer_name: Customer's name
-        issue_summary: Brief summary of the issue discussed
-        urgency: Urgency level (normal, high, critical)
-        conversation_history_summary: Optional summary of the conversation so far
-    
-    Returns:
-        JSON string with escalation confirmation and next steps
-    """
+) -> Dict:
+    """Record an escalation. Returns the escalation result dict"""
     try:
-   
-        escalations = load_json(ESCALATIONS_FILE)
-     
         escalation_id = generate_id("ESC")
 
         wait_times = {
@@ -443,10 +790,7 @@ def escalate_to_human_representative(
             "resolved": False
         }
         
-        escalations.append(escalation)
-        
-       
-        save_json(ESCALATIONS_FILE, escalations)
+        persist(ESCALATIONS_FILE, [escalation])
    
         if urgency == "critical":
             message = "🚨 URGENT ESCALATION IN PROGRESS\n\n"
@@ -465,7 +809,7 @@ def escalate_to_human_representative(
             message += "3. They'll have all the details we've discussed\n\n"
             message += "Thank you for your patience!"
         
-        return json.dumps({
+        return {
             "status": "success",
             "escalation_id": escalation_id,
             "urgency": urgency,
@@ -473,61 +817,79 @@ def escalate_to_human_representative(
             "message": message,
             "action": "HUMAN_TAKEOVER",
             "note": "AI should stop responding. Human agent will take over."
-        })
+        }
         
     except Exception as e:
-        return json.dumps({
+        return {
             "status": "error",
             "message": f"Failed to escalate: {str(e)}"
-        })
+        }
 
 
-@tool
-def check_booking_availability(date_str: str) -> str:
+@lazy_tool
+def escalate_to_human_representative(
+    reason: str,
+    customer_name: str,
+    issue_summary: str,
+    urgency: str = "normal",
+    conversation_history_summary: Optional[str] = None
+) -> str:
     """
-    Check if technicians are available on a specific date.
+    Escalate the conversation to a human representative.
+    Use this when:
+    - Issue is too complex for AI to handle
+    - Customer is frustrated or dissatisfied
+    - Safety concerns require human judgment
+    - Customer explicitly requests human assistance
     
     Args:
-        date_str: Flexible date format - can be:
-            - Just day: "21" or "21st" (assumes current month/year)
-            - Month and day: "March 15" (assumes current year)
-            - Full date: "2025-03-15"
-            - Keywords: "tomorrow", "next week"
+        reason: Why escalation is needed (frustrated_customer, complex_issue, safety_concern, customer_request, etc.)
+        customer_name: Customer's name
+        issue_summary: Brief summary of the issue discussed
+        urgency: Urgency level (normal, high, critical)
+        conversation_history_summary: Optional summary of the conversation so far
     
     Returns:
-        JSON string with availability information
+        JSON string with escalation confirmation and next steps
     """
+    return json.dumps(_escalate_to_human_representative(
+        reason, customer_name, issue_summary, urgency, conversation_history_summary
+    ))
+
+
+MAX_BOOKINGS_PER_DAY = 4
+
+
+def _check_booking_availability(date_str: str) -> Dict:
+    """Check availability for a date. Returns the availability result dict"""
     try:
         # Parse flexible date input
         try:
             parsed_date = parse_flexible_date(date_str)
         except ValueError as e:
-            return json.dumps({
+            return {
                 "status": "error",
                 "message": str(e)
-            })
+            }
         
         # Validate date
         check_date = datetime.strptime(parsed_date, "%Y-%m-%d")
         
         # Check if date is in the past (allow today)
         if check_date.date() < datetime.now().date():
-            return json.dumps({
+            return {
                 "status": "unavailable",
                 "date": parsed_date,
                 "original_input": date_str,
                 "message": f"Cannot check availability for past dates. Today is {datetime.now().strftime('%Y-%m-%d')}."
-            })
+            }
         
         # Load existing bookings
-        bookings = load_json(BOOKINGS_FILE)
+        # Bookings for that date
+        bookings_on_date = list(iter_bookings(preferred_date=parsed_date))
         
-        # Count bookings for that date
-        bookings_on_date = [b for b in bookings if b["preferred_date"] == parsed_date]
-        
-        # Simple availability logic (max 4 bookings per day)
-        max_bookings_per_day = 4
-        available_slots = max_bookings_per_day - len(bookings_on_date)
+        # Simple availability logic (max bookings per day)
+        available_slots = MAX_BOOKINGS_PER_DAY - len(bookings_on_date)
         
         if available_slots > 0:
             # Generate available time slots
@@ -535,29 +897,85 @@ def check_booking_availability(date_str: str) -> str:
             booked_slots = [b.get("estimated_time_slot", "") for b in bookings_on_date]
             available_time_slots = [slot for slot in all_slots if slot not in booked_slots]
             
-            return json.dumps({
+            return {
                 "status": "available",
                 "date": parsed_date,
                 "original_input": date_str,
                 "available_slots": available_slots,
                 "time_slots": available_time_slots,
                 "message": f"{available_slots} technician(s) available on {parsed_date}"
-            })
+            }
         else:
             # Find next available date
             next_date = check_date + timedelta(days=1)
-            return json.dumps({
+            return {
                 "status": "fully_booked",
                 "date": parsed_date,
                 "original_input": date_str,
                 "message": f"Fully booked on {parsed_date}. Try {next_date.strftime('%Y-%m-%d')} instead."
-            })
+            }
         
     except ValueError as e:
-        return json.dumps({
+        return {
             "status": "error",
             "message": f"Date parsing error: {str(e)}"
-        })
+        }
+
+
+@lazy_tool
+def check_booking_availability(date_str: str) -> str:
+    """
+    Check if technicians are available on a specific date.
+    
+    Args:
+        date_str: Flexible date format - can be:
+            - Just day: "21" or "21st" (assumes current month/year)
+            - Month and day: "March 15" (assumes current year)
+            - Full date: "2025-03-15"
+            - Keywords: "tomorrow", "next week"
+    
+    Returns:
+        JSON string with availability information
+    """
+    return json.dumps(_check_booking_availability(date_str))
+
+
+def _get_customer_profile(customer: str) -> Dict:
+    """Look up a customer's history. Returns a compact profile dict"""
+    from customer_index import get_customer_profile, summarize_profile
+
+    profile = get_customer_profile(customer)
+    if profile["status"] != "success":
+        return profile
+
+    summary = summarize_profile(profile)
+    message = summary
+    if profile["ambiguous"]:
+        message = ("Matched by name only; these records may belong to different customers with this name. "
+                   "Confirm the customer's phone number before sharing details.\n" + summary)
+    return {
+        "status": "success",
+        "customer_name": profile["customer_name"],
+        "contact_numbers": profile["contact_numbers"],
+        "counts": profile["counts"],
+        "ambiguous": profile["ambiguous"],
+        "summary": summary,
+        "message": message
+    }
+
+
+@lazy_tool
+def get_customer_profile(customer: str) -> str:
+    """
+    Look up a customer's previous bookings, issues, tickets and escalations.
+
+    Args:
+        customer: Customer's full name or phone number
+
+    Returns:
+        JSON string with record counts and a compact history summary
+    """
+    return json.dumps(_get_customer_profile(customer))
 
 
 langchain_tools_schema = [
@@ -615,7 +1033,8 @@ langchain_tools_schema = [
                     "description": {"type": "string"},
                     "customer_name": {"type": "string"},
                     "location": {"type": "string"},
-                    "requires_immediate_action": {"type": "boolean"}
+                    "requires_immediate_action": {"type": "boolean"},
+                    "contact_info": {"type": "string", "description": "Customer's phone number or address, if known"}
                 },
                 "required": ["issue_type", "severity", "description", "customer_name", "location"]
             }
@@ -655,39 +1074,145 @@ langchain_tools_schema = [
                 "required": ["date_str"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_customer_profile",
+            "description": "Look up a returning customer's history (bookings, issues, tickets, escalations) by name or phone number. Use this when the customer refers to a previous visit or report.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer": {"type": "string", "description": "Customer's full name or phone number"}
+                },
+                "required": ["customer"]
+            }
+        }
     }
 ]
 
 
+def _compile_validators() -> Dict[str, Dict]:
+    validators = {}
+    for entry in langchain_tools_schema:
+        fn = entry["function"]
+        params = fn["parameters"]
+        validators[fn["name"]] = {
+            "required": params.get("required", []),
+            "properties": params.get("properties", {})
+        }
+    return validators
+
+
+_JSON_TYPES = {
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+    "object": dict,
+    "array": list
+}
+
+_validators: Dict[str, Dict] = {}
+
+
+def validate_tool_args(tool_name: str, args: Dict) -> List[str]:
+    """Check tool arguments against langchain_tools_schema. Returns a list of errors"""
+    if not _validators:
+        _validators.update(_compile_validators())
+
+    validator = _validators.get(tool_name)
+    if validator is None:
+        return [f"unknown tool '{tool_name}'"]
+    if not isinstance(args, dict):
+        return ["arguments must be an object"]
+
+    errors = []
+    properties = validator["properties"]
+    for name in validator["required"]:
+        if args.get(name) in (None, ""):
+            errors.append(f"missing required field '{name}'")
+
+    for name, value in args.items():
+        spec = properties.get(name)
+        if spec is None:
+            errors.append(f"unexpected field '{name}'")
+            continue
+        if value is None:
+            continue
+        expected = _JSON_TYPES.get(spec.get("type"))
+        if expected and (not isinstance(value, expected) or (expected is not bool and isinstance(value, bool))):
+            errors.append(f"field '{name}' must be of type {spec['type']}")
+        elif "enum" in spec and value not in spec["enum"]:
+            errors.append(f"field '{name}' must be one of {spec['enum']}")
+
+    return errors
+
+
 available_langchain_functions = {
     "book_maintenance_appointment": book_maintenance_appointment,
     "log_customer_issue": log_customer_issue,
     "create_maintenance_ticket": create_maintenance_ticket,
     "escalate_to_human_representative": escalate_to_human_representative,
-    "check_booking_availability": check_booking_availability
+    "check_booking_availability": check_booking_availability,
+    "get_customer_profile": get_customer_profile
+}
+
+# Same tools, returning result dicts instead of JSON strings
+tool_implementations = {
+    "book_maintenance_appointment": _book_maintenance_appointment,
+    "log_customer_issue": _log_customer_issue,
+    "create_maintenance_ticket": _create_maintenance_ticket,
+    "escalate_to_human_representative": _escalate_to_human_representative,
+    "check_booking_availability": _check_booking_availability,
+    "get_customer_profile": _get_customer_profile
 }
 
 
 def get_all_bookings() -> List[Dict]:
    
-    return load_json(BOOKINGS_FILE)
+    return read_records(BOOKINGS_FILE)
 
 def get_all_issues() -> List[Dict]:
    
-    return load_json(ISSUES_FILE)
+    return read_records(ISSUES_FILE)
 
 def get_all_tickets() -> List[Dict]:
 
-    return load_json(TICKETS_FILE)
+    return read_records(TICKETS_FILE)
 
 def get_all_escalations() -> List[Dict]:
    
-    return load_json(ESCALATIONS_FILE)
+    return read_records(ESCALATIONS_FILE)
+
+def iter_bookings(**filters) -> Iterator[Dict]:
+    """Bookings one at a time; filters as scan_records, e.g. preferred_date="2025-03-15" """
+    return scan_records(BOOKINGS_FILE, **filters)
+
+def iter_issues(**filters) -> Iterator[Dict]:
+    """Issues one at a time; filters as scan_records, e.g. status="open", since=datetime(...)"""
+    return scan_records(ISSUES_FILE, **filters)
+
+def iter_tickets(**filters) -> Iterator[Dict]:
+    """Tickets one at a time; filters as scan_records, e.g. severity=["high", "critical"]"""
+    return scan_records(TICKETS_FILE, **filters)
+
+def iter_escalations(**filters) -> Iterator[Dict]:
+    """Escalations one at a time; filters as scan_records"""
+    return scan_records(ESCALATIONS_FILE, **filters)
+
+def get_storage_counts() -> Dict[str, int]:
+    """Record counts shown in the sidebar"""
+    return {RECORD_TYPES[filepath]: count_records(filepath) for filepath in DATA_FILES}
 
 def clear_all_data():
  
-    for filepath in [BOOKINGS_FILE, ISSUES_FILE, TICKETS_FILE, ESCALATIONS_FILE]:
-        save_json(filepath, [])
+    flush_writes()
+    for filepath in DATA_FILES:
+        with storage_lock(filepath):
+            previous_version = file_version(filepath)
+            save_json(filepath, [])
+            _notify_write(filepath, None, previous_version)
     print(" All data cleared")
 
 
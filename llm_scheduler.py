@@ -0,0 +1,234 @@
+"""
+Priority scheduler in front of the local LLM server.
+
+Every model call in a turn goes through one process-wide scheduler that runs
+at most LLM_MAX_CONCURRENCY calls at once (roughly Ollama's parallel slots).
+Callers over the limit wait in one FIFO queue per priority:
+
+    critical      the conversation has an open critical / immediate-action ticket
+    urgent        the user's message reads as urgent (detect_sentiment)
+    interactive   a user-facing reply (chat, post_tool)
+    background    fact extraction in a calm conversation, offline tools
+
+A freed slot goes to the queue head with the best priority, where every
+LLM_PRIORITY_AGING_MS spent waiting counts as one level better, so background
+work is delayed but never starved. Identical non-streaming requests are
+coalesced: while one is queued or running, later identical calls wait for it
+and share its response instead of taking a slot. A caller with a better
+priority than the queued call it joins moves that call up to its own priority.
+
+Queue depth, in-flight calls and queue wait per priority are exposed through
+get_stats(); each wait is also recorded as an "llm.queue_wait" span.
+
+Config (env):
+    LLM_MAX_CONCURRENCY     concurrent model calls (default 4; 0 disables scheduling)
+    LLM_PRIORITY_AGING_MS   wait that promotes a call one priority level (default 5000)
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+
+import tracing
+from tool_registry import ToolStats
+
+
+PRIORITIES = ["critical", "urgent", "interactive", "background"]
+CRITICAL, URGENT, INTERACTIVE, BACKGROUND = range(len(PRIORITIES))
+
+USER_FACING_TASKS = ("chat", "post_tool")
+
+
+def call_priority(task: str, sentiment: Optional[dict] = None, critical: bool = False) -> int:
+    """Priority of a model call for task in a conversation with this sentiment / critical ticket state"""
+    if critical:
+        return CRITICAL
+    if sentiment and sentiment.get("is_urgent"):
+        return URGENT
+    return INTERACTIVE if task in USER_FACING_TASKS else BACKGROUND
+
+
+def request_key(kwargs: Dict) -> str:
+    return hashlib.sha1(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Waiter:
+
+    __slots__ = ("priority", "seq", "enqueued", "granted")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.perf_counter()
+        self.granted = threading.Event()
+
+
+class _SharedCall:
+    """Outcome of a call that identical requests are waiting on"""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.waiter: Optional[_Waiter] = None
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class LLMScheduler:
+
+    def __init__(self, max_concurrency: Optional[int] = None, aging_ms: Optional[float] = None):
+        self.max_concurrency = max_concurrency if max_concurrency is not None else \
+            int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+        self.aging_ms = aging_ms if aging_ms is not None else float(os.getenv("LLM_PRIORITY_AGING_MS", 5000))
+        self._queues = [deque() for _ in PRIORITIES]
+        self._running = 0
+        self._seq = itertools.count()
+        self._shared: Dict[str, _SharedCall] = {}
+        self._wait_stats = {name: ToolStats() for name in PRIORITIES}
+        self._counts = {"calls": 0, "coalesced": 0, "errors": 0, "max_depth": 0}
+        self._lock = threading.Lock()
+
+    def _acquire(self, priority: int, shared: Optional[_SharedCall] = None) -> float:
+        """Take a slot, queueing behind better-priority callers. Returns ms waited"""
+        with self._lock:
+            if self._running < self.max_concurrency and not any(self._queues):
+                self._running += 1
+                return 0.0
+            if shared is not None:
+                # a better-priority caller may have joined before we got here
+                priority = min(priority, shared.priority)
+                waiter = shared.waiter = _Waiter(priority, next(self._seq))
+            else:
+                waiter = _Waiter(priority, next(self._seq))
+            self._queues[priority].append(waiter)
+            self._counts["max_depth"] = max(self._counts["max_depth"], sum(map(len, self._queues)))
+        waiter.granted.wait()
+        return (time.perf_counter() - waiter.enqueued) * 1000
+
+    def _promote(self, shared: _SharedCall, priority: int):
+        """Move a shared call's queued leader up to priority (call under _lock)"""
+        if priority >= shared.priority:
+            return
+        shared.priority = priority
+        waiter = shared.waiter
+        if waiter is not None and not waiter.granted.is_set():
+            self._queues[waiter.priority].remove(waiter)
+            waiter.priority = priority
+            self._queues[priority].append(waiter)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Pop the queue head with the best aged priority (call under _lock)"""
+        now = time.perf_counter()
+        best = None
+        for queue in self._queues:
+            if queue:
+                head = queue[0]
+                rank = (head.priority - (now - head.enqueued) * 1000 / self.aging_ms, head.seq)
+                if best is None or rank < best[0]:
+                    best = (rank, queue)
+        return best[1].popleft() if best else None
+
+    def _release(self):
+        with self._lock:
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._running -= 1
+            else:
+                waiter.granted.set()  # the slot passes straight to the waiter
+
+    def run(self, fn: Callable, priority: int = INTERACTIVE, key: Optional[str] = None):
+        """Run fn() when a slot is free; with key, share the outcome with identical in-flight calls"""
+        if self.max_concurrency <= 0:
+            return fn()
+
+        with self._lock:
+            self._counts["calls"] += 1
+            shared = self._shared.get(key) if key else None
+            leader = shared is None
+            if leader and key:
+                shared = self._shared[key] = _SharedCall(priority)
+            elif not leader:
+                self._counts["coalesced"] += 1
+                self._promote(shared, priority)
+
+        if not leader:
+            shared.done.wait()
+            if shared.error is not None:
+                raise shared.error
+            return shared.result
+
+        wait_ms = self._acquire(priority, shared)
+        with self._lock:
+            if shared is not None:
+                priority = shared.priority
+            self._wait_stats[PRIORITIES[priority]].record(wait_ms, True)
+        tracing.record_span("llm.queue_wait", wait_ms, priority=PRIORITIES[priority])
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._counts["errors"] += 1
+            if shared is not None:
+                shared.error = e
+            raise
+        else:
+            if shared is not None:
+                shared.result = result
+            return result
+        finally:
+            self._release()
+            if shared is not None:
+                with self._lock:
+                    self._shared.pop(key, None)
+                shared.done.set()
+
+    def bind(self, client, priority: int) -> "ScheduledClient":
+        return ScheduledClient(client, self, priority)
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(map(len, self._queues))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": {name: len(queue) for name, queue in zip(PRIORITIES, self._queues)},
+                **self._counts,
+                "wait_ms": {name: stats.to_dict() for name, stats in self._wait_stats.items() if stats.calls}
+            }
+
+
+class ScheduledClient:
+    """Stand-in for an OpenAI client whose chat.completions.create goes through the scheduler"""
+
+    def __init__(self, client, scheduler: LLMScheduler, priority: int):
+        self._client = client
+        self._scheduler = scheduler
+        self.priority = priority
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        # a stream is consumed by one caller, so only complete responses are shared
+        key = None if kwargs.get("stream") else request_key(kwargs)
+        return self._scheduler.run(lambda: self._client.chat.completions.create(**kwargs), self.priority, key)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by every session"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
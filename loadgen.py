@@ -0,0 +1,282 @@
+"""
+Headless load generator for the turn pipeline.
+
+Drives N simulated customer sessions concurrently through pipeline.run_turn
+(sentiment, fact extraction, model call, tool execution, storage writes,
+escalation) against an OpenAI-compatible endpoint, normally
+mock_llm_server.py, and reports turn latency percentiles, storage write
+throughput and error rates as JSON.
+
+Storage goes to a scratch MAINTENANCE_DATA_DIR unless one is set, so a load
+test never touches real maintenance data.
+
+Usage:
+    python loadgen.py --sessions 50 --turns 6 --concurrency 16 --mock-latency-ms 200
+    python loadgen.py --base-url http://127.0.0.1:11435/v1 --model mock -o load.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful property maintenance assistant."
+DEFAULT_FACT_PROMPT = "Extract facts from the customer message as a JSON object."
+
+CUSTOMER_MESSAGES = [
+    "There is water coming through my kitchen ceiling",
+    "I'm worried the damp in the bedroom wall is getting worse",
+    "This is ridiculous, nobody has called me back",
+    "It's urgent, I can smell gas near the boiler",
+    "Can you book a technician for next week?",
+    "Is anyone available next week?",
+    "The leak is in the bathroom, above the sink",
+    "What should I do about the mould?",
+    "My number is 07700 900123 and I live at 12 High Street",
+    "I want to speak to a real person",
+    "Can you recommend a good film to watch tonight?"
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))
+    return round(ordered[index], 3)
+
+
+def _ensure_env(scratch: str):
+    """Scratch storage and placeholder prompts for anything not configured"""
+    os.environ.setdefault("MAINTENANCE_DATA_DIR", os.path.join(scratch, "maintenance_data"))
+    os.environ.setdefault("TRACE_FILE", os.path.join(scratch, "spans.jsonl"))
+    for var, text in [("SYSTEM_PROMPT_PATH", DEFAULT_SYSTEM_PROMPT), ("FACT_PROMPT_PATH", DEFAULT_FACT_PROMPT)]:
+        path = os.getenv(var)
+        if not path or not os.path.exists(path):
+            path = os.path.join(scratch, f"{var.lower()}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.environ[var] = path
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.turn_ms: List[float] = []
+        self.turn_ms_by_tone: Dict[str, List[float]] = {}
+        self.turns = 0
+        self.errors: Dict[str, int] = {}
+        self.tool_calls = 0
+        self.tool_errors = 0
+        self.escalations = 0
+        self.blocked = 0
+        self.tool_tokens = {"full": 0, "sent": 0, "turns_without_tools": 0}
+        self.model_tokens: Dict[str, Dict[str, int]] = {}
+        self.compactions = 0
+        self._lock = threading.Lock()
+
+    def record_turn(self, latency_ms: float, result):
+        with self._lock:
+            self.turns += 1
+            self.turn_ms.append(latency_ms)
+            self.turn_ms_by_tone.setdefault(result.sentiment["tone"], []).append(latency_ms)
+            self.tool_calls += len(result.tool_results)
+            self.tool_errors += sum(1 for r in result.tool_results if not r.ok)
+            if result.should_escalate:
+                self.escalations += 1
+            self.blocked += result.blocked
+            if result.tool_selection:
+                self.tool_tokens["full"] += result.tool_selection.tokens_full
+                self.tool_tokens["sent"] += result.tool_selection.tokens_sent
+                self.tool_tokens["turns_without_tools"] += not result.tool_selection.tools
+
+    def record_session(self, usage):
+        with self._lock:
+            self.compactions += usage.compactions
+            for task, totals in usage.by_task.items():
+                task_tokens = self.model_tokens.setdefault(task, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                for key in task_tokens:
+                    task_tokens[key] += totals[key]
+
+    def record_error(self, error: Exception):
+        with self._lock:
+            self.turns += 1
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def run_session(index: int, args, client, system_prompt: str, stats: LoadStats, registry):
+    import tracing
+    from pipeline import Session, run_turn
+
+    rng = random.Random(args.seed + index)
+    session = Session(system_prompt, session_id=f"load-{index:05d}")
+    tool_capable_models = {args.model, *filter(None, os.getenv("TOOL_CAPABLE_MODELS", "").split(","))}
+    for turn in range(args.turns):
+        tracing.set_context(session.session_id, f"{session.session_id}-{turn:03d}")
+        prompt = rng.choice(CUSTOMER_MESSAGES)
+        start = time.perf_counter()
+        try:
+            result = run_turn(session, prompt, client, args.model,
+                              tool_capable_models=tool_capable_models, registry=registry)
+        except Exception as e:
+            stats.record_error(e)
+            continue
+        stats.record_turn((time.perf_counter() - start) * 1000, result)
+        if args.think_ms:
+            time.sleep(rng.uniform(0, args.think_ms) / 1000)
+    stats.record_session(session.usage)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the turn pipeline with simulated customer sessions")
+    parser.add_argument("--sessions", type=int, default=20, help="Number of simulated customer sessions")
+    parser.add_argument("--turns", type=int, default=5, help="User turns per session")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions running at once")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Max random pause between a session's turns")
+    parser.add_argument("--model", default=os.getenv("DEFAULT_MODEL") or "mock")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint; an in-process mock server is started if omitted")
+    parser.add_argument("--mock-latency-ms", type=float, default=100.0)
+    parser.add_argument("--mock-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-model-latency", default=None, help='Per-model mock latency, e.g. "small=30,large=400"')
+    parser.add_argument("--mock-parallel", type=int, default=0,
+                        help="Concurrent requests per model the mock serves before queueing (0 = unlimited)")
+    parser.add_argument("--mock-script", default=None, help="Scripted responses for the in-process mock server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None, help="Write the report JSON here (default: stdout)")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the scratch directory after the run")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="c360-load-")
+    _ensure_env(scratch)
+
+    # Imported after the environment is set, since storage paths are read at import
+    from openai import OpenAI
+    import langchain_tools
+    from pipeline import load_prompt
+    from tool_registry import ToolRegistry
+    from model_router import get_router
+    from llm_scheduler import get_scheduler
+    from domain_guard import get_guard
+    from mock_llm_server import MockLLMServer, Responder, parse_model_latency
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = MockLLMServer(
+            port=0, latency_ms=args.mock_latency_ms, jitter_ms=args.mock_jitter_ms,
+            error_rate=args.mock_error_rate, responder=Responder.from_file(args.mock_script), seed=args.seed,
+            model_latency_ms=parse_model_latency(args.mock_model_latency), parallel=args.mock_parallel
+        ).start()
+        base_url = server.url
+
+    client = OpenAI(base_url=base_url, api_key=os.getenv("OLLAMA_API_KEY") or "mock", max_retries=0)
+    system_prompt = load_prompt(os.getenv("SYSTEM_PROMPT_PATH"))
+    registry = ToolRegistry()
+    stats = LoadStats()
+
+    get_guard().warm_up()  # trains the classifier, so the first turn isn't charged for it
+    counts_before = langchain_tools.get_storage_counts()
+    print(f"[load] {args.sessions} sessions x {args.turns} turns, concurrency {args.concurrency}, {base_url}",
+          file=sys.stderr)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(run_session, i, args, client, system_prompt, stats, registry)
+                       for i in range(args.sessions)]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - start
+        langchain_tools.flush_writes()
+        counts_after = langchain_tools.get_storage_counts()
+        write_behind = langchain_tools._write_behind_store(create=False)
+    finally:
+        if server:
+            server.stop()
+        if not args.keep_data:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    records_written = sum(counts_after[k] - counts_before.get(k, 0) for k in counts_after)
+    tool_stats = registry.get_stats()
+    write_tools = {name: s for name, s in tool_stats.items() if name != "check_booking_availability" and s["calls"]}
+    failed_turns = sum(stats.errors.values())
+
+    report = {
+        "config": {
+            "sessions": args.sessions, "turns": args.turns, "concurrency": args.concurrency,
+            "model": args.model, "base_url": base_url, "mock_latency_ms": args.mock_latency_ms if server else None
+        },
+        "turns": {
+            "total": stats.turns,
+            "ok": len(stats.turn_ms),
+            "failed": failed_turns,
+            "error_rate": round(failed_turns / stats.turns, 4) if stats.turns else 0.0,
+            "errors": stats.errors,
+            "per_second": round(len(stats.turn_ms) / elapsed, 2) if elapsed else 0.0,
+            "escalations": stats.escalations,
+            "blocked_off_topic": stats.blocked
+        },
+        "latency_ms": {
+            "p50": percentile(stats.turn_ms, 0.50),
+            "p95": percentile(stats.turn_ms, 0.95),
+            "p99": percentile(stats.turn_ms, 0.99),
+            "mean": round(statistics.fmean(stats.turn_ms), 3) if stats.turn_ms else 0.0,
+            "max": round(max(stats.turn_ms), 3) if stats.turn_ms else 0.0,
+            "by_tone": {tone: {"turns": len(ms), "p50": percentile(ms, 0.50), "p95": percentile(ms, 0.95)}
+                        for tone, ms in sorted(stats.turn_ms_by_tone.items())}
+        },
+        "storage": {
+            "records_written": records_written,
+            "records_per_second": round(records_written / elapsed, 2) if elapsed else 0.0,
+            "by_file": {k: counts_after[k] - counts_before.get(k, 0) for k in counts_after}
+        },
+        "tools": {
+            "calls": stats.tool_calls,
+            "errors": stats.tool_errors,
+            "error_rate": round(stats.tool_errors / stats.tool_calls, 4) if stats.tool_calls else 0.0,
+            "write_latency_ms": {name: {"p50": s["p50_ms"], "p95": s["p95_ms"], "max": s["max_ms"]}
+                                 for name, s in write_tools.items()},
+            "stats": tool_stats,
+            "schema_tokens": {
+                **stats.tool_tokens,
+                "saved": stats.tool_tokens["full"] - stats.tool_tokens["sent"],
+                "saved_per_turn": round((stats.tool_tokens["full"] - stats.tool_tokens["sent"]) / len(stats.turn_ms), 1)
+                if stats.turn_ms else 0.0
+            }
+        },
+        "model_tokens": {
+            "by_task": stats.model_tokens,
+            "per_turn": round(sum(t["prompt_tokens"] + t["completion_tokens"] for t in stats.model_tokens.values())
+                              / len(stats.turn_ms), 1) if stats.turn_ms else 0.0,
+            "compactions": stats.compactions
+        },
+        "models": get_router(args.model).get_stats(),
+        "scheduler": get_scheduler().get_stats(),
+        "domain_guard": get_guard().get_stats(),
+        "elapsed_s": round(elapsed, 3)
+    }
+    if write_behind is not None:
+        report["storage"]["write_behind"] = dict(write_behind.stats)
+    if args.keep_data:
+        report["scratch_dir"] = scratch
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if failed_turns and failed_turns == stats.turns else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
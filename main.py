@@ -1,20 +1,61 @@
+import time
+_run_started = time.perf_counter()
 
+import os
+import threading
 import streamlit as st
-import json
-from openai import OpenAI
-from memory import ConversationManager, EscalationDetector, FollowUpTracker
+from contextlib import contextmanager
+from memory import EscalationDetector
+from tool_registry import get_registry
+from pipeline import get_prompt, Session, TurnHooks, run_turn
+from model_router import get_router
+from llm_scheduler import get_scheduler
+from domain_guard import get_guard
 import langchain_tools
-from dotenv import load_dotenv
-import os
+import tracing
 
-load_dotenv()
-model_choice = os.getenv("DEFAULT_MODEL")
+
+# Heavy or one-off dependencies (dotenv, openai, the tool schema, prompts) are
+# loaded on first use and kept for the life of the process
+@st.cache_resource
+def load_environment():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+@st.cache_resource
+def load_tool_schema():
+    return langchain_tools.langchain_tools_schema
+
+
+@st.cache_resource
+def get_client():
+    from openai import OpenAI
+    return OpenAI(
+        base_url=os.getenv("OLLAMA_BASE_URL"),
+        api_key=os.getenv("OLLAMA_API_KEY")
+    )
+
+
+@st.cache_resource
+def start_metrics_endpoint():
+    return tracing.start_metrics_server()
+
+
+@st.cache_resource
+def warm_up():
+    """Train the domain guard and build the similar-case index off the request path, so the first turn doesn't wait"""
+    def build():
+        get_guard().warm_up()
+        import similar_cases
+        similar_cases.get_index().refresh()
+    thread = threading.Thread(target=build, name="warmup", daemon=True)
+    thread.start()
+    return thread
 
 
-def load_prompt(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
-    
+load_environment()
+model_choice = os.getenv("DEFAULT_MODEL")
 
 st.set_page_config(
     page_title="Home Maintenance Assistant",
@@ -22,212 +63,199 @@ st.set_page_config(
     layout="centered"
 )
 
+# Every span recorded during this script run shares the session and run IDs;
+# a run that handles a chat message is that message's turn
+if "trace_session_id" not in st.session_state:
+    st.session_state.trace_session_id = tracing.new_trace_id()
+run_id = tracing.new_trace_id()
+tracing.set_context(session_id=st.session_state.trace_session_id, turn_id=run_id)
+
 st.title("Home Maintenance Assistant")
+
+first_paint_ms = (time.perf_counter() - _run_started) * 1000
+tracing.record_span("app.first_paint", first_paint_ms, first_run="first_paint_ms" not in st.session_state)
+st.session_state.setdefault("first_paint_ms", first_paint_ms)
+
 TOOL_CAPABLE_MODELS = set(os.getenv("TOOL_CAPABLE_MODELS", "").split(","))
-with st.sidebar:
-    
-    if "conversation" in st.session_state:
+
+start_metrics_endpoint()
+warm_up()
+
+# Sidebar stats, the data viewer and the escalation banner are fragments: their
+# own widgets rerun only the fragment, and on a full rerun they read cached data
+# keyed on file versions, so a chat message doesn't reload every dataset
+@st.cache_resource(max_entries=4)
+def cached_storage_counts(version: tuple) -> dict:
+    with tracing.span("sidebar.stats"):
+        return langchain_tools.get_storage_counts()
+
+
+@st.cache_resource(max_entries=16)
+def cached_records(filepath: str, version: tuple) -> list:
+    """Read-only view of a data file; callers must not mutate it"""
+    return langchain_tools.read_records(filepath)
+
+
+@st.fragment
+def conversation_stats():
+    if "conversation" not in st.session_state:
+        return
+    st.divider()
+    st.header("Conversation Stats")
+
+    conv = st.session_state.conversation
+    st.metric("User Messages", conv.get_turn_count())
+    st.metric("Tool Calls", conv.get_tool_call_count())
+
+    usage = st.session_state.session.usage if "session" in st.session_state else None
+    if usage and usage.totals["calls"]:
+        budget = f" / {usage.token_budget:,}" if usage.token_budget else ""
+        st.metric("Tokens", f"{usage.total_tokens:,}{budget}")
+        with st.expander("Token Usage"):
+            for task, totals in usage.to_dict()["by_task"].items():
+                if totals["calls"]:
+                    st.text(f"{task}: {totals['calls']} calls, {totals['prompt_tokens']:,} in / "
+                            f"{totals['completion_tokens']:,} out, {totals['latency_ms'] / totals['calls']:.0f} ms mean")
+            for turn_id, turn in list(usage.by_turn.items())[-3:]:
+                totals = turn["totals"]
+                st.text(f"turn {turn_id[-8:]}: {totals['total_tokens']:,} tokens, {totals['latency_ms']:.0f} ms")
+            if usage.totals["estimated_calls"]:
+                st.caption(f"{usage.totals['estimated_calls']} call(s) without usage data were estimated")
+            if usage.compactions:
+                st.caption(f"Older turns compacted {usage.compactions} time(s)")
+
+    if conv.get_all_facts():
         st.divider()
-        st.header("Conversation Stats")
-        
-        conv = st.session_state.conversation
-        st.metric("User Messages", conv.get_turn_count())
-        st.metric("Tool Calls", conv.get_tool_call_count())
- 
-        if conv.get_all_facts():
+        st.header(" Confirmed Facts")
+        facts = conv.get_all_facts()
+        for key, value in facts.items():
+            history = conv.get_fact_history(key)
+            changed = f"  (turn {history[-1][0]}, was {history[-2][1]})" if len(history) > 1 else ""
+            st.text(f"• {key}: {value}{changed}")
+    if "followup_tracker" in st.session_state:
+        tracker = st.session_state.followup_tracker
+        unanswered = tracker.get_unanswered_count()
+        if unanswered > 0:
             st.divider()
-            st.header(" Confirmed Facts")
-            facts = conv.get_all_facts()
-            for key, value in facts.items():
-                st.text(f"• {key}: {value}")
-        if "followup_tracker" in st.session_state:
-            tracker = st.session_state.followup_tracker
-            unanswered = tracker.get_unanswered_count()
-            if unanswered > 0:
-                st.divider()
-                st.warning(f"⏳ {unanswered} question(s) awaiting response")
-    st.divider()
-    st.header("Data Management")
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("View Data", use_container_width=True):
-            st.session_state.show_data_viewer = True
-    
-    with col2:
-        if st.button("Clear Data", use_container_width=True):
-            langchain_tools.clear_all_data()
-            st.success("All data cleared!")
-            st.rerun()
-    
-   
-    bookings = langchain_tools.get_all_bookings()
-    issues = langchain_tools.get_all_issues()
-    tickets = langchain_tools.get_all_tickets()
-    escalations = langchain_tools.get_all_escalations()
-    
-    st.text(f"Bookings: {len(bookings)}")
-    st.text(f"Issues: {len(issues)}")
-    st.text(f"Tickets: {len(tickets)}")
-    st.text(f"Escalations: {len(escalations)}")
- 
-    st.divider()
-    if st.button("New Conversation", use_container_width=True):
+            st.warning(f"⏳ {unanswered} question(s) awaiting response")
+
+
+@st.fragment
+def storage_stats():
+    counts = cached_storage_counts(langchain_tools.storage_version())
+
+    st.text(f"Bookings: {counts['bookings']}")
+    st.text(f"Issues: {counts['issues']}")
+    st.text(f"Tickets: {counts['tickets']}")
+    st.text(f"Escalations: {counts['escalations']}")
+
+    tool_stats = {name: stats for name, stats in get_registry().get_stats().items() if stats["calls"]}
+    if tool_stats:
+        with st.expander("Tool Performance"):
+            for name, stats in tool_stats.items():
+                st.text(f"{name}: {stats['calls']} calls, {stats['errors']} errors, "
+                        f"mean {stats['mean_ms']:.1f} ms, p95 <= {stats['p95_ms']:.0f} ms")
+
+    model_stats = get_router(model_choice).get_stats()
+    if any(task["models"] for task in model_stats.values()):
+        with st.expander("Model Latency"):
+            for task, stats in model_stats.items():
+                for model, s in stats["models"].items():
+                    st.text(f"{task} -> {model}: {s['calls']} calls, {s['errors']} errors, "
+                            f"mean {s['mean_ms']:.0f} ms, p95 <= {s['p95_ms']:.0f} ms")
+                if stats["fallbacks"]:
+                    st.text(f"{task}: {stats['fallbacks']} fallback(s) to {stats['fallback']}")
+
+    queue = get_scheduler().get_stats()
+    if queue["max_concurrency"] and queue["calls"]:
+        waiting = sum(queue["queued"].values())
+        st.text(f"LLM queue: {queue['running']}/{queue['max_concurrency']} running, {waiting} waiting")
+        with st.expander("LLM Queue Wait"):
+            for priority, s in queue["wait_ms"].items():
+                st.text(f"{priority}: {s['calls']} calls, mean {s['mean_ms']:.0f} ms, p95 <= {s['p95_ms']:.0f} ms")
+            st.text(f"coalesced: {queue['coalesced']}, max depth: {queue['max_depth']}")
+
+    guard = get_guard().get_stats()
+    if guard["checked"]:
+        st.text(f"Domain guard: {guard['blocked']} blocked, {guard['passed']} passed "
+                f"({guard['latency_ms']['mean_ms']:.3f} ms mean)")
+
+    if st.session_state.get("last_turn_id") and st.checkbox("Show last turn timings"):
+        st.text(f"first paint (session start): {st.session_state.first_paint_ms:.1f} ms")
+        for stage, ms in tracing.tracer.turn_breakdown(st.session_state.last_turn_id).items():
+            st.text(f"{stage}: {ms:.1f} ms")
+        selection = st.session_state.get("last_tool_selection")
+        if selection:
+            st.text(f"tools sent: {', '.join(selection.names) or 'none'} "
+                    f"(~{selection.tokens_sent} tokens, {selection.tokens_saved} saved)")
+
+
+def new_conversation():
+    for key in list(st.session_state.keys()):
+        if key not in ['show_data_viewer']:
+            del st.session_state[key]
+
+
+def render_sidebar():
+    with st.sidebar:
+        conversation_stats()
+
+        st.divider()
+        st.header("Data Management")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("View Data", use_container_width=True,
+                      on_click=lambda: st.session_state.update(show_data_viewer=True))
+
+        with col2:
+            if st.button("Clear Data", use_container_width=True, on_click=langchain_tools.clear_all_data):
+                st.success("All data cleared!")
+
+        storage_stats()
+
+        st.divider()
+        st.button("New Conversation", use_container_width=True, on_click=new_conversation)
 
-        for key in list(st.session_state.keys()):
-            if key not in ['show_data_viewer']:
-                del st.session_state[key]
-        st.rerun()
-if st.session_state.get('show_data_viewer', False):
+
+DATA_VIEWER_TABS = [
+    ("Bookings", langchain_tools.BOOKINGS_FILE, "No bookings yet"),
+    ("Issues", langchain_tools.ISSUES_FILE, "No issues logged yet"),
+    ("Tickets", langchain_tools.TICKETS_FILE, "No tickets created yet"),
+    ("Escalations", langchain_tools.ESCALATIONS_FILE, "No escalations yet")
+]
+
+
+@st.fragment
+def data_viewer():
+    if not st.session_state.get('show_data_viewer', False):
+        return
     with st.expander("Stored Data Viewer", expanded=True):
-        tab1, tab2, tab3, tab4 = st.tabs(["Bookings", "Issues", "Tickets", "Escalations"])
-        
-        with tab1:
-            bookings = langchain_tools.get_all_bookings()
-            if bookings:
-                st.json(bookings)
-            else:
-                st.info("No bookings yet")
-        
-        with tab2:
-            issues = langchain_tools.get_all_issues()
-            if issues:
-                st.json(issues)
-            else:
-                st.info("No issues logged yet")
-        
-        with tab3:
-            tickets = langchain_tools.get_all_tickets()
-            if tickets:
-                st.json(tickets)
-            else:
-                st.info("No tickets created yet")
-        
-        with tab4:
-            escalations = langchain_tools.get_all_escalations()
-            if escalations:
-                st.json(escalations)
-            else:
-                st.info("No escalations yet")
-        
-        if st.button("Close Viewer"):
-            st.session_state.show_data_viewer = False
-            st.rerun()
-
-SYSTEM_PROMPT = load_prompt(os.getenv("SYSTEM_PROMPT_PATH"))
-
-
-def extract_facts(client, model, user_message):
-    FACT_EXTRACTION_PROMPT = load_prompt(os.getenv("FACT_PROMPT_PATH"))
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": FACT_EXTRACTION_PROMPT},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0
-        )
-        
-        content = response.choices[0].message.content.strip()
-        return json.loads(content)
-    except Exception as e:
-        return {}
-
-
-def detect_sentiment(message: str) -> dict:
-    frustrated_words = [
-        "angry", "frustrated", "terrible", "worst", "useless",
-        "ridiculous", "annoyed", "fed up", "disappointed"
-    ]
-
-    anxious_words = [
-        "worried", "anxious", "scared", "afraid", "nervous",
-        "concerned", "not sure", "uncertain", "don't know"
-    ]
-
-    urgent_words = [
-        "urgent", "emergency", "asap", "immediately", "now",
-        "right now", "help", "serious", "critical", "danger"
-    ]
-
-    text = message.lower()
-
-    is_frustrated = any(w in text for w in frustrated_words)
-    is_anxious = any(w in text for w in anxious_words)
-    is_urgent = any(w in text for w in urgent_words)
-
-    if is_urgent:
-        tone = "urgent"
-    elif is_frustrated:
-        tone = "frustrated"
-    elif is_anxious:
-        tone = "anxious"
-    else:
-        tone = "calm"
+        tabs = st.tabs([label for label, _, _ in DATA_VIEWER_TABS])
 
-    return {
-        "tone": tone,
-        "is_frustrated": is_frustrated,
-        "is_anxious": is_anxious,
-        "is_urgent": is_urgent
-    }
+        for tab, (_, filepath, empty_message) in zip(tabs, DATA_VIEWER_TABS):
+            with tab:
+                records = cached_records(filepath, langchain_tools.view_version(filepath))
+                if records:
+                    st.json(records)
+                else:
+                    st.info(empty_message)
+
+        st.button("Close Viewer", on_click=lambda: st.session_state.update(show_data_viewer=False))
+
+
+data_viewer()
 
+SYSTEM_PROMPT = get_prompt(os.getenv("SYSTEM_PROMPT_PATH"))
 
-def get_sentiment_instruction(sentiment: dict) -> str:
-    if sentiment["tone"] == "frustrated":
-        return """TONE ADJUSTMENT: User is frustrated.
-- Acknowledge their frustration explicitly
-- Be extra patient and empathetic
-- Keep sentences short and reassuring
-- Consider offering human help if frustration continues
-- Focus on immediate helpful actions"""
-
-    if sentiment["tone"] == "anxious":
-        return """TONE ADJUSTMENT: User is anxious/worried.
-- Provide calm reassurance without false promises
-- Explain steps slowly and clearly
-- Emphasize what they can control
-- Highlight safety measures"""
-
-    if sentiment["tone"] == "urgent":
-        return """TONE ADJUSTMENT: User indicates urgency.
-- Prioritize immediate safety advice FIRST
-- Be direct and concise
-- Create tickets for urgent issues
-- Avoid unnecessary questions unless critical
-- Provide clear action steps"""
-
-    return """TONE ADJUSTMENT: User appears calm.
-- Proceed with normal professional guidance
-- Maintain friendly, helpful demeanor"""
-
-
-def build_context_with_facts(conversation: ConversationManager, sentiment_guidance: str = None):
-    """Build message context with facts and sentiment injected appropriately"""
-    messages = conversation.get_context().copy()
-
-    facts_summary = conversation.get_facts_summary()
-    if facts_summary:
-        messages.insert(1, {
-            "role": "system",
-            "content": facts_summary
-        })
-
-    if sentiment_guidance:
-        messages.insert(1, {
-            "role": "system",
-            "content": sentiment_guidance
-        })
-    
-    return messages
-
-
-def display_escalation_alert(should_escalate: bool, reasons: list, severity: str, detector: EscalationDetector):
+
+@st.fragment
+def escalation_banner(engine, detector: EscalationDetector):
     """Display escalation warning to user"""
+    should_escalate, reasons, severity = engine.evaluate()
     if not should_escalate:
         return
-    
+
     if severity == "critical":
         alert_type = st.error
         icon = "!!!ERROR!!!"
@@ -237,171 +265,108 @@ def display_escalation_alert(should_escalate: bool, reasons: list, severity: str
     else:
         alert_type = st.info
         icon = "!!!NOTICE!!!"
-    
-    with alert_type(icon=icon):
+
+    st.divider()
+    with st.container(border=True):
+        alert_type(icon)
         st.subheader("Professional Assistance Recommended")
-        
+
         for reason in reasons:
             st.write(reason)
-        
+
         st.divider()
         st.write(detector.get_escalation_message(severity))
-        
+
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Connect to Specialist", use_container_width=True, key="escalate_btn"):
                 st.success("Initiating connection to specialist...")
                 # trigger actual escalation
-        
+
         with col2:
             if st.button("Continue Conversation", use_container_width=True, key="continue_btn"):
                 st.info("Continuing conversation. Type your next message below.")
 
 
+if "session" not in st.session_state:
+    st.session_state.session = Session(SYSTEM_PROMPT, session_id=st.session_state.trace_session_id)
 
-if "conversation" not in st.session_state:
-    st.session_state.conversation = ConversationManager(SYSTEM_PROMPT)
-
-if "escalation_detector" not in st.session_state:
-    st.session_state.escalation_detector = EscalationDetector()
-
-if "followup_tracker" not in st.session_state:
-    st.session_state.followup_tracker = FollowUpTracker()
+session = st.session_state.session
+st.session_state.conversation = session.conversation
+st.session_state.followup_tracker = session.followup_tracker
 
-if "last_sentiment" not in st.session_state:
-    st.session_state.last_sentiment = {"tone": "calm"}
+conversation = session.conversation
+escalation_detector = session.escalation_detector
+escalation_engine = session.escalation_engine
 
-conversation = st.session_state.conversation
-escalation_detector = st.session_state.escalation_detector
-followup_tracker = st.session_state.followup_tracker
 
+class StreamlitHooks(TurnHooks):
 
-for msg in conversation.get_context():
-    if msg["role"] in ("user", "assistant"):
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+    STAGE_LABELS = {
+        "facts": "Analyzing message...",
+        "thinking": "Thinking...",
+        "processing": "Processing results..."
+    }
 
-critical_safety = len([t for t in langchain_tools.get_all_tickets() if t.get("severity") in ["high", "critical"]]) > 0
-should_escalate, reasons, severity = escalation_detector.should_escalate(
-    conversation, 
-    st.session_state.last_sentiment,
-    critical_safety
-)
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self._status = None
 
-if should_escalate:
-    display_escalation_alert(should_escalate, reasons, severity, escalation_detector)
+    def stage(self, name: str):
+        return st.spinner(self.STAGE_LABELS.get(name, "Working..."))
 
-if prompt := st.chat_input("Describe the issue you're facing..."):
-    conversation.add("user", prompt)
-
-    with st.chat_message("user"):
-        st.markdown(prompt)
+    @contextmanager
+    def tool(self, name: str):
+        with st.status(f"Executing {name}...", expanded=False) as status:
+            self._status = status
+            yield
 
-    client = OpenAI(
-        base_url=os.getenv("OLLAMA_BASE_URL"),
-        api_key=os.getenv("OLLAMA_API_KEY")
-    )
+    def tool_result(self, result):
+        st.write(f"Arguments: {result.arguments}")
+        if result.ok:
+            st.write(f"Result: {result.summary()}")
+            self._status.update(label=f"{result.name} completed", state="complete")
+        else:
+            st.error(result.summary())
+            self._status.update(label=f"{result.name} failed", state="error")
 
-    sentiment = detect_sentiment(prompt)
-    st.session_state.last_sentiment = sentiment
-    tone_guidance = get_sentiment_instruction(sentiment)
+    def assistant_text(self, text: str):
+        self.placeholder.markdown(text)
 
-    with st.spinner("Analyzing message..."):
-        extracted_facts = extract_facts(client, model_choice, prompt)
-        for key, value in extracted_facts.items():
-            conversation.set_fact(key, value)
-    answered_questions = followup_tracker.check_if_answered(prompt)
-    if answered_questions:
+    def answered(self, questions: list):
         with st.sidebar:
-            st.success(f"Answered {len(answered_questions)} question(s)")
+            st.success(f"Answered {len(questions)} question(s)")
 
-    with st.chat_message("assistant"):
-        placeholder = st.empty()
-
-        messages = build_context_with_facts(conversation, tone_guidance)
-
-        request_args = {
-            "model":os.getenv("DEFAULT_MODEL"),
-            "messages": messages,
-        }
-
-        if model_choice in TOOL_CAPABLE_MODELS:
-            request_args["tools"] = langchain_tools.langchain_tools_schema
-            request_args["tool_choice"] = "auto"
-
-        with st.spinner("Thinking..."):
-            response = client.chat.completions.create(**request_args)
-        
-        msg = response.choices[0].message
-        tool_calls = getattr(msg, "tool_calls", None)
-
-        if tool_calls:
-            if msg.content:
-                conversation.add("assistant", msg.content)
-                placeholder.markdown(msg.content)
-
-            for tc in tool_calls:
-                fn_name = tc.function.name
-                fn_args = json.loads(tc.function.arguments)
-
-                with st.status(f"Executing {fn_name}...", expanded=False) as status:
-                    st.write(f"Arguments: {fn_args}")
-
-                    fn = langchain_tools.available_langchain_functions.get(fn_name)
-                    if fn:
-                        try:
-                            result = fn.invoke(fn_args)
-                        except:
-                            result = fn(**fn_args)
-                        result_data = json.loads(result)
-
-                        st.write(f"Result: {result_data.get('message', result_data.get('status', 'Done'))}")
-                        status.update(label=f"{fn_name} completed", state="complete")
-                    else:
-                        result = json.dumps({"error": "Tool unavailable"})
-                        st.error("Tool not found!")
-
-                conversation.add_tool(
-                    tool_call_id=tc.id,
-                    name=fn_name,
-                    content=result
-                )
-
-            messages = build_context_with_facts(conversation, tone_guidance)
-            
-            with st.spinner("Processing results..."):
-                final_response = client.chat.completions.create(
-                    model=model_choice,
-                    messages=messages,
-                )
-
-            final_text = final_response.choices[0].message.content
-            conversation.add("assistant", final_text)
-
-            if msg.content:
-                placeholder.markdown(msg.content + "\n\n" + final_text)
-            else:
-                placeholder.markdown(final_text)
 
-        else:
-   
-            final_text = msg.content
-            conversation.add("assistant", final_text)
-            placeholder.markdown(final_text)
+with tracing.span("render.history"):
+    for msg in conversation.get_context():
+        if msg["role"] in ("user", "assistant"):
+            with st.chat_message(msg["role"]):
+                st.markdown(msg["content"])
 
+if prompt := st.chat_input("Describe the issue you're facing..."):
+    with st.chat_message("user"):
+        st.markdown(prompt)
 
-        followup_tracker.add_ai_response(final_text)
+    client = get_client()
 
+    with st.chat_message("assistant"):
+        turn = run_turn(
+            session,
+            prompt,
+            client,
+            model_choice,
+            tool_capable_models=TOOL_CAPABLE_MODELS,
+            hooks=StreamlitHooks(st.empty()),
+            tools=load_tool_schema()
+        )
 
-    critical_safety = len([t for t in langchain_tools.get_all_tickets() if t.get("severity") in ["high", "critical"]]) > 0
-    should_escalate, reasons, severity = escalation_detector.should_escalate(
-        conversation, 
-        sentiment,
-        critical_safety
-    )
+    st.session_state.last_sentiment = turn.sentiment
+    st.session_state.last_turn_id = run_id
+    st.session_state.last_tool_selection = turn.tool_selection
 
-    if should_escalate:
-        st.divider()
-        display_escalation_alert(should_escalate, reasons, severity, escalation_detector)
+# Rendered after the turn so the banner and sidebar reflect the latest message
+escalation_banner(escalation_engine, escalation_detector)
+render_sidebar()
 
 st.divider()
@@ -1,14 +1,105 @@
 
 
+SEVERITY_LEVELS = ["low", "medium", "high", "critical"]
+SEVERITY_RANK = {level: rank for rank, level in enumerate(SEVERITY_LEVELS)}
+
+QUESTION_STOP_WORDS = {"the", "a", "an", "is", "are", "how", "what", "when", "where",
+                       "why", "can", "could", "should", "i", "my", "me", "you"}
+
+
+def max_severity(a: str, b: str) -> str:
+    """Return the more severe of two severity levels"""
+    return a if SEVERITY_RANK.get(a, 0) >= SEVERITY_RANK.get(b, 0) else b
+
+
+def question_words(message: str) -> set:
+    """Content words of a user message, used for repeated-question detection"""
+    return set(message.lower().split()) - QUESTION_STOP_WORDS
+
+
+def is_repeating(word_sets: list) -> bool:
+    """True if the last three user messages overlap heavily"""
+    if len(word_sets) < 3:
+        return False
+    overlap_01 = len(word_sets[0] & word_sets[1]) / max(len(word_sets[0]), 1)
+    overlap_12 = len(word_sets[1] & word_sets[2]) / max(len(word_sets[1]), 1)
+    return overlap_01 > 0.5 or overlap_12 > 0.5
+
+
+def _clip(text: str, limit: int = 160) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _render_facts(title: str, lines: list) -> str:
+    return (title + "\n" + "\n".join(lines)) if lines else ""
+
+
+class FactStore:
+    """
+    Facts with their change history: each change records the turn it was made
+    on and bumps the store's version. The rendered summary is cached until a
+    fact changes.
+    """
+
+    # values kept per fact in history
+    MAX_HISTORY = 20
+
+    def __init__(self):
+        self.values = {}
+        # key -> [(turn, value), ...], oldest first
+        self.history = {}
+        self.version = 0
+        self._changed = {}
+        self._summary = (0, "")
+
+    def set(self, key: str, value: str, turn: int) -> bool:
+        """Record a value; returns False (and changes nothing) if it is the current one"""
+        if self.values.get(key) == value:
+            return False
+        self.values[key] = value
+        history = self.history.setdefault(key, [])
+        history.append((turn, value))
+        del history[:-self.MAX_HISTORY]
+        self.version += 1
+        self._changed[key] = self.version
+        return True
+
+    def changed_since(self, version: int) -> list:
+        """Keys whose value changed after the given version"""
+        return [key for key in self.values if self._changed[key] > version]
+
+    def summary(self) -> str:
+        if self._summary[0] != self.version:
+            self._summary = (self.version, _render_facts(
+                "Confirmed Information:", [f"  • {key}: {value}" for key, value in self.values.items()]))
+        return self._summary[1]
+
+    def delta_summary(self, since_version: int) -> str:
+        """Only the facts that changed after since_version, with the value each replaced"""
+        lines = []
+        for key in self.changed_since(since_version):
+            history = self.history[key]
+            line = f"  • {key}: {self.values[key]}"
+            if len(history) > 1:
+                line += f" (was: {history[-2][1]})"
+            lines.append(line)
+        return _render_facts("Confirmed Information (new or changed this turn):", lines)
+
+
 class ConversationManager:
 
     
     def __init__(self, system_prompt: str):
         self.system_prompt = system_prompt
         self.messages = [{"role": "system", "content": system_prompt}]
-        self.facts = {}  
+        self.fact_store = FactStore()
+        # fact store version the model has seen, in full or as deltas (see get_facts_context)
+        self.facts_shown_version = 0
         self.turn_count = 0
         self.tool_call_count = 0
+        # summary of compacted turns, kept as messages[1] (see compact)
+        self.summary = ""
         
     def add(self, role: str, content: str):
         """Add a message to conversation history"""
@@ -27,10 +118,15 @@ class ConversationManager:
         })
         self.tool_call_count += 1
     
+    @property
+    def facts(self):
+        return self.fact_store.values
+
     def set_fact(self, key: str, value: str):
-      
+        """Record a fact against the current turn; returns True if it is new or changed"""
         if value and value.strip():
-            self.facts[key] = value
+            return self.fact_store.set(key, value, self.turn_count)
+        return False
     
     def get_fact(self, key: str):
       
@@ -41,14 +137,27 @@ class ConversationManager:
         return self.facts.copy()
     
     def get_facts_summary(self):
-     
-        if not self.facts:
-            return ""
-        
-        summary = "Confirmed Information:\n"
-        for key, value in self.facts.items():
-            summary += f"  • {key}: {value}\n"
-        return summary.strip()
+        """All facts, rendered once per change"""
+        return self.fact_store.summary()
+
+    def get_fact_history(self, key: str):
+        """[(turn, value), ...] for a fact, oldest first"""
+        return list(self.fact_store.history.get(key, []))
+
+    def get_facts_context(self, delta: bool = False):
+        """
+        Facts block for the next request. With delta, once the model has been
+        shown the facts, only those new or changed since are included; the
+        customer's own messages, which they were extracted from, stay in the
+        history.
+        """
+        if not delta or not self.facts_shown_version:
+            return self.get_facts_summary()
+        return self.fact_store.delta_summary(self.facts_shown_version)
+
+    def mark_facts_shown(self):
+        """Call once a turn's requests have been sent"""
+        self.facts_shown_version = self.fact_store.version
     
     def get_context(self, include_facts=False):
         """Get conversation context, optionally with facts"""
@@ -71,12 +180,42 @@ class ConversationManager:
  
         return self.tool_call_count
     
+    def compact(self, keep_turns: int = 2, max_lines: int = 40) -> int:
+        """
+        Replace everything before the last keep_turns user messages with one
+        system message summarising the user's messages and tool results.
+        Facts are kept separately, so nothing extracted is lost. Returns the
+        number of messages removed.
+        """
+        user_positions = [i for i, msg in enumerate(self.messages) if msg["role"] == "user"]
+        if len(user_positions) <= keep_turns:
+            return 0
+        start = 2 if self.summary else 1
+        cut = user_positions[-keep_turns] if keep_turns > 0 else len(self.messages)
+        old = self.messages[start:cut]
+        if not old:
+            return 0
+
+        lines = self.summary.splitlines()[1:] if self.summary else []
+        for msg in old:
+            if msg["role"] == "user":
+                lines.append(f"- User: {_clip(msg['content'])}")
+            elif msg["role"] == "tool":
+                lines.append(f"- {msg.get('name', 'tool')} result: {_clip(msg['content'])}")
+        self.summary = "Earlier in this conversation (summarised):\n" + "\n".join(lines[-max_lines:])
+        self.messages = [self.messages[0], {"role": "system", "content": self.summary}] + self.messages[cut:]
+        # the messages the facts came from are only summarised now, so show them all again
+        self.facts_shown_version = 0
+        return len(old)
+
     def clear(self):
  
         self.messages = [{"role": "system", "content": self.system_prompt}]
-        self.facts = {}
+        self.fact_store = FactStore()
+        self.facts_shown_version = 0
         self.turn_count = 0
         self.tool_call_count = 0
+        self.summary = ""
 
 
 class EscalationDetector:
@@ -105,24 +244,24 @@ class EscalationDetector:
    
         if conversation.get_turn_count() >= self.turn_threshold:
             reasons.append(f"Conversation exceeds {self.turn_threshold} turns - may need expert guidance")
-            severity = max(severity, "high")
+            severity = max_severity(severity, "high")
      
         if sentiment.get("is_frustrated") and conversation.get_turn_count() >= self.frustrated_turn_threshold:
             reasons.append("Customer appears frustrated after multiple exchanges")
-            severity = max(severity, "high")
+            severity = max_severity(severity, "high")
    
         if sentiment.get("is_urgent") and conversation.get_turn_count() >= 4:
             reasons.append(" Urgent issue not resolved after several exchanges")
-            severity = max(severity, "medium")
+            severity = max_severity(severity, "medium")
         
    
         if conversation.get_tool_call_count() >= self.tool_call_threshold:
             reasons.append(f"Complex issue requiring {conversation.get_tool_call_count()} tool calls")
-            severity = max(severity, "medium")
+            severity = max_severity(severity, "medium")
 
         if self._detect_repeated_questions(conversation):
             reasons.append("User asking similar questions - AI may not be helping effectively")
-            severity = max(severity, "medium")
+            severity = max_severity(severity, "medium")
 
         should_escalate = len(reasons) > 0
         
@@ -134,26 +273,9 @@ class EscalationDetector:
         
         if len(user_messages) < 3:
             return False
-        
-    
-        recent_messages = user_messages[-3:]
 
-        word_sets = []
-        for msg in recent_messages:
-            words = set(msg["content"].lower().split())
-   
-            words = words - {"the", "a", "an", "is", "are", "how", "what", "when", "where", 
-                            "why", "can", "could", "should", "i", "my", "me", "you"}
-            word_sets.append(words)
-
-        if len(word_sets) >= 2:
-            overlap_01 = len(word_sets[0] & word_sets[1]) / max(len(word_sets[0]), 1)
-            if len(word_sets) >= 3:
-                overlap_12 = len(word_sets[1] & word_sets[2]) / max(len(word_sets[1]), 1)
-                if overlap_01 > 0.5 or overlap_12 > 0.5:
-                    return True
-        
-        return False
+        word_sets = [question_words(msg["content"]) for msg in user_messages[-3:]]
+        return is_repeating(word_sets)
     
     def get_escalation_message(self, severity: str):
 
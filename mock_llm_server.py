@@ -0,0 +1,386 @@
+"""
+Local stand-in for the OpenAI-compatible chat API served by Ollama.
+
+Speaks POST /v1/chat/completions (including tools/tool_calls and SSE
+streaming) and GET /v1/models, with configurable latency, jitter and error
+rate, so the app and the load generator can run without a GPU.
+
+Responses come from an optional script of rules (first match wins):
+
+    {"rules": [
+        {"match": {"kind": "chat", "user_contains": ["gas", "smoke"], "has_tools": true},
+         "response": {"tool_calls": [{"name": "create_maintenance_ticket",
+                                      "arguments": {"issue_type": "gas", ...}}]}},
+        {"match": {"kind": "facts"}, "response": {"content": "{\"issue_type\": \"gas\"}"}}
+    ]}
+
+kind is "facts" (the fact-extraction call), "post_tool" (last message is a
+tool result) or "chat". Requests that match no rule get keyword-driven
+defaults.
+
+Usage:
+    python mock_llm_server.py --port 11435 --latency-ms 300 --jitter-ms 100
+    OLLAMA_BASE_URL=http://127.0.0.1:11435/v1 streamlit run main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+FACT_KEYWORDS = {
+    "issue_type": {
+        "leak": "leak", "drip": "leak", "damp": "damp", "mould": "damp", "mold": "damp",
+        "gas": "gas", "spark": "electrical", "socket": "electrical", "electric": "electrical",
+        "radiator": "heating", "boiler": "heating", "heating": "heating", "crack": "structural"
+    },
+    "location": {
+        "kitchen": "kitchen", "bedroom": "bedroom", "bathroom": "bathroom", "living room": "living room",
+        "loft": "loft", "basement": "basement", "garage": "garage", "hallway": "hallway", "ceiling": "ceiling"
+    }
+}
+
+DEFAULT_TOOL_ARGS = {
+    "book_maintenance_appointment": {
+        "customer_name": "Load Test Customer", "contact_number": "07700 900123",
+        "issue_description": "Customer reported maintenance issue", "preferred_date": "next week",
+        "address": "12 High Street"
+    },
+    "check_booking_availability": {"date_str": "next week"},
+    "get_customer_profile": {"customer": "Load Test Customer"},
+    "create_maintenance_ticket": {
+        "issue_type": "gas", "severity": "critical", "description": "Customer reports smell of gas",
+        "customer_name": "Load Test Customer", "location": "12 High Street", "requires_immediate_action": True
+    },
+    "log_customer_issue": {
+        "customer_name": "Load Test Customer", "issue_type": "leak",
+        "description": "Water coming through the ceiling", "location": "kitchen ceiling", "severity": "medium"
+    },
+    "escalate_to_human_representative": {
+        "reason": "customer_request", "customer_name": "Load Test Customer",
+        "issue_summary": "Customer asked for a human agent"
+    }
+}
+
+# Checked in order; the first tool whose keywords appear in the user message is called
+TOOL_KEYWORDS = [
+    ("escalate_to_human_representative", ["human", "agent", "representative", "real person"]),
+    ("create_maintenance_ticket", ["gas", "spark", "fire", "smoke", "burning"]),
+    ("check_booking_availability", ["available", "availability"]),
+    ("get_customer_profile", ["last time", "previous", "again"]),
+    ("book_maintenance_appointment", ["book", "appointment", "technician"]),
+    ("log_customer_issue", ["leak", "damp", "mould", "crack", "drip"])
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def request_kind(request: Dict) -> str:
+    messages = request.get("messages", [])
+    if messages and messages[-1].get("role") == "tool":
+        return "post_tool"
+    if (not request.get("tools") and request.get("temperature") == 0
+            and len(messages) == 2 and messages[0].get("role") == "system"):
+        return "facts"
+    return "chat"
+
+
+def last_user_message(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+class Responder:
+    """Turns a chat completion request into (content, tool_calls)"""
+
+    def __init__(self, rules: Optional[List[Dict]] = None):
+        self.rules = rules or []
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "Responder":
+        if not path:
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            script = json.load(f)
+        return cls(script["rules"] if isinstance(script, dict) else script)
+
+    def _matches(self, match: Dict, kind: str, user_text: str, has_tools: bool) -> bool:
+        if "kind" in match and match["kind"] != kind:
+            return False
+        if "has_tools" in match and bool(match["has_tools"]) != has_tools:
+            return False
+        needles = match.get("user_contains")
+        if needles:
+            if isinstance(needles, str):
+                needles = [needles]
+            if not any(needle.lower() in user_text for needle in needles):
+                return False
+        return True
+
+    def respond(self, request: Dict):
+        messages = request.get("messages", [])
+        kind = request_kind(request)
+        user_text = last_user_message(messages).lower()
+        tools = request.get("tools") or []
+        tool_names = {tool["function"]["name"] for tool in tools}
+
+        for rule in self.rules:
+            if self._matches(rule.get("match", {}), kind, user_text, bool(tools)):
+                response = rule.get("response", {})
+                tool_calls = [call for call in response.get("tool_calls", []) if call["name"] in tool_names]
+                return response.get("content"), tool_calls
+
+        if kind == "facts":
+            facts = {}
+            for fact, keywords in FACT_KEYWORDS.items():
+                for keyword, value in keywords.items():
+                    if keyword in user_text:
+                        facts[fact] = value
+                        break
+            return json.dumps(facts), []
+
+        if kind == "post_tool":
+            try:
+                result = json.loads(messages[-1].get("content") or "{}")
+            except json.JSONDecodeError:
+                result = {}
+            summary = result.get("message") or "That's been taken care of."
+            return f"{summary}\n\nIs there anything else I can help you with?", []
+
+        for name, keywords in TOOL_KEYWORDS:
+            if name in tool_names and any(keyword in user_text for keyword in keywords):
+                return None, [{"name": name, "arguments": DEFAULT_TOOL_ARGS[name]}]
+
+        return ("I understand. To help you best, could you tell me exactly where the problem is "
+                "and how long it has been happening?"), []
+
+
+class MockLLMServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11435, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, stream_chunk_ms: float = 0.0, error_rate: float = 0.0,
+                 responder: Optional[Responder] = None, seed: Optional[int] = None,
+                 model_latency_ms: Optional[Dict[str, float]] = None, parallel: int = 0):
+        self.latency_ms = latency_ms
+        self.model_latency_ms = model_latency_ms or {}
+        # like OLLAMA_NUM_PARALLEL: requests to one model beyond this queue (0 = unlimited)
+        self.parallel = parallel
+        self._model_slots: Dict[str, threading.Semaphore] = {}
+        self.jitter_ms = jitter_ms
+        self.stream_chunk_ms = stream_chunk_ms
+        self.error_rate = error_rate
+        self.responder = responder or Responder()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        handler = type("Handler", (_Handler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def next_delay(self, model: Optional[str] = None):
+        """Returns (seconds to sleep, whether to fail this request)"""
+        with self._lock:
+            self.requests += 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate and self._rng.random() < self.error_rate
+        latency_ms = self.model_latency_ms.get(model, self.latency_ms)
+        return max(latency_ms + jitter, 0.0) / 1000, fail
+
+    def model_slot(self, model: str):
+        """Semaphore limiting concurrent requests to model, or None if unlimited"""
+        if not self.parallel:
+            return None
+        with self._lock:
+            slot = self._model_slots.get(model)
+            if slot is None:
+                slot = self._model_slots[model] = threading.Semaphore(self.parallel)
+            return slot
+
+
+def parse_model_latency(spec: Optional[str]) -> Dict[str, float]:
+    """'small=30,large=400' -> {"small": 30.0, "large": 400.0}"""
+    latencies = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            model, ms = part.rsplit("=", 1)
+            latencies[model.strip()] = float(ms)
+    return latencies
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    server_state: MockLLMServer = None
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without this each response
+    # stalls on delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "local"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        state = self.server_state
+        delay, fail = state.next_delay(request.get("model"))
+        slot = state.model_slot(request.get("model", "mock"))
+        if slot:
+            with slot:
+                time.sleep(delay)
+        else:
+            time.sleep(delay)
+        if fail:
+            self._send_json(500, {"error": {"message": "Injected mock failure", "type": "server_error"}})
+            return
+
+        content, tool_calls = state.responder.respond(request)
+        calls = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}
+        } for call in tool_calls]
+
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in request.get("messages", []))
+        prompt_tokens += estimate_tokens(json.dumps(request["tools"])) if request.get("tools") else 0
+        completion_tokens = estimate_tokens(content or "") + sum(estimate_tokens(c["function"]["arguments"]) for c in calls)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+        model = request.get("model", "mock")
+        finish_reason = "tool_calls" if calls else "stop"
+
+        if request.get("stream"):
+            self._stream(completion_id, model, content, calls, finish_reason, usage,
+                         include_usage=bool((request.get("stream_options") or {}).get("include_usage")))
+            return
+
+        message = {"role": "assistant", "content": content}
+        if calls:
+            message["tool_calls"] = calls
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id, model, content, calls, finish_reason, usage, include_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish=None, chunk_usage=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else []
+            }
+            if chunk_usage:
+                payload["usage"] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        if content:
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                if self.server_state.stream_chunk_ms:
+                    time.sleep(self.server_state.stream_chunk_ms / 1000)
+                chunk({"content": word if i == 0 else " " + word})
+        for index, call in enumerate(calls):
+            chunk({"tool_calls": [{"index": index, **call}]})
+        chunk({}, finish=finish_reason)
+        if include_usage:
+            chunk(None, chunk_usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--model-latency", default=None, help='Per-model base latency, e.g. "small=30,large=400"')
+    parser.add_argument("--parallel", type=int, default=0, help="Concurrent requests per model before queueing (0 = unlimited)")
+    parser.add_argument("--stream-chunk-ms", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that return HTTP 500")
+    parser.add_argument("--script", default=None, help="JSON file of scripted response rules")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        stream_chunk_ms=args.stream_chunk_ms, error_rate=args.error_rate,
+        responder=Responder.from_file(args.script), seed=args.seed,
+        model_latency_ms=parse_model_latency(args.model_latency), parallel=args.parallel
+    )
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
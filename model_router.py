@@ -0,0 +1,175 @@
+"""
+Per-task model routing for the LLM calls in a turn.
+
+Each task, "extraction" (fact extraction), "chat" (the main reply, with tools)
+and "post_tool" (the reply after tool results), is routed to its own model,
+so fact extraction can run on a small, fast model. A task can also name a
+fallback model: when the primary is saturated, the call goes to the fallback
+instead, as long as the fallback isn't saturated too and the call can use it
+(a chat call that offers tools only falls back to a tool-capable model). A
+model is saturated when this process already has MODEL_MAX_INFLIGHT requests
+in flight to it, or when its expected queueing time (in-flight requests x
+recent mean latency) is over the task's latency budget. Latency is recorded per task and model so the
+routes can be tuned.
+
+Config (env); unset models default to the app's default model (DEFAULT_MODEL):
+    EXTRACTION_MODEL, EXTRACTION_FALLBACK_MODEL
+    CHAT_MODEL, CHAT_FALLBACK_MODEL
+    POST_TOOL_MODEL, POST_TOOL_FALLBACK_MODEL
+    MODEL_MAX_INFLIGHT        in-flight requests before a model is saturated: "4", or per model "4,qwen2.5:0.5b=16"
+    <TASK>_LATENCY_BUDGET_MS  e.g. CHAT_LATENCY_BUDGET_MS=3000 (default: no budget)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Collection, Dict, Optional, Tuple
+
+from tool_registry import ToolStats
+
+
+TASKS = ["extraction", "chat", "post_tool"]
+
+DEFAULT_MAX_INFLIGHT = 4
+
+# Weight of the newest call in a model's running mean latency
+LATENCY_ALPHA = 0.2
+
+
+def load_max_inflight(spec: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+    """(default limit, per-model limits) from a MODEL_MAX_INFLIGHT spec"""
+    spec = spec if spec is not None else os.getenv("MODEL_MAX_INFLIGHT", "")
+    default, per_model = DEFAULT_MAX_INFLIGHT, {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "=" in part:
+                model, limit = part.rsplit("=", 1)
+                per_model[model.strip()] = int(limit)
+            else:
+                default = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid MODEL_MAX_INFLIGHT entry '{part}'")
+    return default, per_model
+
+
+class ModelState:
+    """Load on one model from this process"""
+
+    def __init__(self):
+        self.inflight = 0
+        self.mean_ms = 0.0
+
+    def expected_wait_ms(self) -> float:
+        return self.inflight * self.mean_ms
+
+    def observe(self, latency_ms: float):
+        self.mean_ms = latency_ms if not self.mean_ms else (
+            LATENCY_ALPHA * latency_ms + (1 - LATENCY_ALPHA) * self.mean_ms)
+
+
+class ModelRouter:
+
+    def __init__(self, default_model: str, routes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+                 max_inflight: Optional[int] = None, budgets_ms: Optional[Dict[str, float]] = None):
+        self.default_model = default_model
+        self.routes = routes or {
+            task: (os.getenv(f"{task.upper()}_MODEL") or default_model,
+                   os.getenv(f"{task.upper()}_FALLBACK_MODEL") or None)
+            for task in TASKS
+        }
+        env_default, self.model_limits = load_max_inflight()
+        self.max_inflight = max_inflight or env_default
+        self.budgets_ms = budgets_ms if budgets_ms is not None else {
+            task: float(os.environ[f"{task.upper()}_LATENCY_BUDGET_MS"])
+            for task in TASKS if os.getenv(f"{task.upper()}_LATENCY_BUDGET_MS")
+        }
+        self._models: Dict[str, ModelState] = {}
+        self._stats: Dict[Tuple[str, str], ToolStats] = {}
+        self._fallbacks: Dict[str, int] = {task: 0 for task in self.routes}
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = ModelState()
+        return state
+
+    def is_saturated(self, model: str, task: str) -> bool:
+        state = self._state(model)
+        if state.inflight >= self.model_limits.get(model, self.max_inflight):
+            return True
+        budget = self.budgets_ms.get(task)
+        return budget is not None and state.expected_wait_ms() > budget
+
+    def _choose(self, task: str, fallbacks: Optional[Collection[str]] = None) -> Tuple[str, bool]:
+        """(model, whether it is the fallback); call under _lock"""
+        primary, fallback = self.routes.get(task, (self.default_model, None))
+        usable = fallbacks is None or fallback in fallbacks or primary not in fallbacks
+        if fallback and fallback != primary and usable \
+                and self.is_saturated(primary, task) and not self.is_saturated(fallback, task):
+            return fallback, True
+        return primary, False
+
+    def route(self, task: str, fallbacks: Optional[Collection[str]] = None) -> str:
+        """Model the next call for task would go to"""
+        with self._lock:
+            return self._choose(task, fallbacks)[0]
+
+    @contextmanager
+    def call(self, task: str, fallbacks: Optional[Collection[str]] = None):
+        """
+        Route one call for task; the block receives the model and is timed against it.
+        fallbacks limits the models the call may fall back to (e.g. the tool-capable
+        ones), unless the primary isn't one of them either
+        """
+        with self._lock:
+            model, fell_back = self._choose(task, fallbacks)
+            state = self._state(model)
+            state.inflight += 1
+            if fell_back:
+                self._fallbacks[task] = self._fallbacks.get(task, 0) + 1
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield model
+            ok = True
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                state.inflight -= 1
+                if ok:
+                    state.observe(latency_ms)
+                stats = self._stats.get((task, model))
+                if stats is None:
+                    stats = self._stats[(task, model)] = ToolStats()
+                stats.record(latency_ms, ok)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per task: its route, fallback count and latency stats per model used"""
+        with self._lock:
+            stats = {}
+            for task, (primary, fallback) in self.routes.items():
+                stats[task] = {
+                    "primary": primary,
+                    "fallback": fallback,
+                    "fallbacks": self._fallbacks.get(task, 0),
+                    "models": {model: s.to_dict() for (t, model), s in self._stats.items() if t == task}
+                }
+            return stats
+
+
+_routers: Dict[str, ModelRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(default_model: str) -> ModelRouter:
+    """Process-wide router for a default model, so load and stats are shared across sessions"""
+    with _routers_lock:
+        router = _routers.get(default_model)
+        if router is None:
+            router = _routers[default_model] = ModelRouter(default_model)
+        return router
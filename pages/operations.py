@@ -0,0 +1,50 @@
+import streamlit as st
+
+from analytics import get_aggregates
+
+
+st.set_page_config(page_title="Operations", page_icon="", layout="wide")
+st.title("Operations")
+
+aggregates = get_aggregates()
+
+
+@st.fragment(run_every=60)
+def urgent_tickets():
+    """Ages move with the clock, so this section refreshes itself"""
+    st.subheader("Open P1/P2 tickets")
+    ages = aggregates.urgent_ticket_ages()
+    if ages.empty:
+        st.info("No open P1/P2 tickets")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Open P1", int((ages["priority"] == "P1").sum()))
+    col2.metric("Open P2", int((ages["priority"] == "P2").sum()))
+    col3.metric("Past response target", int(ages["breached"].sum()))
+    st.dataframe(ages, hide_index=True, width="stretch")
+
+
+urgent_tickets()
+
+st.subheader("Tickets by priority and status")
+tickets = aggregates.ticket_matrix()
+if tickets.empty:
+    st.info("No tickets created yet")
+else:
+    st.dataframe(tickets, width="stretch")
+
+st.subheader("Bookings against daily capacity")
+days = st.slider("Days ahead", 7, 60, 14)
+bookings = aggregates.bookings_vs_capacity(days=days)
+st.bar_chart(bookings.set_index("date")[["bookings", "capacity"]], stack=False)
+over = bookings[bookings["over_capacity"]]
+if not over.empty:
+    st.warning(f"Over capacity on {', '.join(over['date'])}")
+
+st.subheader("Escalations by reason and urgency")
+escalations = aggregates.escalation_matrix()
+if escalations.empty:
+    st.info("No escalations yet")
+else:
+    st.dataframe(escalations, width="stretch")
@@ -0,0 +1,396 @@
+import json
+import os
+from contextlib import closing, nullcontext
+from functools import lru_cache
+from memory import ConversationManager, EscalationDetector, FollowUpTracker
+from escalation_rules import EscalationRuleEngine
+from tool_registry import get_registry
+import langchain_tools
+import customer_index
+from model_router import get_router
+from llm_scheduler import call_priority, get_scheduler
+from tool_selection import select_tools
+from token_accounting import UsageLedger, estimate_request_tokens
+from domain_guard import get_guard
+import tracing
+from tracing import traced
+
+
+FRUSTRATED_WORDS = [
+    "angry", "frustrated", "terrible", "worst", "useless",
+    "ridiculous", "annoyed", "fed up", "disappointed"
+]
+
+ANXIOUS_WORDS = [
+    "worried", "anxious", "scared", "afraid", "nervous",
+    "concerned", "not sure", "uncertain", "don't know"
+]
+
+URGENT_WORDS = [
+    "urgent", "emergency", "asap", "immediately", "now",
+    "right now", "help", "serious", "critical", "danger"
+]
+
+
+@traced("load_prompt")
+def load_prompt(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=8)
+def _cached_prompt(path: str, mtime: float) -> str:
+    return load_prompt(path)
+
+
+def get_prompt(path: str) -> str:
+    """Load a prompt once per process (re-read only if the file changes)"""
+    return _cached_prompt(path, os.path.getmtime(path))
+
+
+@traced("extract_facts")
+def extract_facts(client, model, user_message):
+    FACT_EXTRACTION_PROMPT = get_prompt(os.getenv("FACT_PROMPT_PATH"))
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": FACT_EXTRACTION_PROMPT},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0
+        )
+
+        content = response.choices[0].message.content.strip()
+        return json.loads(content)
+    except Exception as e:
+        return {}
+
+
+@traced("detect_sentiment")
+def detect_sentiment(message: str) -> dict:
+    text = message.lower()
+
+    is_frustrated = any(w in text for w in FRUSTRATED_WORDS)
+    is_anxious = any(w in text for w in ANXIOUS_WORDS)
+    is_urgent = any(w in text for w in URGENT_WORDS)
+
+    if is_urgent:
+        tone = "urgent"
+    elif is_frustrated:
+        tone = "frustrated"
+    elif is_anxious:
+        tone = "anxious"
+    else:
+        tone = "calm"
+
+    return {
+        "tone": tone,
+        "is_frustrated": is_frustrated,
+        "is_anxious": is_anxious,
+        "is_urgent": is_urgent
+    }
+
+
+def get_sentiment_instruction(sentiment: dict) -> str:
+    if sentiment["tone"] == "frustrated":
+        return """TONE ADJUSTMENT: User is frustrated.
+- Acknowledge their frustration explicitly
+- Be extra patient and empathetic
+- Keep sentences short and reassuring
+- Consider offering human help if frustration continues
+- Focus on immediate helpful actions"""
+
+    if sentiment["tone"] == "anxious":
+        return """TONE ADJUSTMENT: User is anxious/worried.
+- Provide calm reassurance without false promises
+- Explain steps slowly and clearly
+- Emphasize what they can control
+- Highlight safety measures"""
+
+    if sentiment["tone"] == "urgent":
+        return """TONE ADJUSTMENT: User indicates urgency.
+- Prioritize immediate safety advice FIRST
+- Be direct and concise
+- Create tickets for urgent issues
+- Avoid unnecessary questions unless critical
+- Provide clear action steps"""
+
+    return """TONE ADJUSTMENT: User appears calm.
+- Proceed with normal professional guidance
+- Maintain friendly, helpful demeanor"""
+
+
+def fact_context_delta() -> bool:
+    """FACT_CONTEXT=delta: after the first turn, inject only new or changed facts (default "full")"""
+    return os.getenv("FACT_CONTEXT", "full") == "delta"
+
+
+def build_context_with_facts(conversation: ConversationManager, sentiment_guidance: str = None,
+                             profile_summary: str = None, cases_summary: str = None):
+    """Build message context with facts, customer profile, similar cases and sentiment injected appropriately"""
+    messages = conversation.get_context().copy()
+
+    if cases_summary:
+        messages.insert(1, {
+            "role": "system",
+            "content": cases_summary
+        })
+
+    if profile_summary:
+        messages.insert(1, {
+            "role": "system",
+            "content": profile_summary
+        })
+
+    facts_summary = conversation.get_facts_context(fact_context_delta())
+    if facts_summary:
+        messages.insert(1, {
+            "role": "system",
+            "content": facts_summary
+        })
+
+    if sentiment_guidance:
+        messages.insert(1, {
+            "role": "system",
+            "content": sentiment_guidance
+        })
+
+    return messages
+
+
+def has_critical_safety_ticket() -> bool:
+    with closing(langchain_tools.iter_tickets(severity=["high", "critical"])) as tickets:
+        return next(tickets, None) is not None
+
+
+class Session:
+    """Per-conversation state carried between turns"""
+
+    def __init__(self, system_prompt: str, session_id: str = None):
+        self.session_id = session_id or tracing.new_trace_id()
+        self.conversation = ConversationManager(system_prompt)
+        self.escalation_detector = EscalationDetector()
+        self.escalation_engine = EscalationRuleEngine()
+        self.escalation_engine.set_critical_safety(has_critical_safety_ticket())
+        self.followup_tracker = FollowUpTracker()
+        self.last_sentiment = {"tone": "calm"}
+        # a critical / immediate-action ticket was raised in this conversation
+        self.open_critical = False
+        # tool intents carried between turns (see tool_selection.py)
+        self.tool_intents = {}
+        # model tokens and latency per call (see token_accounting.py)
+        self.usage = UsageLedger()
+
+
+class TurnHooks:
+    """UI callbacks for run_turn; the defaults do nothing (headless)"""
+
+    def stage(self, name: str):
+        """Context manager around a slow stage: "facts", "thinking" or "processing" """
+        return nullcontext()
+
+    def tool(self, name: str):
+        """Context manager around one tool call"""
+        return nullcontext()
+
+    def tool_result(self, result):
+        pass
+
+    def assistant_text(self, text: str):
+        pass
+
+    def answered(self, questions: list):
+        pass
+
+
+class TurnResult:
+
+    def __init__(self, turn_id: str):
+        self.turn_id = turn_id
+        self.sentiment = None
+        self.facts = {}
+        self.profile_summary = ""
+        self.answered_questions = []
+        self.tool_results = []
+        self.tool_selection = None
+        self.similar_cases = []
+        self.usage = None
+        # answered by the domain guard without calling the model
+        self.blocked = False
+        self.text = ""
+        self.should_escalate = False
+        self.escalation_reasons = []
+        self.escalation_severity = "low"
+
+
+def run_turn(session: Session, prompt: str, client, model: str,
+             tool_capable_models=(), hooks: TurnHooks = None, registry=None, tools=None,
+             router=None, scheduler=None, guard=None) -> TurnResult:
+    """
+    Run one user message through the domain guard, sentiment, fact
+    extraction, the model, tool execution and escalation, updating the
+    session in place. Off-topic messages get the guard's canned reply
+    without any model call (see domain_guard.py).
+
+    Each model call is routed per task (see model_router.py); model is the
+    default for any task without its own model. Calls are queued by priority
+    on the shared LLM scheduler (see llm_scheduler.py) and recorded in the
+    session's usage ledger, which also enforces its token budgets (see
+    token_accounting.py).
+    """
+    hooks = hooks or TurnHooks()
+    router = router or get_router(model)
+    scheduler = scheduler or get_scheduler()
+    guard = guard or get_guard()
+    registry = registry or get_registry()
+    conversation = session.conversation
+    engine = session.escalation_engine
+    usage = session.usage
+    result = TurnResult(tracing.current_turn_id())
+
+    conversation.add("user", prompt)
+    engine.on_user_turn(prompt)
+    turn_id = result.turn_id or f"turn-{conversation.get_turn_count()}"
+
+    sentiment = detect_sentiment(prompt)
+    session.last_sentiment = sentiment
+    engine.on_sentiment(sentiment)
+    tone_guidance = get_sentiment_instruction(sentiment)
+    result.sentiment = sentiment
+
+    with tracing.span("domain_guard") as attrs:
+        decision = guard.check(prompt, in_conversation=bool(session.tool_intents))
+        attrs.update(off_topic=round(decision.off_topic, 3), blocked=not decision.allowed)
+    if not decision.allowed:
+        result.blocked = True
+        result.text = guard.reply
+        conversation.add("assistant", guard.reply)
+        hooks.assistant_text(guard.reply)
+        session.followup_tracker.add_ai_response(guard.reply)
+        result.usage = usage.turn_usage(turn_id)
+        result.should_escalate, result.escalation_reasons, result.escalation_severity = engine.evaluate()
+        return result
+
+    with hooks.stage("facts"), router.call("extraction") as extraction_model:
+        priority = call_priority("extraction", sentiment, session.open_critical)
+        extracted_facts = extract_facts(usage.bind(scheduler.bind(client, priority), "extraction", turn_id),
+                                        extraction_model, prompt)
+        for key, value in extracted_facts.items():
+            conversation.set_fact(key, value)
+    result.facts = extracted_facts
+
+    result.answered_questions = session.followup_tracker.check_if_answered(prompt)
+    if result.answered_questions:
+        hooks.answered(result.answered_questions)
+
+    with tracing.span("customer_profile"):
+        profile_summary = customer_index.profile_summary_for_facts(conversation.get_all_facts())
+    result.profile_summary = profile_summary
+
+    with tracing.span("tool_selection") as attrs:
+        selection = select_tools(tools or langchain_tools.langchain_tools_schema, prompt, sentiment,
+                                 conversation.get_all_facts(), session.tool_intents)
+        attrs.update(intents=selection.intents, tools=selection.names,
+                     tokens_sent=selection.tokens_sent, tokens_saved=selection.tokens_saved)
+    result.tool_selection = selection
+
+    # past resolved cases, while the conversation is about a problem in the home
+    cases_summary = ""
+    if {"issue", "safety"} & set(selection.intents):
+        import similar_cases  # loads NumPy, so it stays out of the imports before first paint
+        if similar_cases.similar_cases_enabled():
+            with tracing.span("similar_cases") as attrs:
+                result.similar_cases = similar_cases.similar_cases_for_turn(prompt, conversation.get_all_facts())
+                attrs.update(cases=[record.get("issue_id") or record.get("ticket_id")
+                                    for _, _, record in result.similar_cases])
+            cases_summary = similar_cases.summarize_cases(result.similar_cases)
+
+    messages = build_context_with_facts(conversation, tone_guidance, profile_summary, cases_summary)
+
+    request_tokens = estimate_request_tokens(messages) + selection.tokens_sent
+    if usage.needs_compaction(request_tokens):
+        with tracing.span("context.compact", tokens_before=request_tokens) as attrs:
+            removed = conversation.compact(max(1, usage.keep_turns))
+            messages = build_context_with_facts(conversation, tone_guidance, profile_summary, cases_summary)
+            attrs.update(messages_removed=removed,
+                         tokens_after=estimate_request_tokens(messages) + selection.tokens_sent)
+        usage.compactions += bool(removed)
+
+    # a turn that offers tools must not lose them by falling back to a model that can't call them
+    chat_fallbacks = tool_capable_models if selection.tools else None
+    with hooks.stage("thinking"), router.call("chat", chat_fallbacks) as chat_model, \
+            tracing.span("llm.chat", model=chat_model):
+        request_args = {
+            "model": chat_model,
+            "messages": messages,
+        }
+
+        if chat_model in tool_capable_models and selection.tools:
+            request_args["tools"] = selection.tools
+            request_args["tool_choice"] = "auto"
+
+        priority = call_priority("chat", sentiment, session.open_critical)
+        chat_client = usage.bind(scheduler.bind(client, priority), "chat", turn_id)
+        response = chat_client.chat.completions.create(**request_args)
+
+    msg = response.choices[0].message
+    tool_calls = getattr(msg, "tool_calls", None)
+
+    if tool_calls:
+        if msg.content:
+            conversation.add("assistant", msg.content)
+            hooks.assistant_text(msg.content)
+
+        for tc in tool_calls:
+            fn_name = tc.function.name
+
+            with hooks.tool(fn_name):
+                tool_result = registry.invoke(fn_name, tc.function.arguments)
+                hooks.tool_result(tool_result)
+            result.tool_results.append(tool_result)
+
+            if fn_name == "create_maintenance_ticket" and tool_result.ok and tool_result.data.get("severity") in ["high", "critical"]:
+                engine.set_critical_safety(True)
+                if tool_result.data["severity"] == "critical" or tool_result.arguments.get("requires_immediate_action"):
+                    session.open_critical = True
+
+            conversation.add_tool(
+                tool_call_id=tc.id,
+                name=fn_name,
+                content=tool_result.content
+            )
+            engine.on_tool_call()
+
+        messages = build_context_with_facts(conversation, tone_guidance, profile_summary, cases_summary)
+
+        with hooks.stage("processing"), router.call("post_tool") as post_tool_model, \
+                tracing.span("llm.post_tool", model=post_tool_model):
+            priority = call_priority("post_tool", sentiment, session.open_critical)
+            post_tool_client = usage.bind(scheduler.bind(client, priority), "post_tool", turn_id)
+            final_response = post_tool_client.chat.completions.create(
+                model=post_tool_model,
+                messages=messages,
+            )
+
+        final_text = final_response.choices[0].message.content
+        conversation.add("assistant", final_text)
+
+        if msg.content:
+            hooks.assistant_text(msg.content + "\n\n" + final_text)
+        else:
+            hooks.assistant_text(final_text)
+
+    else:
+        final_text = msg.content
+        conversation.add("assistant", final_text)
+        hooks.assistant_text(final_text)
+
+    session.followup_tracker.add_ai_response(final_text or "")
+    conversation.mark_facts_shown()
+    result.text = final_text
+
+    result.usage = usage.turn_usage(turn_id)
+    engine.on_token_usage(usage.total_tokens, usage.over_budget())
+    result.should_escalate, result.escalation_reasons, result.escalation_severity = engine.evaluate()
+    return result
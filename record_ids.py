@@ -0,0 +1,134 @@
+"""
+Time-ordered, collision-free record IDs.
+
+IDs look like BOOK-01JAD3W5Q8M2ZK7T4XH9B6N0CR: a type prefix and 26
+Crockford base32 characters encoding 128 bits:
+
+    48 bits  unix time in milliseconds
+    40 bits  node id, random per process (re-drawn after fork)
+    40 bits  per-process counter, reset each millisecond
+
+IDs from one process are strictly increasing, IDs from different processes
+differ in the node bits, and the string form sorts in creation order, so it
+can be used directly as a primary key for time-range scans.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(CROCKFORD)}
+
+ENCODED_LENGTH = 26
+TIME_BITS = 48
+NODE_BITS = 40
+COUNTER_BITS = 40
+_RANDOM_BITS = NODE_BITS + COUNTER_BITS
+_COUNTER_MAX = (1 << COUNTER_BITS) - 1
+
+_LEGACY_FORMAT = "%Y%m%d%H%M%S"
+
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(ENCODED_LENGTH):
+        chars.append(CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def decode(encoded: str) -> int:
+    value = 0
+    for c in encoded.upper():
+        value = (value << 5) | _DECODE[c]
+    return value
+
+
+class IdGenerator:
+    """Monotonic ULID-style generator, safe across threads and forked processes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._node = 0
+        self._last_ms = 0
+        self._counter = 0
+
+    def _reseed(self):
+        self._pid = os.getpid()
+        self._node = int.from_bytes(os.urandom(5), "big")
+        self._last_ms = 0
+        self._counter = 0
+
+    def next_value(self) -> int:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reseed()
+
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._counter = 0
+            else:
+                # Same millisecond (or the clock went backwards): keep counting
+                self._counter += 1
+                if self._counter > _COUNTER_MAX:
+                    self._last_ms += 1
+                    self._counter = 0
+
+            return (self._last_ms << _RANDOM_BITS) | (self._node << COUNTER_BITS) | self._counter
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}-{encode(self.next_value())}"
+
+
+_generator = IdGenerator()
+
+
+def new_id(prefix: str) -> str:
+    """Generate a unique, time-sortable ID with prefix"""
+    return _generator.new_id(prefix)
+
+
+def _split(record_id: str):
+    prefix, _, body = record_id.partition("-")
+    return prefix, body
+
+
+def id_sort_key(record_id: str) -> int:
+    """
+    Integer key that orders IDs by creation time.
+
+    Also accepts legacy PREFIX-YYYYmmddHHMMSS-NNNN IDs so old and new records
+    can share one ordering.
+    """
+    _, body = _split(record_id)
+    if len(body) == ENCODED_LENGTH and "-" not in body:
+        return decode(body)
+
+    stamp, _, suffix = body.partition("-")
+    ms = int(datetime.strptime(stamp, _LEGACY_FORMAT).timestamp() * 1000)
+    return (ms << _RANDOM_BITS) | (int(suffix) if suffix.isdigit() else 0)
+
+
+def id_timestamp(record_id: str) -> datetime:
+    """Creation time encoded in an ID"""
+    return datetime.fromtimestamp((id_sort_key(record_id) >> _RANDOM_BITS) / 1000)
+
+
+def time_bound_key(when: Optional[datetime], upper: bool = False) -> Optional[int]:
+    """Smallest (or largest, with upper=True) ID key for the given millisecond"""
+    if when is None:
+        return None
+    ms = int(when.timestamp() * 1000)
+    if upper:
+        return (ms << _RANDOM_BITS) | ((1 << _RANDOM_BITS) - 1)
+    return ms << _RANDOM_BITS
+
+
+def time_bound_id(prefix: str, when: datetime, upper: bool = False) -> str:
+    """ID string bounding a time range, for range scans over sorted IDs"""
+    return f"{prefix}-{encode(time_bound_key(when, upper))}"
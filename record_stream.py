@@ -0,0 +1,335 @@
+"""
+Streaming reads of the JSON record files.
+
+A data file is memory-mapped and scanned once per version for the byte range
+of each top-level record; the offsets are kept (16 bytes per record) until the
+file changes. Records are then decoded as they are iterated, up to
+BATCH_RECORDS consecutive records per json.loads call, so a reader holds at
+most one batch in memory rather than the whole list, and can stop early
+without paying for the rest of the file.
+
+Filters are applied before decoding where possible:
+    since / until / after_id   records are ID-ordered (record_ids.py), so a time or ID range
+                               is found by binary search, decoding only the probed records
+    where                      field == value (or any of a list of values); in files written by
+                               save_json one regex pass over the mapped file finds the records
+                               containing the encoded "field": value bytes, and only those are
+                               decoded (and checked exactly). A None value also matches records
+                               without the field, so fields filtered on None aren't pushed down
+    predicate                  any callable, run on the decoded records that pass the rest
+
+Saves replace the file, so a scan reads one consistent version even if the
+file is rewritten while it runs. The file stays mapped while a scan is
+suspended, and on Windows an open map stops the file being replaced, so a
+reader that stops early closes the scan (contextlib.closing) rather than
+leaving it to garbage collection.
+
+An in-memory index over a file can follow writes from other processes with
+changes(): it keeps a Checkpoint (a CRC32 of the bytes it has read and of each
+record in them), and when the file version moves it decodes only the records
+appended or changed since then. If the bytes it read are unchanged (the usual
+case: another worker appended), only the new records are checksummed;
+otherwise every record is, to find the changed ones. Only a file that lost
+records has to be read again in full.
+"""
+import bisect
+import json
+import mmap
+import os
+import re
+import threading
+import zlib
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from record_ids import id_sort_key, time_bound_key
+
+
+# Top-level record boundaries in a file written by save_json (json.dump, indent=2):
+# strings never contain a raw newline and nested objects are indented further
+_FORMATTED_BOUNDARY = re.compile(rb"\n  [{}]")
+
+# Strings and brackets, for files in any other layout
+_ARRAY_START = re.compile(rb"\s*\[")
+_TOKENS = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+# Consecutive records decoded with one json.loads call
+BATCH_RECORDS = 512
+
+
+class RecordOffsets:
+    """Byte range of each record in one version of a data file"""
+
+    def __init__(self, version: tuple, starts: array, ends: array, formatted: bool):
+        self.version = version
+        self.starts = starts
+        self.ends = ends
+        # written by save_json, so field bytes are in a known layout
+        self.formatted = formatted
+        # CRC32 of each record, computed on first use by changes()
+        self.crcs: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def _scan_formatted(mm: mmap.mmap, version: tuple, starts: array, ends: array, pos: int) -> Optional[RecordOffsets]:
+    for match in _FORMATTED_BOUNDARY.finditer(mm, pos):
+        if match.group()[-1:] == b"{":
+            starts.append(match.end() - 1)
+        else:
+            ends.append(match.end())
+    return RecordOffsets(version, starts, ends, True) if len(starts) == len(ends) else None
+
+
+def _scan_tokens(mm: mmap.mmap, version: tuple, starts: array, ends: array, pos: int) -> RecordOffsets:
+    depth = 1 if pos else 0
+    for match in _TOKENS.finditer(mm, pos):
+        token = match.group()
+        if token in (b"{", b"["):
+            if depth == 1:
+                starts.append(match.start())
+            depth += 1
+        elif token in (b"}", b"]"):
+            depth -= 1
+            if depth == 1:
+                ends.append(match.end())
+    if len(starts) != len(ends):
+        raise ValueError("Unbalanced JSON array")
+    return RecordOffsets(version, starts, ends, False)
+
+
+def _scan_offsets(mm: mmap.mmap, version: tuple, base: Optional[RecordOffsets] = None) -> RecordOffsets:
+    """
+    Record offsets of this version of a file. base is the offsets of an earlier
+    version whose bytes up to its last record are unchanged; only the rest is scanned.
+    """
+    if base is not None and len(base):
+        starts, ends, pos = array("q", base.starts), array("q", base.ends), base.ends[-1]
+        if not base.formatted:
+            return _scan_tokens(mm, version, starts, ends, pos)
+        offsets = _scan_formatted(mm, version, starts, ends, pos)
+        if offsets is not None:
+            return offsets
+
+    if mm[:5] == b"[\n  {":
+        offsets = _scan_formatted(mm, version, array("q"), array("q"), 0)
+        if offsets is not None:
+            return offsets
+    if not _ARRAY_START.match(mm):
+        raise ValueError("expected an array")
+    return _scan_tokens(mm, version, array("q"), array("q"), 0)
+
+
+_offsets: Dict[str, RecordOffsets] = {}
+_offsets_lock = threading.Lock()
+
+
+def offsets_for(filepath: str, mm: mmap.mmap, version: tuple, base: Optional[RecordOffsets] = None) -> RecordOffsets:
+    """Record offsets for this version of the file, scanned on first use"""
+    with _offsets_lock:
+        offsets = _offsets.get(filepath)
+    if offsets is None or offsets.version != version:
+        try:
+            offsets = _scan_offsets(mm, version, base)
+        except ValueError as e:
+            raise ValueError(f"{os.path.basename(filepath)} is not a JSON array: {e}") from None
+        with _offsets_lock:
+            _offsets[filepath] = offsets
+    return offsets
+
+
+@contextmanager
+def _open(filepath: str):
+    """(mmap, version) for the file as it is now; mmap is None if it is missing or empty"""
+    try:
+        f = open(filepath, "rb")
+    except FileNotFoundError:
+        yield None, (0, 0, 0)
+        return
+    with f:
+        stat = os.fstat(f.fileno())
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if not stat.st_size:
+            yield None, version
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm, version
+
+
+@contextmanager
+def mapped(filepath: str):
+    """(mmap, offsets) for the file as it is now, or (None, None) if it is missing or empty"""
+    with _open(filepath) as (mm, version):
+        yield mm, (offsets_for(filepath, mm, version) if mm is not None else None)
+
+
+def _accepted(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def _needles(where: Dict) -> List[List[bytes]]:
+    """Encoded "field": value bytes per field, as save_json writes them"""
+    return [[f"{json.dumps(field)}: {json.dumps(value)}".encode("ascii") for value in _accepted(values)]
+            for field, values in where.items()]
+
+
+def matches(record: Dict, where: Optional[Dict]) -> bool:
+    return not where or all(record.get(field) in _accepted(values) for field, values in where.items())
+
+
+def _key_range(count: int, key_at: Callable[[int], int], since: Optional[datetime], until: Optional[datetime],
+               after_id: Optional[str]) -> range:
+    lo, hi = 0, count
+    lower = [key for key in (time_bound_key(since), id_sort_key(after_id) + 1 if after_id else None) if key is not None]
+    if lower:
+        lo = bisect.bisect_left(range(count), max(lower), key=key_at)
+    if until is not None:
+        hi = bisect.bisect_right(range(count), time_bound_key(until, upper=True), lo=lo, key=key_at)
+    return range(lo, hi)
+
+
+def _candidates(mm: mmap.mmap, offsets: RecordOffsets, rows: range, where: Dict) -> List[int]:
+    """Rows whose bytes contain every where field's encoded value, found with one regex pass per field"""
+    # a record that omits the field matches None but has no bytes to find
+    where = {field: values for field, values in where.items() if None not in _accepted(values)}
+    if not where:
+        return list(rows)
+    selected = None
+    for alternatives in _needles(where):
+        pattern = re.compile(b"|".join(re.escape(needle) for needle in alternatives))
+        found = {bisect.bisect_right(offsets.starts, match.start()) - 1
+                 for match in pattern.finditer(mm, offsets.starts[rows.start], offsets.ends[rows.stop - 1])}
+        selected = found if selected is None else selected & found
+    return sorted(selected)
+
+
+def _decode(mm: mmap.mmap, offsets: RecordOffsets, rows) -> Iterator[Dict]:
+    """
+    Records at rows, decoding each run of consecutive rows in one call. Runs
+    start at 16 records and double up to BATCH_RECORDS, so a reader that
+    stops after the first few records doesn't decode a whole batch.
+    """
+    starts, ends = offsets.starts, offsets.ends
+    batch = 16
+    rows = iter(rows)
+    run_start = run_end = next(rows, None)
+    while run_start is not None:
+        row = next(rows, None)
+        if row == run_end + 1 and row - run_start < batch:
+            run_end = row
+            continue
+        # the bytes between two records are only a separator, so a run is a valid array body
+        yield from json.loads(b"[" + mm[starts[run_start]:ends[run_end]] + b"]")
+        batch = min(2 * batch, BATCH_RECORDS)
+        run_start = run_end = row
+
+
+def scan(filepath: str, id_field: Optional[str] = None, since: Optional[datetime] = None,
+         until: Optional[datetime] = None, after_id: Optional[str] = None, where: Optional[Dict] = None,
+         predicate: Optional[Callable[[Dict], bool]] = None) -> Iterator[Dict]:
+    """
+    Records of a data file, decoded a batch at a time in file (ID) order.
+    since / until (created in [since, until]) and after_id need id_field.
+    """
+    with mapped(filepath) as (mm, offsets):
+        if mm is None:
+            return
+        if id_field and (since or until or after_id):
+            starts, ends = offsets.starts, offsets.ends
+            rows = _key_range(len(offsets), lambda i: id_sort_key(json.loads(mm[starts[i]:ends[i]])[id_field]),
+                              since, until, after_id)
+        else:
+            rows = range(len(offsets))
+        if not rows:
+            return
+        if where and offsets.formatted:
+            rows = _candidates(mm, offsets, rows, where)
+
+        for record in _decode(mm, offsets, rows):
+            if where and not matches(record, where):
+                continue
+            if predicate and not predicate(record):
+                continue
+            yield record
+
+
+def select(records: List[Dict], id_field: Optional[str] = None, since: Optional[datetime] = None,
+           until: Optional[datetime] = None, after_id: Optional[str] = None, where: Optional[Dict] = None,
+           predicate: Optional[Callable[[Dict], bool]] = None) -> Iterator[Dict]:
+    """The same filters over records already in memory (e.g. the write-behind view)"""
+    if id_field and (since or until or after_id):
+        rows = _key_range(len(records), lambda i: id_sort_key(records[i][id_field]), since, until, after_id)
+    else:
+        rows = range(len(records))
+    for i in rows:
+        record = records[i]
+        if matches(record, where) and (predicate is None or predicate(record)):
+            yield record
+
+
+class Checkpoint(NamedTuple):
+    """How far an index has read a data file"""
+    version: tuple
+    end: int  # byte offset just past the last record read
+    crc: int  # CRC32 of the bytes before end
+    rows: array  # CRC32 of each record read, by row
+    offsets: Optional[RecordOffsets]
+
+
+def _crc(mm: mmap.mmap, start: int, end: int, value: int = 0) -> int:
+    with memoryview(mm) as view:
+        return zlib.crc32(view[start:end], value)
+
+
+def _row_crcs(mm: mmap.mmap, offsets: RecordOffsets, start: int = 0) -> array:
+    with memoryview(mm) as view:
+        return array("I", map(lambda s, e: zlib.crc32(view[s:e]), offsets.starts[start:], offsets.ends[start:]))
+
+
+@contextmanager
+def changes(filepath: str, checkpoint: Optional[Checkpoint] = None):
+    """
+    (records, checkpoint, rebuild) for the file as it is now. records are the
+    ones appended or changed in place since checkpoint, in file order; an
+    out-of-order insert shifts the rows after it, so those come back as
+    changed too, and a reader must treat them as upserts by ID. With no
+    checkpoint, or if the file lost records, rebuild is True and records is
+    the whole file. The new checkpoint is valid once records are consumed.
+    """
+    with _open(filepath) as (mm, version):
+        if mm is None:
+            yield iter(()), Checkpoint(version, 0, 0, array("I"), None), \
+                checkpoint is None or len(checkpoint.rows) > 0
+            return
+
+        count = len(checkpoint.rows) if checkpoint is not None else 0
+        # nothing before the checkpoint changed: only appended records are new
+        unchanged = checkpoint is not None and checkpoint.end <= len(mm) and \
+            _crc(mm, 0, checkpoint.end) == checkpoint.crc
+        offsets = offsets_for(filepath, mm, version, checkpoint.offsets if unchanged else None)
+        end = offsets.ends[-1] if len(offsets) else 0
+        rebuild = checkpoint is None or count > len(offsets)
+        if unchanged and not rebuild:
+            rows = range(count, len(offsets))
+            crcs = checkpoint.rows + _row_crcs(mm, offsets, count)
+            crc = _crc(mm, checkpoint.end, end, checkpoint.crc)
+        else:
+            if offsets.crcs is None:
+                offsets.crcs = _row_crcs(mm, offsets)
+            crcs = offsets.crcs
+            if rebuild:
+                rows = range(len(offsets))
+            else:
+                old = checkpoint.rows
+                rows = [i for i in range(count) if crcs[i] != old[i]] + list(range(count, len(offsets)))
+            crc = _crc(mm, 0, end)
+        yield _decode(mm, offsets, rows), Checkpoint(offsets.version, end, crc, crcs, offsets), rebuild
+
+
+def count(filepath: str) -> int:
+    """Records in a data file, without decoding any"""
+    with mapped(filepath) as (mm, offsets):
+        return len(offsets) if offsets is not None else 0
@@ -0,0 +1,455 @@
+"""
+Offline transcript replay engine.
+
+Re-scores historical conversations with the same sentiment, fact, follow-up
+and escalation logic the Streamlit app uses, so thresholds and keyword lists
+can be tuned against real traffic without a UI.
+
+Transcripts are read from .jsonl files (one conversation per line) or .json
+files (one conversation per file). A conversation looks like:
+
+    {"conversation_id": "abc", "messages": [
+        {"role": "user", "content": "...", "facts": {...}},
+        {"role": "assistant", "content": "..."},
+        {"role": "tool", "name": "create_maintenance_ticket", "content": "{...}"}
+    ]}
+
+"facts" on user messages is optional and is used by the "cached" fact mode.
+
+Usage:
+    python replay.py transcripts/ -o decisions.parquet --workers 8
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pipeline
+import tracing
+from escalation_rules import EscalationRuleEngine, get_rule_set
+from memory import ConversationManager, EscalationDetector, FollowUpTracker
+
+
+FACT_MODES = ("none", "cached", "local")
+
+DECISION_COLUMNS = [
+    "conversation_id", "source", "turn", "tone", "is_frustrated", "is_anxious",
+    "is_urgent", "facts", "fact_count", "answered_questions", "pending_questions",
+    "tool_calls", "critical_safety", "should_escalate", "severity", "reasons"
+]
+
+# Worker-local state, set by _init_worker
+_config: Dict = {}
+_fact_cache: Dict[str, dict] = {}
+_client = None
+
+
+def iter_transcripts(paths: Iterable[str]) -> Iterator[dict]:
+    """Stream conversations from files or directories without loading them all"""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.endswith((".json", ".jsonl")))
+            yield from iter_transcripts(os.path.join(path, n) for n in names)
+            continue
+
+        source = os.path.basename(path)
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    transcript = json.loads(line)
+                    transcript.setdefault("conversation_id", f"{source}:{line_no}")
+                    transcript["_source"] = source
+                    yield transcript
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = json.load(f)
+            transcript.setdefault("conversation_id", source)
+            transcript["_source"] = source
+            yield transcript
+
+
+def fact_cache_key(message: str, prompt_digest: str) -> str:
+    return hashlib.sha1(f"{prompt_digest}\n{message}".encode("utf-8")).hexdigest()
+
+
+def load_fact_cache(path: Optional[str]) -> Dict[str, dict]:
+    cache = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    cache[entry["key"]] = entry["facts"]
+    return cache
+
+
+def _prompt_digest(prompt_path: Optional[str]) -> str:
+    if not prompt_path or not os.path.exists(prompt_path):
+        return ""
+    with open(prompt_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _init_worker(config: dict, fact_cache: Dict[str, dict]):
+    global _config, _fact_cache, _client
+    _config = config
+    _fact_cache = fact_cache
+    tracing.tracer.enabled = False
+
+    keywords = config.get("sentiment_keywords") or {}
+    if "frustrated" in keywords:
+        pipeline.FRUSTRATED_WORDS = list(keywords["frustrated"])
+    if "anxious" in keywords:
+        pipeline.ANXIOUS_WORDS = list(keywords["anxious"])
+    if "urgent" in keywords:
+        pipeline.URGENT_WORDS = list(keywords["urgent"])
+
+    if config.get("fact_prompt_path"):
+        os.environ["FACT_PROMPT_PATH"] = config["fact_prompt_path"]
+
+    if config["fact_mode"] == "local":
+        from openai import OpenAI
+        _client = OpenAI(
+            base_url=os.getenv("OLLAMA_BASE_URL"),
+            api_key=os.getenv("OLLAMA_API_KEY")
+        )
+
+
+def _make_detector() -> EscalationDetector:
+    detector = EscalationDetector()
+    for name, value in (_config.get("thresholds") or {}).items():
+        setattr(detector, name, value)
+    return detector
+
+
+def _facts_for(message: dict, new_cache: Dict[str, dict]) -> dict:
+    mode = _config["fact_mode"]
+    if mode == "none":
+        return {}
+    if isinstance(message.get("facts"), dict):
+        return message["facts"]
+
+    key = fact_cache_key(message["content"], _config["prompt_digest"])
+    if key in _fact_cache:
+        return _fact_cache[key]
+    if key in new_cache:
+        return new_cache[key]
+    if mode != "local":
+        return {}
+
+    facts = pipeline.extract_facts(_client, _config["model"], message["content"])
+    new_cache[key] = facts
+    return facts
+
+
+def _is_critical_ticket(message: dict) -> bool:
+    if message.get("name") != "create_maintenance_ticket":
+        return False
+    try:
+        result = json.loads(message.get("content") or "{}")
+    except json.JSONDecodeError:
+        return False
+    return result.get("status") == "success" and result.get("severity") in ["high", "critical"]
+
+
+def _split_turns(messages: List[dict]):
+    """Group messages into (system_prompt, [(user_message, [replies])])"""
+    system_prompt = ""
+    turns = []
+    for msg in messages:
+        role = msg.get("role")
+        if role == "system" and not turns:
+            system_prompt = msg.get("content", "")
+        elif role == "user":
+            turns.append((msg, []))
+        elif turns:
+            turns[-1][1].append(msg)
+    return system_prompt, turns
+
+
+def replay_transcript(transcript: dict):
+    """
+    Run the per-turn decision logic over one conversation.
+
+    Returns:
+        tuple: (rows: list of decision dicts, new_fact_cache_entries: dict)
+    """
+    system_prompt, turns = _split_turns(transcript.get("messages", []))
+    conversation = ConversationManager(system_prompt)
+    detector = _make_detector()
+    engine = EscalationRuleEngine(get_rule_set(_config["rules_path"])) if _config.get("rules_path") else None
+    tracker = FollowUpTracker()
+    critical_safety = False
+    new_cache = {}
+    rows = []
+
+    for user_msg, replies in turns:
+        content = user_msg.get("content") or ""
+        conversation.add("user", content)
+
+        sentiment = pipeline.detect_sentiment(content)
+        facts = _facts_for(user_msg, new_cache)
+        for key, value in facts.items():
+            if isinstance(value, str):
+                conversation.set_fact(key, value)
+        answered = tracker.check_if_answered(content)
+        if engine:
+            engine.on_user_turn(content)
+            engine.on_sentiment(sentiment)
+
+        tool_calls = 0
+        for reply in replies:
+            if reply.get("role") == "assistant" and reply.get("content"):
+                conversation.add("assistant", reply["content"])
+                tracker.add_ai_response(reply["content"])
+            elif reply.get("role") == "tool":
+                conversation.add_tool(reply.get("tool_call_id", ""), reply.get("name", ""), reply.get("content", ""))
+                tool_calls += 1
+                critical_safety = critical_safety or _is_critical_ticket(reply)
+
+        if engine:
+            engine.on_tool_call(tool_calls)
+            engine.set_critical_safety(critical_safety)
+            should_escalate, reasons, severity = engine.evaluate()
+        else:
+            should_escalate, reasons, severity = detector.should_escalate(conversation, sentiment, critical_safety)
+
+        rows.append({
+            "conversation_id": str(transcript["conversation_id"]),
+            "source": transcript.get("_source", ""),
+            "turn": conversation.get_turn_count(),
+            "tone": sentiment["tone"],
+            "is_frustrated": sentiment["is_frustrated"],
+            "is_anxious": sentiment["is_anxious"],
+            "is_urgent": sentiment["is_urgent"],
+            "facts": json.dumps(conversation.get_all_facts()),
+            "fact_count": len(conversation.get_all_facts()),
+            "answered_questions": len(answered),
+            "pending_questions": tracker.get_unanswered_count(),
+            "tool_calls": tool_calls,
+            "critical_safety": critical_safety,
+            "should_escalate": should_escalate,
+            "severity": severity,
+            "reasons": reasons
+        })
+
+    return rows, new_cache
+
+
+def _replay_batch(transcripts: List[dict]):
+    rows = []
+    new_cache = {}
+    for transcript in transcripts:
+        t_rows, t_cache = replay_transcript(transcript)
+        rows.extend(t_rows)
+        new_cache.update(t_cache)
+    return len(transcripts), rows, new_cache
+
+
+class DecisionWriter:
+    """Buffers decision rows and writes them to Parquet in row groups"""
+
+    def __init__(self, output_path: str, row_group_size: int = 50000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([
+            ("conversation_id", pa.string()),
+            ("source", pa.string()),
+            ("turn", pa.int32()),
+            ("tone", pa.string()),
+            ("is_frustrated", pa.bool_()),
+            ("is_anxious", pa.bool_()),
+            ("is_urgent", pa.bool_()),
+            ("facts", pa.string()),
+            ("fact_count", pa.int32()),
+            ("answered_questions", pa.int32()),
+            ("pending_questions", pa.int32()),
+            ("tool_calls", pa.int32()),
+            ("critical_safety", pa.bool_()),
+            ("should_escalate", pa.bool_()),
+            ("severity", pa.string()),
+            ("reasons", pa.list_(pa.string()))
+        ])
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._buffer = []
+        self._writer = pq.ParquetWriter(output_path, self.schema)
+
+    def write(self, rows: List[dict]):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = {name: [row[name] for row in self._buffer] for name in DECISION_COLUMNS}
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_replay(
+    inputs: List[str],
+    output_path: str,
+    workers: Optional[int] = None,
+    batch_size: int = 64,
+    fact_mode: str = "cached",
+    fact_cache_path: Optional[str] = None,
+    fact_prompt_path: Optional[str] = None,
+    model: Optional[str] = None,
+    thresholds: Optional[Dict[str, int]] = None,
+    sentiment_keywords: Optional[Dict[str, List[str]]] = None,
+    rules_path: Optional[str] = None,
+    progress_every: int = 1000
+) -> dict:
+    """
+    Replay transcripts across a process pool and write per-turn decisions.
+
+    Returns:
+        dict: throughput summary
+    """
+    if fact_mode not in FACT_MODES:
+        raise ValueError(f"fact_mode must be one of {FACT_MODES}")
+
+    workers = workers or os.cpu_count() or 1
+    fact_prompt_path = fact_prompt_path or os.getenv("FACT_PROMPT_PATH")
+    config = {
+        "fact_mode": fact_mode,
+        "fact_prompt_path": fact_prompt_path,
+        "prompt_digest": _prompt_digest(fact_prompt_path),
+        "model": model or os.getenv("EXTRACTION_MODEL") or os.getenv("DEFAULT_MODEL"),
+        "thresholds": thresholds or {},
+        "sentiment_keywords": sentiment_keywords or {},
+        "rules_path": rules_path
+    }
+    fact_cache = load_fact_cache(fact_cache_path) if fact_mode != "none" else {}
+
+    writer = DecisionWriter(output_path)
+    cache_out = open(fact_cache_path, "a", encoding="utf-8") if fact_cache_path and fact_mode == "local" else None
+
+    conversations = 0
+    next_progress = progress_every
+    start = time.perf_counter()
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(config, fact_cache)
+        ) as pool:
+            batches = _batched(iter_transcripts(inputs), batch_size)
+            pending = set()
+            max_pending = workers * 2
+
+            while True:
+                # Keep a bounded number of batches in flight so input is streamed
+                for batch in itertools.islice(batches, max_pending - len(pending)):
+                    pending.add(pool.submit(_replay_batch, batch))
+                if not pending:
+                    break
+
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    count, rows, new_cache = future.result()
+                    conversations += count
+                    writer.write(rows)
+                    if cache_out:
+                        for key, facts in new_cache.items():
+                            cache_out.write(json.dumps({"key": key, "facts": facts}) + "\n")
+
+                if progress_every and conversations >= next_progress:
+                    elapsed = time.perf_counter() - start
+                    print(f"  {conversations} conversations ({conversations / elapsed:.1f}/s)", file=sys.stderr)
+                    next_progress = conversations + progress_every
+    finally:
+        writer.close()
+        if cache_out:
+            cache_out.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "conversations": conversations,
+        "turns": writer.rows_written,
+        "elapsed_seconds": round(elapsed, 3),
+        "conversations_per_second": round(conversations / elapsed, 2) if elapsed else 0.0,
+        "turns_per_second": round(writer.rows_written / elapsed, 2) if elapsed else 0.0,
+        "workers": workers,
+        "output": output_path
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay historical transcripts through the decision pipeline")
+    parser.add_argument("inputs", nargs="+", help="Transcript files (.json/.jsonl) or directories")
+    parser.add_argument("-o", "--output", default="replay_decisions.parquet", help="Parquet output path")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Conversations per worker task")
+    parser.add_argument("--fact-mode", choices=FACT_MODES, default="cached",
+                        help="none: skip facts, cached: recorded/cached facts only, local: call the local model on cache miss")
+    parser.add_argument("--fact-cache", default=None, help="JSONL fact cache (read, and appended to in local mode)")
+    parser.add_argument("--fact-prompt", default=None, help="Fact extraction prompt (default: FACT_PROMPT_PATH)")
+    parser.add_argument("--model", default=None, help="Model for local fact extraction (default: EXTRACTION_MODEL, then DEFAULT_MODEL)")
+    parser.add_argument("--turn-threshold", type=int, default=None)
+    parser.add_argument("--frustrated-turn-threshold", type=int, default=None)
+    parser.add_argument("--tool-call-threshold", type=int, default=None)
+    parser.add_argument("--sentiment-keywords", default=None,
+                        help='JSON file like {"frustrated": [...], "anxious": [...], "urgent": [...]}')
+    parser.add_argument("--rules", default=None,
+                        help="Escalation rules config; uses the rule engine instead of EscalationDetector thresholds")
+    args = parser.parse_args(argv)
+
+    thresholds = {
+        name: value for name, value in [
+            ("turn_threshold", args.turn_threshold),
+            ("frustrated_turn_threshold", args.frustrated_turn_threshold),
+            ("tool_call_threshold", args.tool_call_threshold)
+        ] if value is not None
+    }
+
+    sentiment_keywords = None
+    if args.sentiment_keywords:
+        with open(args.sentiment_keywords, "r", encoding="utf-8") as f:
+            sentiment_keywords = json.load(f)
+
+    summary = run_replay(
+        args.inputs,
+        args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        fact_mode=args.fact_mode,
+        fact_cache_path=args.fact_cache,
+        fact_prompt_path=args.fact_prompt,
+        model=args.model,
+        thresholds=thresholds,
+        sentiment_keywords=sentiment_keywords,
+        rules_path=args.rules
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Similar past cases: an in-memory vector index over resolved issues and tickets.
+
+Each resolved issue / ticket (issue type, description and location) is turned
+into a hashed n-gram vector: distinct words, 4-character word stems and word
+bigrams, each hashed (CRC32) to a signed bucket of a SIMILAR_CASES_DIM-wide float32 row, then
+L2-normalized. All rows live in one preallocated NumPy matrix, so a query is a
+single matrix-vector product and an argpartition for a shortlist, which is
+re-ranked by exact feature overlap; search_many scores a batch of queries with
+one matrix product.
+
+Only resolved cases are indexed, since those are what the assistant can learn
+from. The index is built on first use and then kept current from the storage
+write hook in langchain_tools: new records that arrive already resolved are
+appended, and records updated in place are re-indexed or dropped as their
+status changes. Each write hook (and a search, for writes from another process
+such as another API worker) reads only the records appended or changed since
+the index last saw the file (record_stream.changes), so keeping up with other
+workers costs a checksum pass over the file rather than a rebuild.
+
+Config (env):
+    SIMILAR_CASES             "0" to turn retrieval off (default enabled)
+    SIMILAR_CASES_K           cases injected into context (default 3)
+    SIMILAR_CASES_MIN_SCORE   cosine similarity a case needs to be injected (default 0.25)
+    SIMILAR_CASES_DIM         vector width; memory is 4 x DIM bytes per case (default 128)
+"""
+import math
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import langchain_tools
+import record_stream
+
+
+KINDS = {"issues": langchain_tools.ISSUES_FILE, "tickets": langchain_tools.TICKETS_FILE}
+
+RESOLVED_STATUSES = ("resolved", "closed", "completed")
+
+STOP_WORDS = {"the", "a", "an", "and", "or", "of", "in", "on", "at", "to", "is", "are", "was", "it", "its",
+              "my", "i", "me", "we", "our", "there", "this", "that", "with", "from", "for", "by", "be", "has",
+              "have", "been", "after", "near", "under", "above", "some", "very", "not", "can", "could", "will",
+              "would", "please", "help", "think", "hear", "see", "just", "got", "get", "still", "really", "also"}
+
+STEM_LENGTH = 4
+
+# Candidates per requested result that are re-scored exactly
+RERANK_FACTOR = 4
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def is_resolved(record: Dict) -> bool:
+    return bool(record.get("resolved")) or record.get("status") in RESOLVED_STATUSES
+
+
+def case_text(record: Dict) -> str:
+    return " ".join(str(record.get(field) or "") for field in ("issue_type", "description", "location"))
+
+
+def features(text: str) -> Set[str]:
+    """Distinct words, stems and word bigrams of a text (a case's location often repeats in its description)"""
+    words = [w for w in _WORDS.findall(text.lower()) if w not in STOP_WORDS]
+    stems = [w[:STEM_LENGTH] for w in words if len(w) > STEM_LENGTH]
+    return set(words + stems + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def exact_similarity(a: Set[str], b: Set[str]) -> float:
+    """Cosine similarity of two binary feature sets"""
+    return len(a & b) / math.sqrt(len(a) * len(b)) if a and b else 0.0
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(feature: str, dim: int) -> int:
+    """Signed bucket of a feature: col for +1, -(col + 1) for -1"""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim if h >> 31 else -(h % dim) - 1
+
+
+def vectorize(texts: List[str], dim: int) -> np.ndarray:
+    """Hashed n-gram vectors for a batch of texts, one L2-normalized row each"""
+    # tickets often repeat their issue's description, so each distinct text is hashed once
+    unique = {text: i for i, text in enumerate(dict.fromkeys(texts))}
+    if len(unique) < len(texts):
+        return vectorize(list(unique), dim)[[unique[text] for text in texts]]
+
+    codes, lengths = [], []
+    for text in texts:
+        text_features = features(text)
+        codes.extend(map(_bucket, text_features, repeat(dim)))
+        lengths.append(len(text_features))
+    codes = np.array(codes, dtype=np.int64)
+    rows = np.repeat(np.arange(len(texts)), lengths)
+    cols = np.where(codes >= 0, codes, -codes - 1)
+    signs = np.where(codes >= 0, 1.0, -1.0)
+    vectors = np.bincount(rows * dim + cols, weights=signs, minlength=len(texts) * dim)
+    vectors = vectors.reshape(len(texts), dim).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SimilarCaseIndex:
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or int(os.getenv("SIMILAR_CASES_DIM", 128))
+        self.files = {filepath: kind for kind, filepath in KINDS.items()}
+        self.id_fields = {kind: langchain_tools.ID_FIELDS[filepath] for kind, filepath in KINDS.items()}
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._count = 0
+        # row -> (kind, record), or None once the case is no longer resolved
+        self._cases: List[Optional[Tuple[str, Dict]]] = []
+        self._rows: Dict[str, int] = {}
+        self._checkpoints: Dict[str, record_stream.Checkpoint] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _append(self, kind: str, records: List[Dict]):
+        records = [r for r in records if is_resolved(r) and r.get(self.id_fields[kind]) not in self._rows]
+        if not records:
+            return
+        needed = self._count + len(records)
+        if needed > len(self._matrix):
+            grown = np.zeros((max(needed, 2 * len(self._matrix), 1024), self.dim), dtype=np.float32)
+            grown[:self._count] = self._matrix[:self._count]
+            self._matrix = grown
+        self._matrix[self._count:needed] = vectorize([case_text(r) for r in records], self.dim)
+        for record in records:
+            self._rows[record[self.id_fields[kind]]] = len(self._cases)
+            self._cases.append((kind, record))
+        self._count = needed
+
+    def _update(self, kind: str, record: Dict):
+        """Re-index a record changed in place: drop it, re-vectorize it or add it by its new status"""
+        row = self._rows.get(record.get(self.id_fields[kind]))
+        if row is None:
+            self._append(kind, [record])
+        elif not is_resolved(record):
+            self._matrix[row] = 0.0
+            self._cases[row] = None
+            del self._rows[record[self.id_fields[kind]]]
+        else:
+            self._matrix[row] = vectorize([case_text(record)], self.dim)[0]
+            self._cases[row] = (kind, record)
+
+    def _reset(self):
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._count = 0
+        self._cases = []
+        self._rows = {}
+        self._checkpoints = {}
+
+    def _catch_up(self, filepath: str):
+        """Index the records appended to or changed in filepath since it was last read"""
+        kind = self.files[filepath]
+        id_field = self.id_fields[kind]
+        with record_stream.changes(filepath, self._checkpoints.get(filepath)) as (records, checkpoint, rebuild):
+            if rebuild and filepath in self._checkpoints:
+                self._rebuild()
+                return
+            batch = []
+            for record in records:
+                if record.get(id_field) in self._rows:
+                    self._update(kind, record)
+                    continue
+                batch.append(record)
+                if len(batch) >= 10000:
+                    self._append(kind, batch)
+                    batch = []
+            self._append(kind, batch)
+        self._checkpoints[filepath] = checkpoint
+
+    def _rebuild(self):
+        self._reset()
+        for filepath in self.files:
+            self._catch_up(filepath)
+
+    def refresh(self):
+        """Catch up with writes made outside this process since a file was last seen"""
+        with self._lock:
+            for filepath in self.files:
+                checkpoint = self._checkpoints.get(filepath)
+                if checkpoint is None or langchain_tools.file_version(filepath) != checkpoint.version:
+                    self._catch_up(filepath)
+
+    def on_write(self, filepath: str, records: Optional[List[Dict]], previous_version: tuple, updated=()):
+        if filepath not in self.files:
+            return
+        with self._lock:
+            if filepath not in self._checkpoints:
+                return  # not built yet; the first search reads the files
+            if records is None:
+                self._rebuild()
+            else:
+                # the file has this write's records, and any writes from elsewhere since the last read
+                self._catch_up(filepath)
+
+    def search_many(self, texts: List[str], k: int = 3, min_score: float = 0.0) -> List[List[Tuple[float, str, Dict]]]:
+        """
+        Top k (score, kind, record) per query text, best first. The hashed
+        vectors shortlist RERANK_FACTOR x k candidates; those are re-scored by
+        exact cosine over their features, so hash collisions can't push an
+        unrelated case past min_score.
+        """
+        self.refresh()
+        with self._lock:
+            if not self._count or not texts:
+                return [[] for _ in texts]
+            scores = vectorize(texts, self.dim) @ self._matrix[:self._count].T
+            shortlist = min(RERANK_FACTOR * k, self._count)
+            top = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+            results = []
+            for text, rows in zip(texts, top):
+                query = features(text)
+                ranked = []
+                for row in rows:
+                    case = self._cases[row]
+                    if case is not None:
+                        score = exact_similarity(query, features(case_text(case[1])))
+                        if score >= min_score:
+                            ranked.append((score, *case))
+                ranked.sort(key=lambda c: -c[0])
+                results.append(ranked[:k])
+            return results
+
+    def search(self, text: str, k: int = 3, min_score: float = 0.0) -> List[Tuple[float, str, Dict]]:
+        return self.search_many([text], k, min_score)[0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SimilarCaseIndex:
+    """Process-wide index, kept current by the storage write hook"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarCaseIndex()
+            langchain_tools.add_write_listener(_index.on_write)
+        return _index
+
+
+def similar_cases_enabled() -> bool:
+    return os.getenv("SIMILAR_CASES", "1") not in ("0", "false", "False")
+
+
+def _resolution(record: Dict) -> str:
+    for note in reversed(record.get("notes") or record.get("resolution_notes") or []):
+        text = note.get("note") if isinstance(note, dict) else str(note)
+        if text and not text.startswith("Repeat report"):
+            return text
+    return ""
+
+
+def summarize_cases(cases: List[Tuple[float, str, Dict]]) -> str:
+    """Compact text of similar resolved cases for the model's context"""
+    if not cases:
+        return ""
+    lines = ["Similar resolved cases (for reference; they may not apply to this customer):"]
+    for score, kind, record in cases:
+        case_id = record.get("issue_id") or record.get("ticket_id")
+        line = f"  • {case_id} {record.get('issue_type', '')} in {record.get('location', '')} " \
+               f"({record.get('severity', '')}): {str(record.get('description', ''))[:100]}"
+        resolution = _resolution(record)
+        if resolution:
+            line += f" - resolved: {resolution[:100]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def similar_cases_for_turn(message: str, facts: Dict, k: Optional[int] = None,
+                           min_score: Optional[float] = None) -> List[Tuple[float, str, Dict]]:
+    """Resolved cases similar to the issue described by this message and the conversation's facts"""
+    k = k if k is not None else int(os.getenv("SIMILAR_CASES_K", 3))
+    min_score = min_score if min_score is not None else float(os.getenv("SIMILAR_CASES_MIN_SCORE", 0.25))
+    query = " ".join([message] + [str(facts[f]) for f in ("issue_type", "location", "description") if facts.get(f)])
+    cases, seen = [], set()
+    # an issue and its ticket usually share a description; keep one of each
+    for case in get_index().search(query, 4 * k, min_score):
+        text = case_text(case[2]).lower()
+        if text not in seen:
+            seen.add(text)
+            cases.append(case)
+    return cases[:k]
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Storage paths are read at import, so point them at a scratch directory before any module loads
+os.environ["MAINTENANCE_DATA_DIR"] = tempfile.mkdtemp(prefix="maintenance-tests-")
+os.environ["TRACING_ENABLED"] = "0"
+os.environ["WRITE_BEHIND"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import langchain_tools  # noqa: E402
+
+
+@pytest.fixture
+def storage():
+    """Empty data files before and after each test"""
+    langchain_tools.clear_all_data()
+    yield langchain_tools
+    langchain_tools.clear_all_data()
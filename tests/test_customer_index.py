@@ -0,0 +1,28 @@
+import customer_index
+
+
+def test_profile_is_injected_only_for_a_phone_match(storage):
+    storage._log_customer_issue("Jane Doe", "plumbing", "Leaking tap", "kitchen", contact_info="07700 900123")
+
+    assert customer_index.profile_summary_for_facts({"customer_name": "Jane Doe"}) == ""
+    assert "Jane Doe" in customer_index.profile_summary_for_facts({"phone": "+44 7700 900123"})
+    assert customer_index.get_customer_profile("Jane Doe")["ambiguous"]
+    assert not customer_index.get_customer_profile("07700900123")["ambiguous"]
+
+
+def test_updated_record_is_refiled_under_its_new_keys(storage):
+    storage._log_customer_issue("Jane Doe", "plumbing", "Leaking tap", "kitchen")
+    index = customer_index.get_index()
+    assert len(index.lookup("Jane Doe")["issues"]) == 1
+
+    issues = storage.load_json(storage.ISSUES_FILE)
+    issues[0]["contact_info"] = "07700 900123"
+    issues[0]["customer_name"] = "Jane Smith"
+    with storage.storage_lock(storage.ISSUES_FILE):
+        version = storage.file_version(storage.ISSUES_FILE)
+        storage.save_json(storage.ISSUES_FILE, issues)
+        storage._notify_write(storage.ISSUES_FILE, [], version, issues)
+
+    assert index.lookup("Jane Doe")["issues"] == []
+    assert [r["customer_name"] for r in index.lookup("Jane Smith")["issues"]] == ["Jane Smith"]
+    assert [r["customer_name"] for r in index.lookup("07700 900123")["issues"]] == ["Jane Smith"]
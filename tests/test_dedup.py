@@ -0,0 +1,71 @@
+import pytest
+
+import dedup
+
+LEAK = dict(issue_type="plumbing", location="kitchen", severity="medium")
+
+
+def log_issue(storage, customer="Jane Doe", contact="07700 900123", description="Kitchen tap leaking under the sink"):
+    return storage._log_customer_issue(customer, description=description, contact_info=contact, **LEAK)
+
+
+def test_repeat_report_merges_into_open_issue(storage):
+    first = log_issue(storage)
+    repeat = log_issue(storage, contact="+44 7700 900123", description="The kitchen tap is still leaking")
+
+    assert repeat["duplicate_of"] == first["issue_id"]
+    assert repeat["report_count"] == 2
+    (issue,) = storage.load_json(storage.ISSUES_FILE)
+    assert issue["report_count"] == 2
+    assert issue["notes"][0]["note"].startswith("Repeat report:")
+
+
+@pytest.mark.parametrize("second", [
+    {"contact": "07700 900999"},
+    {"customer": "John Smith"},
+    {"description": "Bathroom extractor fan is broken"},
+])
+def test_different_caller_or_problem_is_appended(storage, second):
+    log_issue(storage)
+    assert "duplicate_of" not in log_issue(storage, **second)
+    assert len(storage.load_json(storage.ISSUES_FILE)) == 2
+
+
+@pytest.mark.parametrize("customer, contact", [
+    ("Guest", "07700 900123"),
+    ("Unknown", "07700 900123"),
+    ("", "07700 900123"),
+    ("Jane Doe", None),
+])
+def test_reports_not_tied_to_a_caller_are_never_merged(storage, customer, contact):
+    assert dedup.bucket_key({"customer_name": customer, "contact_info": contact, **LEAK}) is None
+    log_issue(storage, customer, contact)
+    assert "duplicate_of" not in log_issue(storage, customer, contact)
+    assert len(storage.load_json(storage.ISSUES_FILE)) == 2
+
+
+def test_contact_matches_on_phone_digits_or_text():
+    assert dedup.contact_key({"contact_info": "+44 7700 900123"}) == dedup.contact_key({"contact_number": "07700900123"})
+    assert dedup.contact_key({"contact_info": "12 High St"}) == "12 high st"
+
+
+def test_resolved_issue_is_not_merged_into(storage):
+    log_issue(storage)
+    issues = storage.load_json(storage.ISSUES_FILE)
+    issues[0]["status"] = "resolved"
+    with storage.storage_lock(storage.ISSUES_FILE):
+        version = storage.file_version(storage.ISSUES_FILE)
+        storage.save_json(storage.ISSUES_FILE, issues)
+        storage._notify_write(storage.ISSUES_FILE, [], version, issues)
+
+    assert "duplicate_of" not in log_issue(storage)
+
+
+def test_critical_repeat_ticket_alerts_again(storage):
+    args = dict(issue_type="gas", description="Smell of gas in the hallway", customer_name="Jane Doe",
+                location="hallway", contact_info="07700 900123")
+    storage._create_maintenance_ticket(severity="medium", **args)
+    repeat = storage._create_maintenance_ticket(severity="critical", **args)
+
+    assert repeat["duplicate_of"]
+    assert "Emergency team has been notified" in repeat["message"]
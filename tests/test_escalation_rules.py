@@ -0,0 +1,22 @@
+import json
+import pickle
+
+from escalation_rules import EscalationRuleEngine, RuleSet, get_rule_set
+
+RULES = [{"name": "second_turn", "when": {"turn_count": {">=": 2}}, "severity": "high"}]
+
+
+def test_unpickled_engine_keeps_rules_from_a_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": RULES}))
+    engine = EscalationRuleEngine(get_rule_set(str(path)))
+    engine.on_user_turn("The boiler is off")
+
+    restored = pickle.loads(pickle.dumps(engine))
+    restored.on_user_turn("Still no heating")
+    assert restored.evaluate() == (True, ["second_turn"], "high")
+
+
+def test_unpickled_engine_keeps_rules_built_in_memory():
+    restored = pickle.loads(pickle.dumps(EscalationRuleEngine(RuleSet(RULES))))
+    assert [rule.name for rule in restored.rule_set.rules] == ["second_turn"]
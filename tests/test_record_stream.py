@@ -0,0 +1,118 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import langchain_tools
+import record_stream
+from record_ids import encode, time_bound_key
+
+START = datetime(2025, 3, 1, 9, 0)
+
+
+def ticket(i: int, **fields):
+    """Ticket created i minutes after START"""
+    record_id = f"TKT-{encode(time_bound_key(START + timedelta(minutes=i)))}"
+    return {"ticket_id": record_id, "severity": "low", "description": f"ticket {i}", **fields}
+
+
+def write(path, records, formatted=True):
+    if formatted:
+        langchain_tools.save_json(str(path), records)
+    else:
+        path.write_text(json.dumps(records, separators=(",", ":")))
+    return str(path)
+
+
+@pytest.mark.parametrize("formatted", [True, False])
+def test_scan_returns_every_record_in_order(tmp_path, formatted):
+    records = [ticket(i, notes=["{not a record}", "line\nbreak"], nested={"a": [1, {"b": 2}]}) for i in range(40)]
+    path = write(tmp_path / "tickets.json", records, formatted)
+
+    assert list(record_stream.scan(path)) == records
+    assert record_stream.count(path) == 40
+    with record_stream.mapped(path) as (_, offsets):
+        assert offsets.formatted is formatted
+
+
+def test_missing_and_empty_files(tmp_path):
+    assert list(record_stream.scan(str(tmp_path / "missing.json"))) == []
+    (tmp_path / "empty.json").write_bytes(b"")
+    assert record_stream.count(str(tmp_path / "empty.json")) == 0
+
+
+def test_id_range_is_inclusive_of_until_and_exclusive_of_after_id(tmp_path):
+    records = [ticket(i) for i in range(10)]
+    path = write(tmp_path / "tickets.json", records)
+
+    found = record_stream.scan(path, "ticket_id", since=START + timedelta(minutes=2), until=START + timedelta(minutes=5))
+    assert [r["description"] for r in found] == ["ticket 2", "ticket 3", "ticket 4", "ticket 5"]
+    found = record_stream.scan(path, "ticket_id", after_id=records[6]["ticket_id"])
+    assert [r["description"] for r in found] == ["ticket 7", "ticket 8", "ticket 9"]
+
+
+@pytest.mark.parametrize("formatted", [True, False])
+def test_where_matches_decoded_filtering(tmp_path, formatted):
+    records = [ticket(0, severity="high", owner="bob"), ticket(1, owner=None), ticket(2), ticket(3, severity="critical")]
+    path = write(tmp_path / "tickets.json", records, formatted)
+
+    for where in ({"severity": "high"}, {"severity": ["high", "critical"]}, {"owner": None},
+                  {"owner": [None, "bob"]}, {"severity": "low", "owner": None}):
+        assert list(record_stream.scan(path, where=where)) == \
+            [r for r in records if record_stream.matches(r, where)], where
+
+
+def test_changes_without_checkpoint_rebuilds(tmp_path):
+    path = write(tmp_path / "tickets.json", [ticket(i) for i in range(3)])
+    with record_stream.changes(path) as (records, checkpoint, rebuild):
+        assert rebuild
+        assert len(list(records)) == 3
+    assert len(checkpoint.rows) == 3
+
+
+def test_changes_after_append_returns_only_new_records(tmp_path):
+    records = [ticket(i) for i in range(5)]
+    path = write(tmp_path / "tickets.json", records)
+    with record_stream.changes(path) as (read, checkpoint, _):
+        list(read)
+
+    records += [ticket(5), ticket(6)]
+    write(tmp_path / "tickets.json", records)
+    with record_stream.changes(path, checkpoint) as (read, checkpoint, rebuild):
+        assert not rebuild
+        assert [r["description"] for r in read] == ["ticket 5", "ticket 6"]
+
+    # the checkpoint carried forward matches one computed from scratch
+    with record_stream.changes(path) as (read, fresh, _):
+        list(read)
+    assert (checkpoint.end, checkpoint.crc, list(checkpoint.rows)) == (fresh.end, fresh.crc, list(fresh.rows))
+
+    with record_stream.changes(path, checkpoint) as (read, _, rebuild):
+        assert not rebuild
+        assert list(read) == []
+
+
+def test_changes_after_update_in_place_returns_changed_records(tmp_path):
+    records = [ticket(i) for i in range(5)]
+    path = write(tmp_path / "tickets.json", records)
+    with record_stream.changes(path) as (read, checkpoint, _):
+        list(read)
+
+    records[1]["status"] = "resolved"
+    records.append(ticket(5))
+    write(tmp_path / "tickets.json", records)
+    with record_stream.changes(path, checkpoint) as (read, _, rebuild):
+        assert not rebuild
+        assert [r["description"] for r in read] == ["ticket 1", "ticket 5"]
+
+
+def test_changes_after_records_are_lost_rebuilds(tmp_path):
+    records = [ticket(i) for i in range(5)]
+    path = write(tmp_path / "tickets.json", records)
+    with record_stream.changes(path) as (read, checkpoint, _):
+        list(read)
+
+    write(tmp_path / "tickets.json", records[:2])
+    with record_stream.changes(path, checkpoint) as (read, _, rebuild):
+        assert rebuild
+        assert len(list(read)) == 2
@@ -0,0 +1,56 @@
+import pytest
+
+import langchain_tools
+import write_behind
+from record_ids import new_id
+
+
+@pytest.fixture
+def store(storage):
+    store = write_behind.WriteBehindStore(retries=2, backoff=0.01)
+    yield store
+    store.close(5)
+
+
+@pytest.fixture
+def failing_saves(monkeypatch):
+    """Make the next n saves of the issues file fail"""
+    remaining = {"n": 0}
+    save_json = langchain_tools.save_json
+
+    def flaky(filepath, data):
+        if filepath == langchain_tools.ISSUES_FILE and remaining["n"]:
+            remaining["n"] -= 1
+            raise OSError("disk full")
+        save_json(filepath, data)
+
+    monkeypatch.setattr(langchain_tools, "save_json", flaky)
+    return remaining
+
+
+def issue(severity="low"):
+    return {"issue_id": new_id("ISSUE"), "customer_name": "Jane Doe", "severity": severity}
+
+
+def test_failed_commit_is_retried(store, failing_saves):
+    failing_saves["n"] = 1
+    store.submit(langchain_tools.ISSUES_FILE, [issue()])
+
+    assert store.flush(5)
+    assert len(langchain_tools.load_json(langchain_tools.ISSUES_FILE)) == 1
+
+
+def test_persistent_failure_is_surfaced_and_writes_are_kept(store, failing_saves):
+    failing_saves["n"] = 1000
+    with pytest.raises(OSError):
+        store.submit(langchain_tools.ISSUES_FILE, [issue(severity="critical")])  # sync: waits for the commit
+    store.submit(langchain_tools.ISSUES_FILE, [issue()])
+    with pytest.raises(RuntimeError):
+        store.flush(5)
+    with pytest.raises(RuntimeError):
+        store.submit(langchain_tools.ISSUES_FILE, [issue()])
+
+    failing_saves["n"] = 0
+    store.backoff = 0
+    store.close(35)
+    assert len(langchain_tools.load_json(langchain_tools.ISSUES_FILE)) == 1
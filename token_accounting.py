@@ -0,0 +1,164 @@
+"""
+Token and latency accounting per session, with budgets.
+
+Each model call's response.usage and wall time (including any scheduler
+queueing) is recorded in the session's UsageLedger, broken down by turn and
+by task (extraction / chat / post_tool). Calls whose response carries no usage
+are estimated from the request and reply text and flagged as such.
+
+Two budgets keep a session from growing without bound:
+
+    SESSION_CONTEXT_BUDGET  prompt tokens a reply may send; above it, older turns are compacted
+                            into a short summary before the call (default 0: no limit)
+    SESSION_TOKEN_BUDGET    total tokens a session may use; past it, the token_budget escalation
+                            rule fires and the conversation is handed to a human (default 0: no limit)
+    COMPACT_KEEP_TURNS      user turns kept verbatim when compacting (default 2)
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+TASKS = ["extraction", "chat", "post_tool"]
+
+MAX_TURNS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token count (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_request_tokens(messages: List[Dict], tools: Optional[List[Dict]] = None) -> int:
+    tokens = sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+    return tokens + (estimate_tokens(json.dumps(tools)) if tools else 0)
+
+
+def _empty_totals() -> Dict:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+            "latency_ms": 0.0, "estimated_calls": 0}
+
+
+def _add(totals: Dict, prompt_tokens: int, completion_tokens: int, latency_ms: float, estimated: bool):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += prompt_tokens
+    totals["completion_tokens"] += completion_tokens
+    totals["total_tokens"] += prompt_tokens + completion_tokens
+    totals["latency_ms"] = round(totals["latency_ms"] + latency_ms, 3)
+    totals["estimated_calls"] += estimated
+
+
+def response_usage(response, request: Dict):
+    """(prompt tokens, completion tokens, estimated) for a completed call"""
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens or 0, False
+
+    prompt_tokens = estimate_request_tokens(request.get("messages", []), request.get("tools"))
+    completion_tokens = 0
+    choices = getattr(response, "choices", None)
+    if choices:
+        message = choices[0].message
+        completion_tokens = estimate_tokens(message.content or "")
+        for call in getattr(message, "tool_calls", None) or []:
+            completion_tokens += estimate_tokens(call.function.arguments or "")
+    return prompt_tokens, completion_tokens, True
+
+
+class UsageLedger:
+    """One session's model usage"""
+
+    def __init__(self, token_budget: Optional[int] = None, context_budget: Optional[int] = None,
+                 keep_turns: Optional[int] = None):
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("SESSION_TOKEN_BUDGET", 0))
+        self.context_budget = context_budget if context_budget is not None else \
+            int(os.getenv("SESSION_CONTEXT_BUDGET", 0))
+        self.keep_turns = keep_turns if keep_turns is not None else int(os.getenv("COMPACT_KEEP_TURNS", 2))
+        self.totals = _empty_totals()
+        self.by_task: Dict[str, Dict] = {task: _empty_totals() for task in TASKS}
+        self.by_turn: "OrderedDict[str, Dict]" = OrderedDict()
+        self.compactions = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, turn_id: str, task: str, model: str, prompt_tokens: int, completion_tokens: int,
+               latency_ms: float, estimated: bool = False):
+        with self._lock:
+            _add(self.totals, prompt_tokens, completion_tokens, latency_ms, estimated)
+            _add(self.by_task.setdefault(task, _empty_totals()), prompt_tokens, completion_tokens, latency_ms, estimated)
+            turn = self.by_turn.get(turn_id)
+            if turn is None:
+                turn = self.by_turn[turn_id] = {"totals": _empty_totals(), "calls": []}
+                if len(self.by_turn) > MAX_TURNS:
+                    self.by_turn.popitem(last=False)
+            _add(turn["totals"], prompt_tokens, completion_tokens, latency_ms, estimated)
+            turn["calls"].append({
+                "task": task, "model": model, "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens, "latency_ms": round(latency_ms, 3), "estimated": estimated
+            })
+
+    def bind(self, client, task: str, turn_id: str) -> "AccountedClient":
+        return AccountedClient(client, self, task, turn_id)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.totals["total_tokens"]
+
+    def over_budget(self) -> bool:
+        return bool(self.token_budget) and self.total_tokens >= self.token_budget
+
+    def needs_compaction(self, request_tokens: int) -> bool:
+        return bool(self.context_budget) and request_tokens > self.context_budget
+
+    def turn_usage(self, turn_id: str) -> Dict:
+        with self._lock:
+            turn = self.by_turn.get(turn_id)
+            return {"totals": dict(turn["totals"]), "calls": list(turn["calls"])} if turn else \
+                {"totals": _empty_totals(), "calls": []}
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "totals": dict(self.totals),
+                "by_task": {task: dict(totals) for task, totals in self.by_task.items()},
+                "turns": len(self.by_turn),
+                "compactions": self.compactions,
+                "token_budget": self.token_budget,
+                "context_budget": self.context_budget
+            }
+
+
+class AccountedClient:
+    """Stand-in for an OpenAI client that records each chat.completions.create in a ledger"""
+
+    def __init__(self, client, ledger: UsageLedger, task: str, turn_id: str):
+        self._client = client
+        self._ledger = ledger
+        self.task = task
+        self.turn_id = turn_id
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        start = time.perf_counter()
+        response = self._client.chat.completions.create(**kwargs)
+        latency_ms = (time.perf_counter() - start) * 1000
+        if kwargs.get("stream"):
+            # usage arrives with the last chunk, which the caller consumes
+            prompt_tokens, completion_tokens, estimated = \
+                estimate_request_tokens(kwargs.get("messages", []), kwargs.get("tools")), 0, True
+        else:
+            prompt_tokens, completion_tokens, estimated = response_usage(response, kwargs)
+        self._ledger.record(self.turn_id, self.task, kwargs.get("model"), prompt_tokens, completion_tokens,
+                            latency_ms, estimated)
+        return response
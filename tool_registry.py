@@ -0,0 +1,158 @@
+"""
+Typed tool dispatch for model tool calls.
+
+The registry validates arguments against langchain_tools_schema, calls each
+tool implementation exactly once, and hands back the result dict directly
+(encoded to JSON once, for the tool message). Per-tool call counts, error
+counts and latency histograms are kept for the sidebar and tracing.
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+import langchain_tools
+from tracing import span
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class ToolResult:
+
+    def __init__(self, name: str, arguments: Dict, data: Dict, latency_ms: float):
+        self.name = name
+        self.arguments = arguments
+        self.data = data
+        self.latency_ms = latency_ms
+        self._content = None
+
+    @property
+    def ok(self) -> bool:
+        return self.data.get("status") != "error"
+
+    @property
+    def content(self) -> str:
+        """JSON content for the tool message, encoded once"""
+        if self._content is None:
+            self._content = json.dumps(self.data)
+        return self._content
+
+    def summary(self) -> str:
+        return self.data.get("message", self.data.get("status", "Done"))
+
+
+class ToolStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, latency_ms: float, ok: bool):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bucket bound containing the q-th quantile of latencies, capped at the observed max"""
+        if not self.calls:
+            return 0.0
+        target = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if seen >= target:
+                return min(float(LATENCY_BUCKETS_MS[i]), self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                "le_inf": self.buckets[-1]
+            }
+        }
+
+
+class ToolRegistry:
+
+    def __init__(self, implementations: Optional[Dict] = None):
+        self.implementations = implementations or langchain_tools.tool_implementations
+        self.stats: Dict[str, ToolStats] = {name: ToolStats() for name in self.implementations}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return list(self.implementations)
+
+    def parse_arguments(self, arguments: Union[str, Dict, None]):
+        """Returns (args dict, error message or None)"""
+        if arguments is None or arguments == "":
+            return {}, None
+        if isinstance(arguments, dict):
+            return arguments, None
+        try:
+            parsed = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            return {}, f"Arguments are not valid JSON: {str(e)}"
+        if not isinstance(parsed, dict):
+            return {}, "Arguments must be a JSON object"
+        return parsed, None
+
+    def invoke(self, name: str, arguments: Union[str, Dict, None]) -> ToolResult:
+        """Validate and run a tool call exactly once"""
+        start = time.perf_counter()
+        args, error = self.parse_arguments(arguments)
+
+        impl = self.implementations.get(name)
+        if impl is None:
+            data = {"status": "error", "message": f"Tool '{name}' unavailable"}
+        elif error:
+            data = {"status": "error", "message": error}
+        else:
+            errors = langchain_tools.validate_tool_args(name, args)
+            if errors:
+                data = {"status": "error", "message": f"Invalid arguments for {name}: {'; '.join(errors)}"}
+            else:
+                try:
+                    with span(f"tool.{name}"):
+                        data = impl(**{key: value for key, value in args.items() if value is not None})
+                except Exception as e:
+                    data = {"status": "error", "message": f"{name} failed: {str(e)}"}
+
+        result = ToolResult(name, args, data, (time.perf_counter() - start) * 1000)
+        if impl is not None:
+            with self._lock:
+                self.stats[name].record(result.latency_ms, result.ok)
+        return result
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+
+_registry = None
+
+
+def get_registry() -> ToolRegistry:
+    """Process-wide registry, so stats accumulate across sessions"""
+    global _registry
+    if _registry is None:
+        _registry = ToolRegistry()
+    return _registry
@@ -0,0 +1,147 @@
+"""
+Per-turn tool subset selection.
+
+Rather than attaching every tool schema to every chat request, a cheap local
+intent classifier picks the tools a turn could plausibly need from keyword
+matches on the message, its detect_sentiment result and the conversation's
+extracted facts:
+
+    booking        book_maintenance_appointment, check_booking_availability
+    availability   check_booking_availability
+    issue          log_customer_issue (+ create_maintenance_ticket if urgent / high severity)
+    safety         create_maintenance_ticket
+    human          escalate_to_human_representative (also on frustration)
+    history        get_customer_profile
+
+An intent stays active for STICKY_TURNS more turns, so a follow-up that only
+supplies details ("tomorrow, 07700 900123") keeps the tools it needs. With no
+intent, no tools are sent. Selected tools keep their schema order so requests
+share a stable prompt prefix. Tokens saved per turn are recorded on the
+"tool_selection" span.
+
+Config (env):
+    TOOL_SELECTION   "0" to always send every tool (default enabled)
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from token_accounting import estimate_tokens
+
+STICKY_TURNS = 2
+
+INTENT_PATTERNS = {
+    "booking": [
+        "book", "appointment", "schedul", "arrange", "visit", "technician", "engineer", "plumber",
+        "electrician", "come out", "come round", "send someone", "someone to", "repair", "fix"
+    ],
+    "availability": ["availab", "free slot", "slots", "when can", "earliest", "what days", "which days"],
+    "issue": [
+        "leak", "drip", "damp", "mould", "mold", "condensation", "crack", "broken", "not working",
+        "doesn't work", "stopped working", "blocked", "heating", "boiler", "radiator", "hot water",
+        "toilet", "sink", "roof", "window", "ceiling", "pest", "rot", "problem", "issue"
+    ],
+    "safety": [
+        "gas", "smell", "spark", "fire", "smoke", "burning", "carbon monoxide", "flood", "shock",
+        "exposed wire", "collaps", "danger", "unsafe"
+    ],
+    "human": [
+        "human", "real person", "agent", "representative", "manager", "supervisor", "complain",
+        "speak to", "talk to someone", "call me"
+    ],
+    "history": [
+        "last time", "previous", "already reported", "already booked", "again", "status", "update on",
+        "my booking", "my ticket", "my issue", "my appointment", "reference", r"(?:book|tkt|issue|esc)-\w+"
+    ]
+}
+
+INTENT_TOOLS = {
+    "booking": ["book_maintenance_appointment", "check_booking_availability"],
+    "availability": ["check_booking_availability"],
+    "issue": ["log_customer_issue"],
+    "safety": ["create_maintenance_ticket"],
+    "human": ["escalate_to_human_representative"],
+    "history": ["get_customer_profile"]
+}
+
+BOOKING_FACTS = ["preferred_date", "date", "appointment_date"]
+
+_PATTERNS = {
+    intent: re.compile(r"\b(?:" + "|".join(pattern if "\\" in pattern else re.escape(pattern)
+                                          for pattern in patterns) + ")")
+    for intent, patterns in INTENT_PATTERNS.items()
+}
+
+_schema_tokens: Dict[str, int] = {}
+
+
+def tool_selection_enabled() -> bool:
+    return os.getenv("TOOL_SELECTION", "1") not in ("0", "false", "False")
+
+
+def schema_tokens(schema: Dict) -> int:
+    name = schema["function"]["name"]
+    if name not in _schema_tokens:
+        _schema_tokens[name] = estimate_tokens(json.dumps(schema))
+    return _schema_tokens[name]
+
+
+def classify_intents(message: str, sentiment: Optional[dict] = None, facts: Optional[Dict] = None) -> List[str]:
+    """Intents present in this turn, from keywords, sentiment and known facts"""
+    text = message.lower()
+    intents = [intent for intent, pattern in _PATTERNS.items() if pattern.search(text)]
+    facts = facts or {}
+    sentiment = sentiment or {}
+
+    if facts.get("issue_type") and "issue" not in intents:
+        intents.append("issue")
+    if str(facts.get("severity", "")).lower() in ("high", "critical") and "safety" not in intents:
+        intents.append("safety")
+    if "issue" in intents and sentiment.get("is_urgent") and "safety" not in intents:
+        intents.append("safety")
+    if any(facts.get(fact) for fact in BOOKING_FACTS) and "booking" not in intents:
+        intents.append("booking")
+    if sentiment.get("is_frustrated") and "human" not in intents:
+        intents.append("human")
+    return intents
+
+
+class ToolSelection:
+
+    def __init__(self, tools: List[Dict], intents: List[str], tokens_full: int, tokens_sent: int):
+        self.tools = tools
+        self.intents = intents
+        self.tokens_full = tokens_full
+        self.tokens_sent = tokens_sent
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_full - self.tokens_sent
+
+    @property
+    def names(self) -> List[str]:
+        return [tool["function"]["name"] for tool in self.tools]
+
+
+def select_tools(schema: List[Dict], message: str, sentiment: Optional[dict] = None,
+                 facts: Optional[Dict] = None, active_intents: Optional[Dict[str, int]] = None) -> ToolSelection:
+    """
+    Tools from schema for this turn. active_intents (intent -> turns left) is
+    the conversation's carried-over intents; it is updated in place.
+    """
+    tokens_full = sum(schema_tokens(tool) for tool in schema)
+    if not tool_selection_enabled():
+        return ToolSelection(list(schema), list(INTENT_TOOLS), tokens_full, tokens_full)
+
+    active_intents = active_intents if active_intents is not None else {}
+    for intent in list(active_intents):
+        active_intents[intent] -= 1
+        if active_intents[intent] < 0:
+            del active_intents[intent]
+    for intent in classify_intents(message, sentiment, facts):
+        active_intents[intent] = STICKY_TURNS
+
+    wanted = {name for intent in active_intents for name in INTENT_TOOLS[intent]}
+    tools = [tool for tool in schema if tool["function"]["name"] in wanted]
+    return ToolSelection(tools, sorted(active_intents), tokens_full, sum(schema_tokens(tool) for tool in tools))
@@ -0,0 +1,272 @@
+"""
+Per-stage tracing for conversation turns.
+
+Every stage of a turn (prompt loading, sentiment, fact extraction, model
+calls, tool execution, storage reads/writes, sidebar reloads) is timed as a
+span tagged with the current session and turn IDs. Spans are appended to a
+local JSONL file and aggregated into latency histograms that can be scraped
+in Prometheus text format.
+
+The span file is rotated by size: once it reaches TRACE_MAX_MB it is renamed
+to <file>.1 (replacing the previous one) and a new file is started, so traces
+take at most about twice that on disk. Processes sharing the file (API
+workers) check its size every ROTATE_CHECK_BYTES they write and reopen it when
+another process has rotated it.
+
+Config (env):
+    TRACING_ENABLED   "0" to disable (default enabled)
+    TRACE_FILE        JSONL output path (default traces/spans.jsonl)
+    TRACE_MAX_MB      size at which the span file is rotated (default 50; 0 never rotates)
+    METRICS_PORT      port for the /metrics endpoint (not started if unset)
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+DEFAULT_TRACE_FILE = os.path.join("traces", "spans.jsonl")
+
+DEFAULT_MAX_MB = 50
+
+# Bytes written between checks of the span file's size
+ROTATE_CHECK_BYTES = 1 << 20
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+MAX_RECENT_TURNS = 256
+
+_session_id = contextvars.ContextVar("trace_session_id", default=None)
+_turn_id = contextvars.ContextVar("trace_turn_id", default=None)
+_parent_id = contextvars.ContextVar("trace_parent_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class _StageMetrics:
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def observe(self, seconds: float, error: bool):
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Tracer:
+
+    def __init__(self, trace_file: Optional[str] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv("TRACING_ENABLED", "1") not in ("0", "false", "False")
+        self.enabled = enabled
+        self.trace_file = trace_file or os.getenv("TRACE_FILE", DEFAULT_TRACE_FILE)
+        self.max_bytes = int(float(os.getenv("TRACE_MAX_MB", DEFAULT_MAX_MB)) * (1 << 20))
+        self._lock = threading.Lock()
+        self._file = None
+        self._unchecked = 0
+        self._metrics: Dict[str, _StageMetrics] = {}
+        self._turns: "OrderedDict[str, List[Dict]]" = OrderedDict()
+
+    def _write(self, record: Dict):
+        if self._file is None:
+            directory = os.path.dirname(self.trace_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.trace_file, "a", encoding="utf-8", buffering=1)
+        line = json.dumps(record) + "\n"
+        self._file.write(line)
+        self._unchecked += len(line)
+        if self.max_bytes and self._unchecked >= min(ROTATE_CHECK_BYTES, self.max_bytes):
+            self._unchecked = 0
+            self._rotate()
+
+    def _rotate(self):
+        """Start a new span file if this one is full or was rotated by another process"""
+        try:
+            current = os.stat(self.trace_file)
+        except FileNotFoundError:
+            current = None
+        ours = os.fstat(self._file.fileno())
+        if current is not None and (current.st_ino, current.st_dev) == (ours.st_ino, ours.st_dev):
+            if current.st_size < self.max_bytes:
+                return
+            os.replace(self.trace_file, f"{self.trace_file}.1")
+        self._file.close()
+        self._file = None
+
+    def record(self, record: Dict):
+        seconds = record["duration_ms"] / 1000
+        with self._lock:
+            metrics = self._metrics.get(record["name"])
+            if metrics is None:
+                metrics = self._metrics[record["name"]] = _StageMetrics()
+            metrics.observe(seconds, record["error"] is not None)
+
+            turn_id = record["turn_id"]
+            if turn_id:
+                spans = self._turns.get(turn_id)
+                if spans is None:
+                    spans = self._turns[turn_id] = []
+                    if len(self._turns) > MAX_RECENT_TURNS:
+                        self._turns.popitem(last=False)
+                spans.append(record)
+
+            try:
+                self._write(record)
+            except OSError:
+                pass
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            yield attrs
+            return
+
+        span_id = new_trace_id()
+        token = _parent_id.set(span_id)
+        start_wall = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _parent_id.reset(token)
+            self.record({
+                "name": name,
+                "span_id": span_id,
+                "parent_id": _parent_id.get(),
+                "session_id": _session_id.get(),
+                "turn_id": _turn_id.get(),
+                "start": start_wall,
+                "duration_ms": round(duration_ms, 3),
+                "error": error,
+                "attrs": attrs
+            })
+
+    def turn_spans(self, turn_id: str) -> List[Dict]:
+        with self._lock:
+            return list(self._turns.get(turn_id, []))
+
+    def turn_breakdown(self, turn_id: str) -> Dict[str, float]:
+        """Total milliseconds per stage for one turn, in first-seen order"""
+        breakdown: Dict[str, float] = {}
+        for span in self.turn_spans(turn_id):
+            breakdown[span["name"]] = round(breakdown.get(span["name"], 0.0) + span["duration_ms"], 3)
+        return breakdown
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP customer360_stage_duration_seconds Duration of traced turn stages",
+            "# TYPE customer360_stage_duration_seconds histogram"
+        ]
+        error_lines = [
+            "# HELP customer360_stage_errors_total Traced stages that raised",
+            "# TYPE customer360_stage_errors_total counter"
+        ]
+        with self._lock:
+            for name, metrics in sorted(self._metrics.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    lines.append(f'customer360_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'customer360_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {metrics.count}')
+                lines.append(f'customer360_stage_duration_seconds_sum{{stage="{name}"}} {metrics.total:.6f}')
+                lines.append(f'customer360_stage_duration_seconds_count{{stage="{name}"}} {metrics.count}')
+                error_lines.append(f'customer360_stage_errors_total{{stage="{name}"}} {metrics.errors}')
+        return "\n".join(lines + error_lines) + "\n"
+
+
+tracer = Tracer()
+
+
+def set_context(session_id: Optional[str] = None, turn_id: Optional[str] = None):
+    """Tag spans recorded from now on (in this thread/task) with session and turn IDs"""
+    _session_id.set(session_id)
+    _turn_id.set(turn_id)
+
+
+def current_turn_id() -> Optional[str]:
+    return _turn_id.get()
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def record_span(name: str, duration_ms: float, **attrs):
+    """Record a stage that was timed outside a span (e.g. from script start)"""
+    if not tracer.enabled:
+        return
+    tracer.record({
+        "name": name,
+        "span_id": new_trace_id(),
+        "parent_id": _parent_id.get(),
+        "session_id": _session_id.get(),
+        "turn_id": _turn_id.get(),
+        "start": time.time() - duration_ms / 1000,
+        "duration_ms": round(duration_ms, 3),
+        "error": None,
+        "attrs": attrs
+    })
+
+
+def traced(name: str):
+    """Decorator that records a span around each call"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1"):
+    """Serve /metrics in a daemon thread. Returns None if no port is configured"""
+    port = port or (int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None)
+    if not port:
+        return None
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
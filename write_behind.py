@@ -0,0 +1,355 @@
+"""
+Write-behind persistence for tool writes.
+
+With WRITE_BEHIND=1, a tool write is validated and given its ID as usual,
+applied to an in-memory view of the data file (which reads go through), and
+queued; the tool returns straight away while a background worker commits
+queued writes to storage in order, batching many into one file rewrite.
+Duplicate detection runs against the view at submit time, so a repeat report
+merges into the same record whether or not the first one is committed yet.
+
+Durability is set per record type: "sync" writes are queued behind any pending
+writes to the same file and the caller waits until they are committed, so order
+is preserved. Critical records (critical severity/urgency or requiring
+immediate action) are always sync. The queue is bounded: when it is full,
+submitters block for up to WRITE_BEHIND_TIMEOUT seconds and then fail. A bulk
+call waits for room for all of its records, so it is queued whole or not at
+all. Pending writes are flushed at interpreter exit.
+
+A commit that fails is retried in place (the writes stay queued and in the
+view) with exponential backoff. Once a file has failed WRITE_BEHIND_RETRIES
+times in a row, sync writes waiting on it fail, and every submit and flush
+raises until a commit succeeds again, so no more writes are accepted while
+queued ones can't be stored. The queued async writes keep being retried.
+
+Config (env):
+    WRITE_BEHIND            "1" to enable (default: every write is synchronous)
+    WRITE_DURABILITY        per record type, e.g. "bookings=async,issues=async,tickets=async,escalations=sync"
+    WRITE_BEHIND_MAX_DEPTH  max queued writes (default 1000)
+    WRITE_BEHIND_TIMEOUT    seconds a submitter waits for queue space (default 5)
+    WRITE_BEHIND_BATCH      max writes taken per commit cycle (default 256)
+    WRITE_BEHIND_RETRIES    failed commits of a batch before writers see the error (default 3)
+    WRITE_BEHIND_BACKOFF    seconds before the first retry, doubling up to 30 (default 0.1)
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import langchain_tools
+from dedup import DuplicateIndex
+
+
+DEFAULT_DURABILITY = {
+    "bookings": "async",
+    "issues": "async",
+    "tickets": "async",
+    "escalations": "sync"
+}
+
+MAX_BACKOFF_S = 30
+
+
+def write_behind_enabled() -> bool:
+    return os.getenv("WRITE_BEHIND", "0") in ("1", "true", "True")
+
+
+def load_durability(spec: Optional[str] = None) -> Dict[str, str]:
+    durability = dict(DEFAULT_DURABILITY)
+    spec = spec if spec is not None else os.getenv("WRITE_DURABILITY", "")
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        record_type, mode = (p.strip().lower() for p in part.split("=", 1))
+        if record_type not in durability or mode not in ("sync", "async"):
+            raise ValueError(f"Invalid WRITE_DURABILITY entry '{part.strip()}'")
+        durability[record_type] = mode
+    return durability
+
+
+def is_critical(record: Dict) -> bool:
+    return (record.get("severity") == "critical" or record.get("urgency") == "critical"
+            or bool(record.get("requires_immediate_action")))
+
+
+class PendingWrite:
+
+    def __init__(self, filepath: str, record: Dict, target_id: Optional[str] = None, merge=None):
+        self.filepath = filepath
+        self.record = record
+        self.target_id = target_id
+        self.merge = merge
+        self.committed = threading.Event()
+        self.error: Optional[Exception] = None
+        self.attempts = 0
+
+
+class FileView:
+    """A data file's records plus the writes still queued for it"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.id_field = langchain_tools.ID_FIELDS[filepath]
+        self.lock = threading.RLock()
+        self.records: Optional[List[Dict]] = None
+        self.by_id: Dict[str, Dict] = {}
+        self.synced_version = None
+        self.generation = 0
+        self.pending: List[PendingWrite] = []
+        self.index = DuplicateIndex(filepath)
+
+    def apply(self, data: List[Dict], by_id: Dict[str, Dict], write: PendingWrite):
+        """Apply a write to a record list. Returns (record, merge result or None, appended)"""
+        existing = by_id.get(write.target_id) if write.target_id else None
+        if existing is not None:
+            return existing, write.merge(existing, write.record), False
+        record = dict(write.record)
+        langchain_tools._insert_sorted(data, record, self.id_field)
+        by_id[record[self.id_field]] = record
+        return record, None, True
+
+    def refresh(self):
+        """Reload from disk if the file changed since the view last saw it (call under lock)"""
+        version = langchain_tools.file_version(self.filepath)
+        if self.records is not None and version == self.synced_version:
+            return
+        data = langchain_tools.load_json(self.filepath)
+        by_id = {r[self.id_field]: r for r in data}
+        for write in self.pending:
+            self.apply(data, by_id, write)
+        self.records, self.by_id, self.synced_version = data, by_id, version
+        self.index.rebuild(data, version)
+        self.generation += 1
+
+    def submit(self, write: PendingWrite, dedup: bool) -> Optional[Dict]:
+        """Decide append vs merge against the view and apply it. Returns the merge result or None"""
+        with self.lock:
+            self.refresh()
+            if dedup and write.merge is not None:
+                write.target_id = self.index.find(write.record)
+            record, merged, _ = self.apply(self.records, self.by_id, write)
+            if dedup:
+                self.index.add(record)
+            self.pending.append(write)
+            self.generation += 1
+            return merged
+
+    def snapshot(self) -> List[Dict]:
+        with self.lock:
+            self.refresh()
+            return list(self.records)
+
+    def version(self) -> tuple:
+        with self.lock:
+            return (langchain_tools.file_version(self.filepath), self.generation)
+
+
+class WriteBehindStore:
+
+    def __init__(self, max_depth: Optional[int] = None, timeout: Optional[float] = None,
+                 batch_size: Optional[int] = None, durability: Optional[Dict[str, str]] = None,
+                 retries: Optional[int] = None, backoff: Optional[float] = None):
+        self.max_depth = max_depth or int(os.getenv("WRITE_BEHIND_MAX_DEPTH", 1000))
+        self.timeout = timeout if timeout is not None else float(os.getenv("WRITE_BEHIND_TIMEOUT", 5))
+        self.batch_size = batch_size or int(os.getenv("WRITE_BEHIND_BATCH", 256))
+        self.retries = retries if retries is not None else int(os.getenv("WRITE_BEHIND_RETRIES", 3))
+        self.backoff = backoff if backoff is not None else float(os.getenv("WRITE_BEHIND_BACKOFF", 0.1))
+        self.durability = durability or load_durability()
+        self.views = {filepath: FileView(filepath) for filepath in langchain_tools.DATA_FILES}
+        self.stats = {"submitted": 0, "committed": 0, "commits": 0, "errors": 0, "failed": 0, "blocked_ms": 0.0}
+        self._queue: deque = deque()
+        self._inflight = 0
+        # set while a file's commits keep failing; cleared by the next successful commit
+        self._failure: Optional[Exception] = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    def is_sync(self, filepath: str, record: Dict) -> bool:
+        record_type = langchain_tools.RECORD_TYPES[filepath]
+        return self.durability.get(record_type) == "sync" or is_critical(record)
+
+    def submit(self, filepath: str, records: List[Dict], merge=None) -> List[Optional[Dict]]:
+        """Queue records for filepath; same return contract as append_deduplicated"""
+        from dedup import dedup_enabled
+
+        dedup = merge is not None and dedup_enabled()
+        view = self.views[filepath]
+        writes = [PendingWrite(filepath, record, merge=merge) for record in records]
+        outcomes = []
+        # reload a changed file before taking _cond, so the worker and other submitters aren't held up
+        with view.lock:
+            view.refresh()
+        with self._cond:
+            self._raise_failure()
+            # room for the whole call first, so a timeout leaves none of its records queued
+            self._wait_for_space(len(writes))
+            # the view and the queue are updated together so queue order matches view order
+            with view.lock:
+                for write in writes:
+                    outcomes.append(view.submit(write, dedup))
+                    self._queue.append(write)
+            self.stats["submitted"] += len(writes)
+            self._cond.notify_all()
+        waits = [write for write in writes if self.is_sync(filepath, write.record)]
+
+        for write in waits:
+            write.committed.wait()
+            if write.error:
+                raise write.error
+        return outcomes
+
+    def _raise_failure(self):
+        """Refuse new writes (and flushes) while queued writes can't be committed (call under _cond)"""
+        if self._failure is not None:
+            raise RuntimeError(f"Storage is failing ({self._failure}); "
+                               f"{len(self._queue) + self._inflight} writes are waiting to be retried")
+
+    def _wait_for_space(self, count: int = 1):
+        """
+        Backpressure: block (holding _cond) until the queue has room for count
+        writes; a call larger than the whole queue waits for it to drain
+        """
+        start = time.perf_counter()
+        if not self._cond.wait_for(lambda: len(self._queue) + count <= self.max_depth or not self._queue,
+                                   timeout=self.timeout):
+            raise RuntimeError(f"Storage is busy ({len(self._queue)} writes queued), please retry")
+        self.stats["blocked_ms"] += (time.perf_counter() - start) * 1000
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._queue) + self._inflight
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued write is committed. Returns False on timeout;
+        raises if commits are failing
+        """
+        with self._cond:
+            done = self._cond.wait_for(lambda: (not self._queue and not self._inflight) or self._failure is not None,
+                                       timeout=timeout)
+            self._raise_failure()
+            return done
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush pending writes and stop the worker"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopping)
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._inflight = len(batch)
+                self._cond.notify_all()
+
+            by_file: Dict[str, List[PendingWrite]] = {}
+            for write in batch:
+                by_file.setdefault(write.filepath, []).append(write)
+            retry = []
+            for filepath, writes in by_file.items():
+                retry.extend(self._commit(filepath, writes))
+
+            with self._cond:
+                # failed writes go back to the front, in order, ahead of anything queued since
+                self._queue.extendleft(reversed(retry))
+                self._inflight = 0
+                self._cond.notify_all()
+                if retry and self._stopping and self._failure is not None:
+                    print(f" Write-behind: {len(self._queue)} writes could not be stored: {self._failure}")
+                    return
+                if retry:
+                    failures += 1
+                    self._cond.wait_for(lambda: self._stopping,
+                                        timeout=min(self.backoff * 2 ** (failures - 1), MAX_BACKOFF_S))
+                else:
+                    failures = 0
+
+    def _commit(self, filepath: str, writes: List[PendingWrite]) -> List[PendingWrite]:
+        """Commit writes to filepath. Returns the writes to retry (all of them if the commit failed)"""
+        view = self.views[filepath]
+        try:
+            with langchain_tools.storage_lock(filepath):
+                previous_version = langchain_tools.file_version(filepath)
+                data = langchain_tools.load_json(filepath)
+                by_id = {r[view.id_field]: r for r in data}
+                appended, updated = [], []
+                for write in writes:
+                    record, _, is_new = view.apply(data, by_id, write)
+                    if is_new:
+                        appended.append(record)
+                    elif record not in updated:
+                        updated.append(record)
+                langchain_tools.save_json(filepath, data)
+
+                with view.lock:
+                    committed = set(map(id, writes))
+                    view.pending = [w for w in view.pending if id(w) not in committed]
+                    if previous_version == view.synced_version:
+                        # the view already holds these writes; only the file version moved
+                        view.synced_version = langchain_tools.file_version(filepath)
+                    else:
+                        view.records = None  # written to from elsewhere; reload on next read
+                langchain_tools._notify_write(filepath, appended, previous_version, updated)
+        except Exception as e:
+            return self._commit_failed(filepath, writes, e)
+
+        with self._cond:
+            self._failure = None
+            self.stats["committed"] += len(writes)
+            self.stats["commits"] += 1
+        for write in writes:
+            write.committed.set()
+        return []
+
+    def _commit_failed(self, filepath: str, writes: List[PendingWrite], error: Exception) -> List[PendingWrite]:
+        """
+        Keep the writes queued for another attempt. After self.retries attempts
+        the error is raised to writers: sync callers waiting on these writes get
+        it (their writes are dropped), and new submits are refused until a
+        commit succeeds
+        """
+        print(f" Write-behind commit to {os.path.basename(filepath)} failed: {str(error)}")
+        for write in writes:
+            write.attempts += 1
+        exhausted = max(write.attempts for write in writes) >= self.retries
+        failed = [write for write in writes if exhausted and self.is_sync(filepath, write.record)]
+        dropped = set(map(id, failed))
+        if failed:
+            view = self.views[filepath]
+            with view.lock:
+                view.pending = [w for w in view.pending if id(w) not in dropped]
+                view.records = None  # reload without them on next read
+        retry = [write for write in writes if id(write) not in dropped]
+        with self._cond:
+            self.stats["errors"] += 1
+            self.stats["failed"] += len(failed)
+            if exhausted and retry:
+                # only while writes are still waiting on storage; failed sync writes have had their error
+                self._failure = error
+        for write in failed:
+            write.error = error
+            write.committed.set()
+        return retry
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(create: bool = True) -> Optional[WriteBehindStore]:
+    global _store
+    with _store_lock:
+        if _store is None and create:
+            _store = WriteBehindStore()
+            atexit.register(_store.close)
+        return _store